@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 警报推文并发生成 👑
+一轮扫描出现多个警报 (显卡降价 / 套利机会) 时，每个警报一条推文，全部并发请求 DeepSeek
+
+- httpx.AsyncClient + 信号量限制同时在途的请求数 (CONCURRENCY)，连接池跨批次复用
+- 单个请求超时 REQUEST_TIMEOUT 秒；429 / 5xx / 超时 / 连接错误指数退避重试 (尊重 Retry-After)，
+  退避期间不占并发名额
+- 整批截止时间 BATCH_DEADLINE：到点未完成的条目取消并记为失败，不拖住其他条目；
+  失败条目返回模板文案 (GenerationResult.text)，调用方拿到的始终是每个警报一条
+- 先查 generation_cache.py：同一警报 (prompt 相同) 不重复请求
+- 埋点：generate (单次请求)、generate_batch (整批)，计数 alert_content{outcome=...}
+
+用法:
+  python scripts/alert_content.py arbitrage [条数]   # 为近 24 小时最佳套利机会各生成一条推文 (默认 5)
+  python scripts/stub_deepseek.py bench             # 本地桩服务上测 1 / 10 / 100 个警报的整批耗时
+
+作者: 曹皇 👑
+"""
+
+import asyncio
+import random
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import httpx
+
+import generate_deepseek_content as deepseek
+import metrics
+from generation_cache import cache_key, get_cache
+from twitter_bot import TWEET_MAX_CHARS
+
+# === 配置区 ===
+CONCURRENCY = 8             # 同时在途的请求数
+REQUEST_TIMEOUT = 30        # 单个请求超时 (秒)
+BATCH_DEADLINE = 90         # 整批截止时间 (秒)
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 1.0          # 秒，第 n 次失败后等待 BACKOFF_BASE * 2^(n-1) (带抖动)
+MAX_TOKENS = 200
+TEMPERATURE = 0.7
+
+CONTENT_PATH = deepseek.CONTENT_PATH
+
+TWEET_RULES = """要求：
+- 中文
+- 带emoji
+- 不超过280字符
+- 专业但有吸引力"""
+
+
+@dataclass
+class AlertItem:
+    key: Hashable       # 调用方自定义标识，如 (retailer, product_name)
+    prompt: str
+    fallback: str       # 生成失败时使用的模板文案
+
+
+@dataclass
+class GenerationResult:
+    key: Hashable
+    content: Optional[str]
+    error: Optional[str]
+    elapsed: float      # 秒 (含排队与退避)
+    attempts: int
+    cached: bool
+    fallback: str
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def text(self) -> str:
+        return self.content if self.content else self.fallback
+
+    @property
+    def tweet(self) -> str:
+        """可直接发出的推文：生成内容为空或超过 TWEET_MAX_CHARS 时用模板文案"""
+        text = self.text.strip()
+        return text if text and len(text) <= TWEET_MAX_CHARS else self.fallback
+
+
+def gpu_alert_item(alert: Dict) -> AlertItem:
+    """gpu_price_monitor 的降价警报"""
+    stock = "有货" if alert["in_stock"] else "缺货"
+    prompt = f"""你是一个AI行业分析师，根据下面的显卡降价警报写一条Twitter推文。
+{TWEET_RULES}
+- 包含 #显卡 #降价 #AI 标签
+
+警报：{alert['gpu_model']} 在 {alert['retailer']} 从 ${alert['old_price']:.2f} 降到 ${alert['new_price']:.2f} (-{alert['drop_percent']}%)，{stock}
+商品：{alert['product_name'][:80]}"""
+    fallback = (f"🚨 {alert['gpu_model']} 降价 {alert['drop_percent']}%\n\n"
+                f"💰 ${alert['old_price']:.0f} → ${alert['new_price']:.0f} @ {alert['retailer']} ({stock})\n\n"
+                f"#显卡 #降价 #AI 👑")
+    return AlertItem((alert["gpu_model"], alert["retailer"], alert["product_name"]), prompt, fallback)
+
+
+def arbitrage_alert_item(model_id: str, diff: float) -> AlertItem:
+    """套利机会 (diff 为 OpenRouter 比直供便宜的比例)"""
+    direction = "便宜" if diff > 0 else "贵"
+    prompt = f"""你是一个AI行业分析师，根据下面的 API 价格监控结果写一条Twitter推文。
+{TWEET_RULES}
+- 包含 #AI #API #OpenRouter 标签
+
+监控结果：{model_id} 通过 OpenRouter 调用比官方直供{direction} {abs(diff) * 100:.0f}%"""
+    fallback = (f"💎 {model_id.split('/')[-1]}: 通过 OpenRouter 比官方{direction} {abs(diff) * 100:.0f}%\n\n"
+                f"实时数据 → https://huangcaopoxiao.github.io/ai-arbitrage-insights/\n\n#AI #API #OpenRouter 👑")
+    return AlertItem(model_id, prompt, fallback)
+
+
+class AsyncGenerator:
+    """警报推文并发生成器：信号量限流 + 单请求超时 + 退避重试 + 整批截止时间"""
+
+    def __init__(self, concurrency: int = CONCURRENCY, timeout: float = REQUEST_TIMEOUT,
+                 deadline: float = BATCH_DEADLINE, max_attempts: int = MAX_ATTEMPTS,
+                 backoff_base: float = BACKOFF_BASE, use_cache: bool = True):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.use_cache = use_cache
+
+    def new_client(self) -> httpx.AsyncClient:
+        """常驻进程持有它跨批次复用连接池"""
+        return httpx.AsyncClient(timeout=self.timeout,
+                                 limits=httpx.Limits(max_connections=self.concurrency))
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_base * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+
+    async def _generate_one(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                            api_key: Optional[str], item: AlertItem) -> GenerationResult:
+        start = time.perf_counter()
+
+        def result(content=None, error=None, attempts=0, cached=False):
+            return GenerationResult(item.key, content, error, time.perf_counter() - start,
+                                    attempts, cached, item.fallback)
+
+        key = cache_key(deepseek.DEEPSEEK_MODEL, item.prompt, MAX_TOKENS, TEMPERATURE)
+        cache = get_cache() if self.use_cache else None
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.take, key)
+            if cached is not None:
+                return result(cached, cached=True)
+        if not api_key:
+            return result(error="DeepSeek API Key 未配置")
+
+        headers, payload = deepseek.build_request(api_key, item.prompt, MAX_TOKENS, TEMPERATURE)
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            response = None
+            try:
+                async with semaphore:
+                    with metrics.timer("generate", source="deepseek"):
+                        response = await client.post(deepseek.DEEPSEEK_API_URL, headers=headers, json=payload)
+                if response.status_code == 200:
+                    content, tokens = deepseek.parse_completion(response.json())
+                    if not content or not content.strip():  # 空内容算失败：用模板文案，也不进缓存
+                        return result(error="响应内容为空", attempts=attempt)
+                    if cache is not None:
+                        await asyncio.to_thread(cache.put, key, deepseek.DEEPSEEK_MODEL, [content], tokens)
+                    return result(content, attempts=attempt)
+                error = f"HTTP {response.status_code}"
+                if response.status_code != 429 and response.status_code < 500:
+                    return result(error=error, attempts=attempt)  # 其余 4xx 重试也没用
+            except httpx.TimeoutException:
+                error = f"请求超时 ({self.timeout}s)"
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+            except (ValueError, KeyError, IndexError) as e:
+                return result(error=f"响应格式错误: {e}", attempts=attempt)
+            if attempt < self.max_attempts:
+                await asyncio.sleep(self._backoff(attempt, response))
+        return result(error=error, attempts=self.max_attempts)
+
+    async def generate_all(self, items: Iterable[AlertItem],
+                           client: Optional[httpx.AsyncClient] = None) -> Dict[Hashable, GenerationResult]:
+        """并发生成全部条目，返回 {key: GenerationResult} (顺序同输入)"""
+        items = list(items)
+        if not items:
+            return {}
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)  # 必须属于当前事件循环
+        api_key = deepseek.get_deepseek_key()
+        own_client = client is None
+        if own_client:
+            client = self.new_client()
+
+        try:
+            tasks = {asyncio.ensure_future(self._generate_one(client, semaphore, api_key, item)): item
+                     for item in items}
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            results = {}
+            for task, item in tasks.items():
+                if task in done:
+                    results[item.key] = task.result()
+                else:
+                    results[item.key] = GenerationResult(item.key, None, f"超过整批截止时间 {self.deadline}s",
+                                                         self.deadline, 0, False, item.fallback)
+                r = results[item.key]
+                metrics.count("alert_content", outcome="cached" if r.cached else "ok" if r.ok else "failed")
+            metrics.observe("generate_batch", time.perf_counter() - start, source="deepseek")
+            return results
+        finally:
+            if own_client:
+                await client.aclose()
+
+    def run(self, items: Iterable[AlertItem]) -> Dict[Hashable, GenerationResult]:
+        """同步入口 (供 cron 脚本直接调用)"""
+        return asyncio.run(self.generate_all(items))
+
+
+def save_alert_content(results: Dict[Hashable, GenerationResult], kind: str) -> List[Path]:
+    """每条写一个 twitter-alert-<kind>-<时间>-<序号>.txt (失败 / 超长条目写模板文案)，返回文件路径"""
+    CONTENT_PATH.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M")
+    paths = []
+    for i, result in enumerate(results.values(), 1):
+        path = CONTENT_PATH / f"twitter-alert-{kind}-{timestamp}-{i:03d}.txt"
+        path.write_text(result.tweet)
+        paths.append(path)
+    ok = sum(r.ok for r in results.values())
+    print(f"✍️ 警报推文: {ok}/{len(results)} 条由 DeepSeek 生成，其余使用模板 → {CONTENT_PATH}")
+    for result in results.values():
+        if not result.ok:
+            print(f"  ⚠️ {result.key}: {result.error}")
+    return paths
+
+
+def arbitrage_items(limit: int = 5) -> List[AlertItem]:
+    """近 24 小时的最佳套利机会 (天汇总表)"""
+    from generate_twitter import DB_PATH
+    from rollups import best_deals
+    from storage import get_storage
+    deals = best_deals(get_storage(DB_PATH, schema="arbitrage"), datetime.now() - timedelta(days=1), limit)
+    return [arbitrage_alert_item(model, diff) for model, diff in deals]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "arbitrage":
+        items = arbitrage_items(int(args[1]) if len(args) > 1 else 5)
+        start = time.perf_counter()
+        results = AsyncGenerator().run(items)
+        save_alert_content(results, "arbitrage")
+        print(f"整批耗时 {time.perf_counter() - start:.2f}s")
+        metrics.export()
+    else:
+        print(__doc__)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 向量化套利评估 👑
+把一次扫描装进 NumPy 数组，一次性算出所有模型的价差、阈值掩码和方向
+
+- 支持多个参考价来源 (如直供价、其它渠道价) 和多个阈值，一次调用全部算完
+- 输出与 ArbitrageMonitor.detect_arbitrage 相同的套利字典，save_opportunities 可直接使用
+
+作者: 曹皇 👑
+"""
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import metrics
+from model_resolver import ModelResolver
+from price_batch import PriceBatch, as_price_batch
+
+# 参考价表: {key: {"prompt": x, "completion": y}}
+PriceTable = Mapping[str, Mapping[str, float]]
+
+
+class ReferenceIndex(dict):
+    """
+    单个参考价来源的数组化视图: model_id -> 参考条目下标 (未匹配为哨兵下标)
+
+    继承 dict，未见过的 model_id 由 __missing__ 解析后缓存，
+    这样整批映射可以用 map(index.__getitem__, ids) 在 C 层完成，不必逐个调用 Python 函数
+    """
+
+    def __init__(self, table: PriceTable, resolver: Optional[ModelResolver] = None):
+        super().__init__()
+        self.resolver = resolver or ModelResolver(table)
+        keys = list(table)
+        self._key_index = {key: i for i, key in enumerate(keys)}
+        self.missing = len(keys)
+        # 末尾追加 NaN 哨兵，未匹配的模型取到 NaN
+        self.prompt = np.array([table[k]["prompt"] for k in keys] + [np.nan], dtype=np.float64)
+        self.completion = np.array([table[k]["completion"] for k in keys] + [np.nan], dtype=np.float64)
+
+    def __missing__(self, model_id: str) -> int:
+        index = self[model_id] = self._key_index.get(self.resolver.resolve(model_id), self.missing)
+        return index
+
+    def lookup(self, model_ids: List[str]) -> np.ndarray:
+        return np.fromiter(map(self.__getitem__, model_ids), dtype=np.intp, count=len(model_ids))
+
+
+def _relative_diff(reference: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    """(参考价 - 观测价) / 参考价；参考价 <= 0 时记 0 (与逐个计算的旧逻辑一致)"""
+    out = np.zeros_like(observed)
+    np.divide(reference - observed, reference, out=out, where=reference > 0)
+    return out
+
+
+def evaluate_scan(prices: Union[PriceBatch, Sequence], references: Mapping[str, PriceTable],
+                  thresholds: Sequence[float],
+                  indexes: Optional[Dict[str, ReferenceIndex]] = None) -> Dict[Tuple[str, float], List[Dict]]:
+    """
+    批量评估一次扫描
+
+    Args:
+        prices: PriceBatch (直接使用价格列)，或 ModelPrice 序列 (先转换为 PriceBatch)
+        references: {来源名: 参考价表}
+        thresholds: 价差阈值列表，如 [0.15, 0.3]
+        indexes: {来源名: ReferenceIndex}，传入可跨扫描复用模型映射 (缺的来源会补建进去)
+
+    Returns:
+        {(来源名, 阈值): [套利字典...]}，套利字典字段与 detect_arbitrage 相同
+    """
+    indexes = indexes if indexes is not None else {}
+    batch = as_price_batch(prices)
+    model_ids = batch.model_ids
+    or_prompt = batch.prompt
+    or_completion = batch.completion
+    limits = np.asarray(thresholds, dtype=np.float64)[:, None]  # (阈值数, 1) 与 (模型数,) 广播
+
+    results: Dict[Tuple[str, float], List[Dict]] = {}
+    for source, table in references.items():
+        index = indexes.get(source)
+        if index is None:
+            index = indexes[source] = ReferenceIndex(table)
+
+        with metrics.timer("match", reference=source):
+            mapping = index.lookup(model_ids)
+        matched = mapping != index.missing
+
+        direct_prompt = index.prompt[mapping]
+        direct_completion = index.completion[mapping]
+        prompt_diff = _relative_diff(np.nan_to_num(direct_prompt), or_prompt)
+        completion_diff = _relative_diff(np.nan_to_num(direct_completion), or_completion)
+
+        # (阈值数, 模型数) 掩码
+        hits = matched & ((np.abs(prompt_diff) > limits) | (np.abs(completion_diff) > limits))
+
+        for t_idx, threshold in enumerate(thresholds):
+            idx = np.flatnonzero(hits[t_idx])
+            # 先整列取出再转 Python float，避免逐元素访问 NumPy 标量
+            results[(source, threshold)] = [
+                {
+                    "model_id": model_ids[i],
+                    "or_prompt": op,
+                    "or_completion": oc,
+                    "direct_prompt": dp,
+                    "direct_completion": dc,
+                    "prompt_diff_pct": pd,
+                    "completion_diff_pct": cd,
+                    "timestamp": batch.timestamp,
+                }
+                for i, op, oc, dp, dc, pd, cd in zip(
+                    idx.tolist(), or_prompt[idx].tolist(), or_completion[idx].tolist(),
+                    direct_prompt[idx].tolist(), direct_completion[idx].tolist(),
+                    prompt_diff[idx].tolist(), completion_diff[idx].tolist())
+            ]
+    return results
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 异步并发抓取引擎 👑
+基于 httpx + asyncio，一次性发出所有 零售商×型号 页面请求
+
+特性：
+- 所有页面同时抓取，总耗时 ≈ 最慢页面，而不是所有页面之和
+- 按域名限制并发 (避免被零售商限流/封禁)；同一事件循环里同时进行的多轮 fetch_all 共用同一组限额
+- 全局截止时间：到点未完成的请求直接取消，记为失败
+
+作者: 曹皇 👑
+"""
+
+import asyncio
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# === 配置区 ===
+PER_HOST_LIMIT = 4          # 单个域名最大并发
+REQUEST_TIMEOUT = 15        # 单个请求超时 (秒)，与 fetch_url 保持一致
+GLOBAL_DEADLINE = 25        # 整轮抓取截止时间 (秒)，gpu_monitor_fixed.sh 30 秒强杀
+
+
+@dataclass
+class FetchJob:
+    key: Hashable  # 调用方自定义标识，如 (retailer, gpu_model)
+    url: str
+
+
+@dataclass
+class FetchResult:
+    key: Hashable
+    url: str
+    html: Optional[str]
+    error: Optional[str]
+    elapsed: float  # 秒，拿到域名并发名额之后的请求耗时
+    wait: float = 0.0  # 秒，等待域名并发名额的时间
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class AsyncScraper:
+    """并发抓取器：按域名限流 + 全局截止时间"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None,
+                 per_host_limit: int = PER_HOST_LIMIT,
+                 timeout: float = REQUEST_TIMEOUT,
+                 deadline: float = GLOBAL_DEADLINE):
+        self.headers = headers or {}
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.deadline = deadline
+        # {事件循环: {域名: 信号量}}：信号量必须属于创建它的事件循环，循环结束后随之回收
+        self._host_sems = weakref.WeakKeyDictionary()
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        sems = self._host_sems.setdefault(asyncio.get_running_loop(), {})
+        host = urlsplit(url).netloc
+        if host not in sems:
+            sems[host] = asyncio.Semaphore(self.per_host_limit)
+        return sems[host]
+
+    async def _fetch_one(self, client: httpx.AsyncClient, job: FetchJob) -> FetchResult:
+        queued = time.perf_counter()
+        async with self._semaphore(job.url):
+            start = time.perf_counter()
+            wait = start - queued
+            try:
+                response = await client.get(job.url)
+                response.raise_for_status()
+                return FetchResult(job.key, job.url, response.text, None,
+                                   time.perf_counter() - start, wait)
+            except Exception as e:
+                return FetchResult(job.key, job.url, None, str(e) or type(e).__name__,
+                                   time.perf_counter() - start, wait)
+
+    def new_client(self) -> httpx.AsyncClient:
+        """按本抓取器的请求头/超时创建客户端；常驻进程持有它跨轮复用连接池"""
+        return httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+        )
+
+    async def fetch_all(self, jobs: Iterable[FetchJob],
+                        client: Optional[httpx.AsyncClient] = None) -> Dict[Hashable, FetchResult]:
+        """并发抓取全部页面，返回 {key: FetchResult}"""
+        jobs = list(jobs)
+        own_client = client is None
+        if own_client:
+            client = self.new_client()
+
+        try:
+            tasks = {asyncio.ensure_future(self._fetch_one(client, job)): job for job in jobs}
+            if not tasks:
+                return {}
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            results = {}
+            for task, job in tasks.items():
+                if task in done:
+                    results[job.key] = task.result()
+                else:
+                    results[job.key] = FetchResult(job.key, job.url, None,
+                                                   f"超过全局截止时间 {self.deadline}s",
+                                                   self.deadline)
+            return results
+        finally:
+            if own_client:
+                await client.aclose()
+
+    def run(self, jobs: Iterable[FetchJob]) -> Dict[Hashable, FetchResult]:
+        """同步入口 (供 cron 脚本直接调用)"""
+        return asyncio.run(self.fetch_all(jobs))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 套利检测基准 👑
+对比 detect_arbitrage (逐模型 Python 循环) 与 detect_arbitrage_batch (NumPy 向量化) 的耗时，
+并校验两者输出的套利字典完全一致
+
+用法:
+  python scripts/bench_detect.py                 # 340 / 100,000 模型
+  python scripts/bench_detect.py 340 5000        # 自定义规模
+
+作者: 曹皇 👑
+"""
+
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import openrouter_arbitrage
+from openrouter_arbitrage import DIRECT_PRICING, PRICE_DIFF_THRESHOLD, ArbitrageMonitor, ModelPrice
+from price_batch import PriceBatch
+
+SCAN_SIZES = [340, 100_000]
+THRESHOLDS = (0.05, PRICE_DIFF_THRESHOLD, 0.30)
+UNMATCHED_RATIO = 0.3  # 约 30% 模型不在参考价表中
+OUTLIER_RATIO = 0.1  # 约 10% 模型价格大幅偏离直供价，其余在 ±10% 内
+
+
+def synthetic_scan(n):
+    """生成 n 个模型的合成扫描结果: 多数贴近直供价，少数在 0.5x ~ 1.5x 之间大幅浮动"""
+    rng = random.Random(n)
+    now = datetime.now()
+    keys = list(DIRECT_PRICING)
+    prices = []
+    for i in range(n):
+        if rng.random() < UNMATCHED_RATIO:
+            model_id, base = f"vendor-{i % 50}/model-{i}", {"prompt": 1.0, "completion": 2.0}
+        else:
+            key = keys[i % len(keys)]
+            model_id, base = f"vendor-{i % 50}/{key}-{i}", DIRECT_PRICING[key]
+        spread = 0.5 if rng.random() < OUTLIER_RATIO else 0.1
+        prices.append(ModelPrice(
+            model_id=model_id,
+            name=f"Model {i}",
+            provider="openrouter",
+            prompt_price=round(base["prompt"] * rng.uniform(1 - spread, 1 + spread), 4),
+            completion_price=round(base["completion"] * rng.uniform(1 - spread, 1 + spread), 4),
+            timestamp=now,
+        ))
+    return prices
+
+
+def other_source():
+    """第二个参考价来源 (直供价统一上浮 10%)，用于多来源评估"""
+    return {k: {"prompt": v["prompt"] * 1.1, "completion": v["completion"] * 1.1}
+            for k, v in DIRECT_PRICING.items()}
+
+
+def best_of(fn, repeat=5):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def loop_all(monitor, prices, thresholds):
+    """循环版只支持单阈值，多阈值时逐个阈值各跑一遍"""
+    results = {}
+    for threshold in thresholds:
+        openrouter_arbitrage.PRICE_DIFF_THRESHOLD = threshold
+        results[threshold] = monitor.detect_arbitrage(prices)
+    openrouter_arbitrage.PRICE_DIFF_THRESHOLD = PRICE_DIFF_THRESHOLD
+    return results
+
+
+def main(sizes):
+    print("👑 曹皇套利检测基准")
+    print(f"多阈值 = {THRESHOLDS}；多来源 = direct + 上浮 10% 的第二来源")
+    print("-" * 96)
+    print(f"{'模型数':>8} {'信号数':>7} {'循环 ms':>10} {'向量 ms':>10} {'加速':>7} "
+          f"{'循环x3阈值 ms':>14} {'向量x3阈值 ms':>14} {'向量x3x2来源 ms':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        monitor = ArbitrageMonitor(db_path=Path(tmp) / "bench.db")
+        monitor.log = lambda *args, **kwargs: None  # 只比较计算，不计日志 IO
+        references = {"direct": DIRECT_PRICING, "other": other_source()}
+
+        for n in sizes:
+            prices = synthetic_scan(n)
+            columns = PriceBatch.from_prices(prices)  # 向量化版直接吃列式批次 (生产路径 parse_models 即返回它)
+            monitor.detect_arbitrage(prices)  # 预热解析缓存，两边都只比较评估本身
+            t_loop, expected = best_of(lambda: monitor.detect_arbitrage(prices))
+            t_vec, batch = best_of(lambda: monitor.detect_arbitrage_batch(columns))
+            got = batch[("direct", PRICE_DIFF_THRESHOLD)]
+            if got != expected:
+                raise SystemExit(f"❌ {n} 个模型时向量化结果与循环版不一致")
+
+            t_loop_multi, expected_multi = best_of(lambda: loop_all(monitor, prices, THRESHOLDS))
+            t_vec_multi, batch_multi = best_of(lambda: monitor.detect_arbitrage_batch(columns, THRESHOLDS))
+            for threshold in THRESHOLDS:
+                if batch_multi[("direct", threshold)] != expected_multi[threshold]:
+                    raise SystemExit(f"❌ {n} 个模型、阈值 {threshold} 时结果不一致")
+            t_vec_sources, _ = best_of(
+                lambda: monitor.detect_arbitrage_batch(columns, THRESHOLDS, references))
+
+            print(f"{n:>8,} {len(expected):>7,} {t_loop * 1000:>10.2f} {t_vec * 1000:>10.2f} "
+                  f"{t_loop / t_vec:>6.1f}x {t_loop_multi * 1000:>14.2f} {t_vec_multi * 1000:>14.2f} "
+                  f"{t_vec_sources * 1000:>16.2f}")
+        monitor.store.close()
+    print("-" * 96)
+    print("✅ 向量化输出与循环版逐条一致")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or SCAN_SIZES
+    main(sizes)
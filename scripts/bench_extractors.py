@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 零售商页面解析吞吐基准 👑
+用 data/fixtures/retail 下的页面对比旧解析函数与 retail_extractors (MB/s、products/s)
+
+用法:
+  python scripts/bench_extractors.py          # 默认把页面放大到约 4MB
+  python scripts/bench_extractors.py 1        # 自定义目标大小 (MB)
+
+作者: 曹皇 👑
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+from gpu_price_monitor import GPU_MODELS, extract_prices_from_html
+from retail_extractors import EXTRACTORS
+
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / "data" / "fixtures" / "retail"
+GPU_MODEL = "RTX 4090"
+TARGET_MB = 4
+
+
+def legacy_parse_newegg(html, gpu_model):
+    """旧版 Newegg 解析 (整页 DOTALL .*? 切块)"""
+    prices = []
+    items = re.findall(r'<div class="item-container"[^>]*>(.*?)</div>\s*</div>\s*</div>', html, re.DOTALL)
+    for item in items[:5]:
+        price_match = re.search(r'<li class="price-current">\s*<strong>(\d+)</strong>\s*<sup>(\d+)</sup>', item)
+        title_match = re.search(r'<a[^>]*class="item-title"[^>]*>(.*?)</a>', item, re.DOTALL)
+        if price_match and title_match:
+            title = re.sub(r'<[^>]+>', '', title_match.group(1)).strip()
+            if any(kw.lower() in title.lower() for kw in GPU_MODELS[gpu_model]["keywords"]):
+                prices.append((title, float(f"{price_match.group(1)}.{price_match.group(2)}")))
+    return prices
+
+
+def legacy_parse_bestbuy(html, gpu_model):
+    """旧版 Best Buy 解析 (价格、标题分别整页 findall 后 zip)"""
+    prices = []
+    price_matches = re.findall(r'class="sr-price"[^>]*>.*?\$([\d,]+\.\d{2})', html, re.DOTALL)
+    title_matches = re.findall(r'class="sku-title"[^>]*>.*?<a[^>]*>(.*?)</a>', html, re.DOTALL)
+    for price_str, title_html in zip(price_matches[:5], title_matches[:5]):
+        title = re.sub(r'<[^>]+>', '', title_html).strip()
+        if any(kw.lower() in title.lower() for kw in GPU_MODELS[gpu_model]["keywords"]):
+            prices.append((title, float(price_str.replace(',', ''))))
+    return prices
+
+
+LEGACY = {
+    "newegg": legacy_parse_newegg,
+    "bestbuy": legacy_parse_bestbuy,
+    "amazon": lambda html, gpu_model: extract_prices_from_html(html, "amazon"),  # 无专用解析，只有通用价格正则
+}
+
+
+def enlarge(html, extractor, target_bytes):
+    """重复商品块，把页面放大到 target_bytes 左右"""
+    first = html.find(extractor.block_marker)
+    first = html.rfind("<", 0, first)  # 从块标记所在标签的开头切
+    head, body = html[:first], html[first:]
+    tail_at = body.rfind("</body>")
+    blocks, tail = body[:tail_at], body[tail_at:]
+    repeat = max(1, int(target_bytes // max(1, len(blocks))))
+    return head + blocks * repeat + tail
+
+
+def timed(fn, min_time=0.3):
+    """重复执行直到累计 min_time 秒，返回 (单次耗时, 结果)"""
+    runs, start = 0, time.perf_counter()
+    while True:
+        result = fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs, result
+
+
+def main(target_mb):
+    print("👑 曹皇零售页面解析基准")
+    print("旧 = 现有解析函数 (整页 findall 后取前 5)；新(全量) = 提取全部商品块；新(前5) = 生产路径")
+    print("-" * 100)
+    print(f"{'页面':<24} {'大小':>8} {'旧 MB/s':>10} {'新(全量) MB/s':>14} {'products/s':>12} "
+          f"{'新(前5) MB/s':>14} {'加速':>8}")
+
+    cases = []
+    for retailer, extractor in EXTRACTORS.items():
+        html = (FIXTURE_DIR / f"{retailer}_rtx_4090.html").read_text()
+        cases.append((f"{retailer} (fixture)", retailer, html))
+        cases.append((f"{retailer} (~{target_mb:g}MB)", retailer, enlarge(html, extractor, target_mb * 1_000_000)))
+
+    for label, retailer, html in cases:
+        mb = len(html.encode()) / 1_000_000
+        extractor = EXTRACTORS[retailer]
+        legacy_t, _ = timed(lambda: LEGACY[retailer](html, GPU_MODEL))
+        full_t, products = timed(lambda: extractor.extract(html))
+        top_t, _ = timed(lambda: extractor.extract(html, limit=5))
+        print(f"{label:<24} {mb:>6.2f}MB {mb / legacy_t:>10.1f} {mb / full_t:>14.1f} "
+              f"{len(products) / full_t:>12,.0f} {mb / top_t:>14.1f} {legacy_t / top_t:>7.0f}x")
+    print("-" * 100)
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else TARGET_MB)
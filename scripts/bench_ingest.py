@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+曹皇 - OpenRouter 快照写入基准 👑
+对比原始写法 (独立连接逐行 INSERT)、共享连接逐行 INSERT 与 ingest_scan 批量导入的 rows/s
+三种写法都包含小时/天汇总表的维护 (每个全新库上的扫描都是桶内第一轮，全部模型各 UPSERT 一次)；
+行数只计快照 + 套利信号行
+
+用法:
+  python scripts/bench_ingest.py                 # 340 / 5,000 / 50,000 模型
+  python scripts/bench_ingest.py 340 2000        # 自定义规模
+
+作者: 曹皇 👑
+"""
+
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from openrouter_arbitrage import ArbitrageMonitor, ModelPrice
+from price_batch import as_price_batch
+from rollups import BUCKETS, UPSERT, bucket_of, rollup_rows
+
+SCAN_SIZES = [340, 5_000, 50_000]
+OPPORTUNITY_RATIO = 0.05  # 约 5% 模型触发套利信号
+
+
+def synthetic_scan(n):
+    """生成 n 个模型的合成扫描结果"""
+    rng = random.Random(n)
+    now = datetime.now()
+    prices = [
+        ModelPrice(
+            model_id=f"vendor-{i % 50}/model-{i}",
+            name=f"Model {i}",
+            provider="openrouter",
+            prompt_price=round(rng.uniform(0.01, 20), 4),
+            completion_price=round(rng.uniform(0.01, 60), 4),
+            timestamp=now,
+        )
+        for i in range(n)
+    ]
+    opportunities = [
+        {
+            "model_id": p.model_id,
+            "or_prompt": p.prompt_price,
+            "or_completion": p.completion_price,
+            "direct_prompt": p.prompt_price * 1.3,
+            "direct_completion": p.completion_price * 1.3,
+            "prompt_diff_pct": 0.23,
+            "completion_diff_pct": 0.23,
+            "timestamp": now,
+        }
+        for p in prices[: int(n * OPPORTUNITY_RATIO)]
+    ]
+    return prices, opportunities
+
+
+def rollup_upserts(prices, opportunities):
+    """[(UPSERT 语句, 参数)]：每个模型在小时表、天表各一条"""
+    batch = as_price_batch(prices)
+    rows = rollup_rows(batch, opportunities)
+    return [(UPSERT.format(table=table), (bucket_of(batch.timestamp, table), *row))
+            for table in BUCKETS for row in rows]
+
+
+def ingest_legacy(monitor, prices, opportunities):
+    """原始写法：save_prices / save_opportunities / 汇总表各开一个连接，逐行 execute"""
+    for rows, sql in (
+        ([(p.model_id, p.provider, p.prompt_price, p.completion_price, p.timestamp.isoformat())
+          for p in prices],
+         "INSERT INTO price_snapshots (model_id, provider, prompt_price, completion_price, timestamp) "
+         "VALUES (?, ?, ?, ?, ?)"),
+        ([(o["model_id"], o["or_prompt"], o["or_completion"], o["direct_prompt"], o["direct_completion"],
+           o["prompt_diff_pct"], o["completion_diff_pct"], o["timestamp"].isoformat())
+          for o in opportunities],
+         "INSERT INTO arbitrage_opportunities (model_id, or_prompt_price, or_completion_price, "
+         "direct_prompt_price, direct_completion_price, prompt_diff_pct, completion_diff_pct, timestamp) "
+         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"),
+    ):
+        conn = sqlite3.connect(monitor.db_path)
+        cursor = conn.cursor()
+        for row in rows:
+            cursor.execute(sql, row)
+        conn.commit()
+        conn.close()
+    conn = sqlite3.connect(monitor.db_path)
+    cursor = conn.cursor()
+    for sql, row in rollup_upserts(prices, opportunities):
+        cursor.execute(sql, row)
+    conn.commit()
+    conn.close()
+
+
+def ingest_row_by_row(monitor, prices, opportunities):
+    """共享连接，每行一次 execute (同一事务)"""
+    store = monitor.store
+    with store.transaction():
+        for p in prices:
+            store.execute('''
+                INSERT INTO price_snapshots
+                (model_id, provider, prompt_price, completion_price, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (p.model_id, p.provider, p.prompt_price, p.completion_price,
+                  p.timestamp.isoformat()))
+        for opp in opportunities:
+            store.execute('''
+                INSERT INTO arbitrage_opportunities
+                (model_id, or_prompt_price, or_completion_price, direct_prompt_price,
+                 direct_completion_price, prompt_diff_pct, completion_diff_pct, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (opp["model_id"], opp["or_prompt"], opp["or_completion"],
+                  opp["direct_prompt"], opp["direct_completion"],
+                  opp["prompt_diff_pct"], opp["completion_diff_pct"],
+                  opp["timestamp"].isoformat()))
+        for sql, row in rollup_upserts(prices, opportunities):
+            store.execute(sql, row)
+
+
+def ingest_bulk(monitor, prices, opportunities):
+    monitor.ingest_scan(prices, opportunities)
+
+
+def run_case(fn, n, repeat=3):
+    """每次在全新数据库上跑，取最快一次"""
+    prices, opportunities = synthetic_scan(n)
+    rows = len(prices) + len(opportunities)
+    best = float("inf")
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            monitor = ArbitrageMonitor(db_path=Path(tmp) / "bench.db", snapshot_mode="full")
+            start = time.perf_counter()
+            fn(monitor, prices, opportunities)
+            best = min(best, time.perf_counter() - start)
+            monitor.store.close()
+    return rows, best
+
+
+def main(sizes):
+    print("👑 曹皇快照写入基准")
+    print("-" * 80)
+    print(f"{'模型数':>8} {'行数':>8} {'原始 rows/s':>14} {'逐行 rows/s':>14} {'批量 rows/s':>14} {'加速':>7}")
+    for n in sizes:
+        rows, t_legacy = run_case(ingest_legacy, n)
+        _, t_row = run_case(ingest_row_by_row, n)
+        _, t_bulk = run_case(ingest_bulk, n)
+        print(f"{n:>8,} {rows:>8,} {rows / t_legacy:>14,.0f} {rows / t_row:>14,.0f} "
+              f"{rows / t_bulk:>14,.0f} {t_legacy / t_bulk:>6.1f}x")
+    print("-" * 80)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or SCAN_SIZES
+    main(sizes)
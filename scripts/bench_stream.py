@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 流式扫描基准 👑
+对比列表模式 (response.json() + 全量 List[ModelPrice]) 与流式模式 (增量解码 + 按批流水线) 的
+首行落库延迟、总耗时与峰值 RSS
+
+每个 (模式, 规模) 在独立子进程里跑一次全新数据库的 run_once (首轮扫描，所有模型都要写入)，
+目录由本地桩服务 (stub_openrouter.py) 提供，峰值 RSS 取子进程的 VmHWM
+
+用法:
+  python scripts/bench_stream.py                 # 340 / 50,000 模型
+  python scripts/bench_stream.py 340 10000       # 自定义规模
+
+作者: 曹皇 👑
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCAN_SIZES = [340, 50_000]
+# (管线模式, 快照模式)；delta 模式本身要在内存里保留每个模型的当前价格，full 模式用来对照
+MODES = [("list", "delta"), ("stream", "delta"), ("list", "full"), ("stream", "full")]
+
+
+def peak_rss_mb() -> float:
+    """
+    进程峰值 RSS (MB)
+
+    Linux 上读 /proc/self/status 的 VmHWM：ru_maxrss 会跨 exec 继承父进程 (持有整个桩目录) 的高水位
+    """
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode: str, snapshot_mode: str, url: str):
+    """子进程: 跑一次 run_once，打印 JSON 结果"""
+    import openrouter_arbitrage
+    from openrouter_arbitrage import ArbitrageMonitor
+    from storage import Storage
+
+    first_write = {}
+    submit = Storage._submit
+
+    def traced_submit(self, statements, bulk=False):
+        # 记录第一个包含快照 INSERT 的事务提交完成的时刻
+        future = submit(self, statements, bulk)
+        if "t" not in first_write and any(
+                isinstance(sql, str) and "INTO price_snapshots" in sql for sql, _, _ in statements):
+            future.add_done_callback(lambda _: first_write.setdefault("t", time.perf_counter()))
+        return future
+
+    Storage._submit = traced_submit
+    with tempfile.TemporaryDirectory() as tmp:
+        openrouter_arbitrage.OPENROUTER_API_URL = url
+        openrouter_arbitrage.LOG_PATH = Path(tmp) / "arbitrage.log"
+        monitor = ArbitrageMonitor(db_path=Path(tmp) / "bench.db", snapshot_mode=snapshot_mode,
+                                   streaming=(mode == "stream"))
+        monitor.log = lambda *args, **kwargs: None
+        rss_before = peak_rss_mb()
+
+        start = time.perf_counter()
+        monitor.run_once()
+        total = time.perf_counter() - start
+
+        rows = monitor.store.query_one("SELECT COUNT(*) FROM price_snapshots")[0]
+        monitor.store.close()
+    print(json.dumps({
+        "first_write_s": first_write.get("t", float("nan")) - start,
+        "total_s": total,
+        "rows": rows,
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": peak_rss_mb(),
+    }))
+
+
+def main(sizes):
+    from stub_openrouter import StubOpenRouter
+
+    print("👑 曹皇流式扫描基准 (首轮扫描，全新数据库)")
+    print("-" * 102)
+    print(f"{'模型数':>8} {'模式':<12} {'行数':>8} {'首行落库 ms':>12} {'总耗时 ms':>10} "
+          f"{'基础 RSS MB':>12} {'峰值 RSS MB':>12} {'增长 MB':>9}")
+    for n in sizes:
+        with StubOpenRouter(model_count=n) as stub:
+            for mode, snapshot_mode in MODES:
+                out = subprocess.run([sys.executable, __file__, "child", mode, snapshot_mode, stub.url],
+                                     capture_output=True, text=True, check=True)
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{n:>8,} {mode + '/' + snapshot_mode:<12} {r['rows']:>8,} {r['first_write_s'] * 1000:>12.1f} "
+                      f"{r['total_s'] * 1000:>10.1f} {r['rss_before_mb']:>12.1f} {r['rss_peak_mb']:>12.1f} "
+                      f"{r['rss_peak_mb'] - r['rss_before_mb']:>9.1f}")
+    print("-" * 102)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "child":
+        child(sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        main([int(a) for a in sys.argv[1:]] or SCAN_SIZES)
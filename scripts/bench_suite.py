@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 离线热路径基准套件 👑
+用录制好的输入离线回放各热点函数，报告 ops/s、延迟分位数 (p50/p95/p99) 与峰值内存，
+并与基线文件比较，性能回退时退出码 1
+
+输入 (全部离线):
+- data/fixtures/openrouter/models.json   /api/v1/models 响应 (取自 data/arbitrage.db 最近一轮扫描)
+- data/fixtures/retail/*.html            零售商搜索页
+- data/arbitrage.db                      复制到临时目录后使用 (时间戳整体平移到当前，原文件不动)
+
+用法:
+  python scripts/bench_suite.py              # 运行并与基线比较
+  python scripts/bench_suite.py update       # 运行并覆盖基线 (换机器或确认的性能变化后)
+  python scripts/bench_suite.py list         # 列出全部用例
+  python scripts/bench_suite.py run detect   # 只跑名称包含 detect 的用例
+
+作者: 曹皇 👑
+"""
+
+import json
+import shutil
+from array import array
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = ROOT / "data" / "fixtures"
+RECORDED_DB = ROOT / "data" / "arbitrage.db"
+BASELINE_PATH = ROOT / "data" / "bench_baseline.json"
+
+MIN_TIME = 0.6        # 每个用例至少计时 (秒，分摊到各轮)
+MIN_RUNS = 20         # 每轮至少调用次数
+ROUNDS = 3
+TIME_TOLERANCE = 1.0  # p50 超过基线 2 倍算回退 (单核共享机器上轮间抖动可达 ±50%)
+MEM_TOLERANCE = 0.5   # 峰值内存比基线高 50% 以上算回退
+MEM_SLACK_KB = 64     # 小用例的内存抖动容差
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[[], object]
+
+
+@dataclass
+class Result:
+    name: str
+    runs: int
+    ops: float
+    p50_us: float
+    p95_us: float
+    p99_us: float
+    peak_kb: float
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(case: Case) -> Result:
+    """
+    分 ROUNDS 轮计时，取 p50 最低的一轮 (共享机器上单轮容易被其它进程干扰)
+    """
+    case.fn()  # 预热 (解析缓存、懒加载的连接等)
+    best = None
+    for _ in range(ROUNDS):
+        samples = []
+        start = time.perf_counter()
+        while len(samples) < MIN_RUNS or time.perf_counter() - start < MIN_TIME / ROUNDS:
+            t0 = time.perf_counter_ns()
+            case.fn()
+            samples.append((time.perf_counter_ns() - t0) / 1000)
+        total = time.perf_counter() - start
+        samples.sort()
+        if best is None or percentile(samples, 0.50) < percentile(best[0], 0.50):
+            best = (samples, total)
+    samples, total = best
+
+    # 峰值内存单独测一次 (tracemalloc 会拖慢计时)
+    tracemalloc.start()
+    case.fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(case.name, len(samples), len(samples) / total,
+                  percentile(samples, 0.50), percentile(samples, 0.95), percentile(samples, 0.99),
+                  peak / 1024)
+
+
+def copy_recorded_db(tmp: Path) -> Path:
+    """复制录制的数据库，并把时间戳整体平移到 "刚刚"，让小时报告窗口内有数据"""
+    db_path = tmp / "arbitrage.db"
+    shutil.copy(RECORDED_DB, db_path)
+    conn = sqlite3.connect(db_path)
+    latest = conn.execute("SELECT MAX(timestamp) FROM price_snapshots").fetchone()[0]
+    shift = int((datetime.now() - datetime.fromisoformat(latest)).total_seconds())
+    for table in ("price_snapshots", "arbitrage_opportunities"):
+        conn.execute(f"UPDATE {table} SET timestamp = strftime('%Y-%m-%dT%H:%M:%f', timestamp, ?)",
+                     (f"{shift:+d} seconds",))
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def build_cases(tmp: Path) -> List[Case]:
+    import generate_report
+    import gpu_price_monitor
+    import openrouter_arbitrage
+    from openrouter_arbitrage import ArbitrageMonitor
+    from price_batch import PriceBatch
+
+    openrouter_arbitrage.LOG_PATH = tmp / "arbitrage.log"
+    db_path = copy_recorded_db(tmp)
+    monitor = ArbitrageMonitor(db_path=db_path)
+    monitor.log = lambda *args, **kwargs: None  # 不计日志 IO，也避免刷屏
+
+    payload = (FIXTURE_DIR / "openrouter" / "models.json").read_bytes()
+    prices = monitor.parse_models(json.loads(payload))
+    # 第二轮扫描: 每 10 个模型改一次价，save_prices 交替写两轮，每次都有真实的变化行
+    changed = PriceBatch(list(prices.model_ids),
+                         array("d", (p * 1.05 if i % 10 == 0 else p for i, p in enumerate(prices.prompt_prices))),
+                         array("d", prices.completion_prices), prices.timestamp)
+    scans = [prices, changed]
+
+    def save_prices():
+        scans.reverse()
+        monitor.save_prices(scans[0])
+
+    # 整轮入库 (快照 + 套利信号 + 汇总表)：同一小时内的后续扫描，汇总表只写变价 / 有信号的模型
+    ingest_scans = [(scan, monitor.detect_arbitrage_batch(scan)[("direct", openrouter_arbitrage.PRICE_DIFF_THRESHOLD)])
+                    for scan in (prices, changed)]
+
+    def ingest_scan():
+        ingest_scans.reverse()
+        scan, opportunities = ingest_scans[0]
+        scan.timestamp = datetime.now()  # 每次都是新的一轮 (同一时间戳会被当成铺桶那一轮的后续批次)
+        monitor.ingest_scan(scan, opportunities)
+
+    html = {retailer: (FIXTURE_DIR / "retail" / f"{retailer}_rtx_4090.html").read_text()
+            for retailer in ("newegg", "bestbuy", "amazon")}
+    all_prices = [dict(item, gpu_model="RTX 4090")
+                  for parse in gpu_price_monitor.PAGE_PARSERS.values()
+                  for item in parse(html[parse.__name__.split("_")[1]], "RTX 4090")]
+    quiet_results = {"timestamp": datetime.now().isoformat(), "alerts": [], "new_baselines": [],
+                     "all_prices": all_prices}
+    alert_results = dict(quiet_results, alerts=[
+        dict(item, old_price=item["price"] * 1.1, new_price=item["price"], drop_percent=9.09)
+        for item in all_prices])
+
+    cases = [
+        Case("fetch_openrouter_prices (解析)", lambda: monitor.parse_models(json.loads(payload))),
+        Case("detect_arbitrage", lambda: monitor.detect_arbitrage(prices)),
+        Case("detect_arbitrage_batch", lambda: monitor.detect_arbitrage_batch(prices)),
+        Case("save_prices (delta)", save_prices),
+        Case("ingest_scan (delta + 汇总表)", ingest_scan),
+        Case("get_hourly_report", monitor.get_hourly_report),
+        Case("generate_report.generate_hourly_report", lambda: generate_report.generate_hourly_report(db_path)),
+    ]
+    for retailer, page in html.items():
+        cases.append(Case(f"extract_prices_from_html ({retailer})",
+                          lambda page=page, retailer=retailer: gpu_price_monitor.extract_prices_from_html(page, retailer)))
+    cases += [
+        Case("scrape_newegg_prices (解析)", lambda: gpu_price_monitor.parse_newegg_html(html["newegg"], "RTX 4090")),
+        Case("scrape_bestbuy_prices (解析)", lambda: gpu_price_monitor.parse_bestbuy_html(html["bestbuy"], "RTX 4090")),
+        Case("format_alert_message (无警报)", lambda: gpu_price_monitor.format_alert_message(quiet_results)),
+        Case("format_alert_message (有警报)", lambda: gpu_price_monitor.format_alert_message(alert_results)),
+    ]
+    return cases
+
+
+def regressions(result: Result, baseline: Dict) -> List[str]:
+    problems = []
+    if result.p50_us > baseline["p50_us"] * (1 + TIME_TOLERANCE):
+        problems.append(f"p50 {baseline['p50_us']:.1f}µs → {result.p50_us:.1f}µs")
+    if result.peak_kb > baseline["peak_kb"] * (1 + MEM_TOLERANCE) + MEM_SLACK_KB:
+        problems.append(f"峰值内存 {baseline['peak_kb']:.0f}KB → {result.peak_kb:.0f}KB")
+    return problems
+
+
+def main(command: str, pattern: str = "") -> int:
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    failed = 0
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [c for c in build_cases(Path(tmp)) if pattern in c.name]
+        if command == "list":
+            for case in cases:
+                print(case.name)
+            return 0
+
+        print("👑 曹皇离线热路径基准")
+        print("-" * 112)
+        print(f"{'用例':<42} {'次数':>7} {'ops/s':>10} {'p50 µs':>10} {'p95 µs':>10} {'p99 µs':>10} "
+              f"{'峰值 KB':>9}  对比基线")
+        for case in cases:
+            result = measure(case)
+            results.append(result)
+            if command == "update":
+                verdict = ""
+            elif case.name not in baseline:
+                verdict = "(无基线)"
+            else:
+                problems = regressions(result, baseline[case.name])
+                failed += bool(problems)
+                ratio = result.p50_us / baseline[case.name]["p50_us"]
+                verdict = f"❌ {'; '.join(problems)}" if problems else f"✅ {ratio:.2f}x"
+            print(f"{case.name:<42} {result.runs:>7,} {result.ops:>10,.0f} {result.p50_us:>10.1f} "
+                  f"{result.p95_us:>10.1f} {result.p99_us:>10.1f} {result.peak_kb:>9.0f}  {verdict}")
+
+        # 关闭临时库上的共享连接 (TemporaryDirectory 清理前)
+        from storage import close_all
+        close_all()
+    print("-" * 112)
+
+    if command == "update":
+        baseline.update({r.name: {"p50_us": round(r.p50_us, 1), "p95_us": round(r.p95_us, 1),
+                                  "p99_us": round(r.p99_us, 1), "peak_kb": round(r.peak_kb, 1)}
+                         for r in results})
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n")
+        print(f"✅ 基线已写入 {BASELINE_PATH}")
+        return 0
+    if failed:
+        print(f"❌ {failed} 个用例相对基线回退 (时间容差 +{TIME_TOLERANCE:.0%}，内存容差 +{MEM_TOLERANCE:.0%})")
+        return 1
+    print("✅ 无回退")
+    return 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "run"
+    sys.exit(main(command, args[1] if len(args) > 1 else ""))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 模型目录条件抓取 👑
+OpenRouter /api/v1/models 多数时候不变，没必要每轮都解析 + 写入 + 检测 340+ 个模型
+
+- 服务端给了 ETag / Last-Modified 时带 If-None-Match / If-Modified-Since，304 直接短路
+- 没有校验头 (或服务端忽略条件请求) 时退回 body 的 sha256，与上次相同也短路
+- 校验状态存在 fetch_state 表，跨进程 (cron 每轮新进程) 有效；
+  只在本轮数据成功入库后随同一事务更新，入库失败下轮会重新全量处理
+
+作者: 曹皇 👑
+"""
+
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional, Union
+
+import requests
+
+import metrics
+
+# 抓取结果状态 (写入 scan_heartbeats.fetch_status)
+CHANGED = "changed"            # 目录有变化，走完整流程
+NOT_MODIFIED = "not_modified"  # 服务端 304
+HASH_MATCH = "hash_match"      # 200 但 body 与上次相同
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class CatalogFetch:
+    status: str
+    data: Optional[dict]       # 仅 CHANGED 时解析
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: Optional[str]
+
+    @property
+    def unchanged(self) -> bool:
+        return self.status != CHANGED
+
+
+class ConditionalFetcher:
+    """带条件请求与内容哈希回退的目录抓取器"""
+
+    def __init__(self, store, url: str, timeout: float = 30, session: Optional[requests.Session] = None,
+                 source: str = "openrouter"):
+        self.store = store
+        self.url = url
+        self.source = source  # 埋点标签
+        self.timeout = timeout
+        # 常驻进程 (scheduler.py) 传入 Session 复用 TLS 连接；默认每次新建连接
+        self.http = session or requests
+        self.counters: Counter = Counter()  # 本进程内各状态次数 (含 error)
+        self.reload()
+
+    def reload(self):
+        """从库中读取上次提交的校验状态 (写事务回滚后也用它丢弃内存中的新状态)"""
+        row = self.store.query_one('''
+            SELECT etag, last_modified, body_hash, model_count FROM fetch_state WHERE url = ?
+        ''', (self.url,))
+        self.etag, self.last_modified, self.body_hash, self.model_count = row or (None, None, None, 0)
+
+    def invalidate(self):
+        """丢弃内存中的校验状态，下一次抓取不带条件头、不做哈希短路 (参考价变化后需要重新检测)"""
+        self.etag = self.last_modified = self.body_hash = None
+
+    def _conditional_headers(self) -> dict:
+        headers = {}
+        if self.body_hash is not None:  # 上次成功入库过才有资格短路
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def fetch(self) -> CatalogFetch:
+        """抓取一次目录；网络/HTTP 错误照常抛出 (计入 counters["error"])"""
+        try:
+            with metrics.timer("fetch", source=self.source):
+                response = self.http.get(self.url, headers=self._conditional_headers(), timeout=self.timeout)
+            if response.status_code == 304:
+                result = CatalogFetch(NOT_MODIFIED, None, self.etag, self.last_modified, self.body_hash)
+            else:
+                response.raise_for_status()
+                body_hash = hashlib.sha256(response.content).hexdigest()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if body_hash == self.body_hash:
+                    result = CatalogFetch(HASH_MATCH, None, etag, last_modified, body_hash)
+                else:
+                    with metrics.timer("decode", source=self.source):
+                        data = json.loads(response.content)
+                    result = CatalogFetch(CHANGED, data, etag, last_modified, body_hash)
+        except Exception:
+            self._count("error")
+            raise
+        self._count(result.status)
+        return result
+
+    def stream(self) -> Union[CatalogFetch, "CatalogStream"]:
+        """
+        流式抓取：304 时直接返回 NOT_MODIFIED 的 CatalogFetch，否则返回 CatalogStream
+
+        流式模式下 body 边读边处理，内容哈希要读完才知道，所以 HASH_MATCH 无法提前短路
+        (delta 模式下价格没变本来也不写行)，只在 result() 里如实记录
+        """
+        try:
+            with metrics.timer("fetch", source=self.source):  # 到响应头为止，body 随流水线读取
+                response = self.http.get(self.url, headers=self._conditional_headers(),
+                                         timeout=self.timeout, stream=True)
+            if response.status_code == 304:
+                response.close()
+                self._count(NOT_MODIFIED)
+                return CatalogFetch(NOT_MODIFIED, None, self.etag, self.last_modified, self.body_hash)
+            response.raise_for_status()
+        except Exception:
+            self._count("error")
+            raise
+        return CatalogStream(self, response)
+
+    def _count(self, status: str):
+        self.counters[status] += 1
+        metrics.count("fetches", source=self.source, status=status)
+
+    def save_state(self, result: CatalogFetch, model_count: Optional[int] = None):
+        """记录本轮校验状态 (在调用方的写事务内调用，与快照一起提交)"""
+        if model_count is not None:
+            self.model_count = model_count
+        self.store.execute('''
+            INSERT INTO fetch_state (url, etag, last_modified, body_hash, model_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag, last_modified = excluded.last_modified,
+                body_hash = excluded.body_hash, model_count = excluded.model_count,
+                updated_at = excluded.updated_at
+        ''', (self.url, result.etag, result.last_modified, result.body_hash, self.model_count,
+              datetime.now().isoformat()))
+        self.etag, self.last_modified, self.body_hash = result.etag, result.last_modified, result.body_hash
+
+
+class CatalogStream:
+    """200 响应的流式 body：chunks() 边读边算 sha256，读完后 result() 给出 CHANGED / HASH_MATCH"""
+
+    def __init__(self, fetcher: ConditionalFetcher, response, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.fetcher = fetcher
+        self.response = response
+        self.chunk_size = chunk_size
+        self._hash = hashlib.sha256()
+        self._done = False
+
+    def chunks(self) -> Iterator[bytes]:
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                self._hash.update(chunk)
+                yield chunk
+            self._done = True
+        finally:
+            self.response.close()
+
+    def result(self) -> CatalogFetch:
+        if not self._done:
+            raise RuntimeError("响应体尚未读完，无法给出内容哈希")
+        body_hash = self._hash.hexdigest()
+        status = HASH_MATCH if body_hash == self.fetcher.body_hash else CHANGED
+        self.fetcher._count(status)
+        return CatalogFetch(status, None, self.response.headers.get("ETag"),
+                            self.response.headers.get("Last-Modified"), body_hash)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 常驻守护进程 👑
+所有周期任务 (含每天的数据保留清理、每小时的列式归档导出) 在一个 asyncio 进程里按各自节奏运行 (调度语义见 scheduler.py)，
+代替 start_arbitrage.sh / gpu_monitor_fixed.sh / 各内容脚本各自冷启动
+
+常驻状态 (跨轮复用，不再每次重建)：
+- ArbitrageMonitor：存储句柄、模型解析缓存、参考价来源 (各自 TTL) 与索引、delta 当前价、条件请求校验状态
+- OpenRouter / 参考价来源 / Twitter 各一个 requests.Session，显卡零售商页面与 DeepSeek 警报推文生成各一个 httpx.AsyncClient
+- 存储层 get_storage 按路径缓存，报告/内容生成共用同一个写线程与读连接
+- SitePublisher：站点各产物的内容哈希，扫描后只重写变化的文件
+- Outbox：推文发件箱与限速令牌桶 (每天 09:10 入队，每 5 分钟 drain 一次，见 tweet_outbox.py)
+
+用法:
+  python scripts/daemon.py                # 前台运行 (SIGINT / SIGTERM 优雅退出)
+  python scripts/daemon.py --post         # 同时开启每日自动发推 (入队 + 发件箱 drain)
+  python scripts/daemon.py --deploy       # 同时开启站点变化文件自动推送 (site_publisher.py)
+  python scripts/daemon.py list           # 列出任务与下一次触发时间 (不打开数据库与网络客户端)
+  python scripts/daemon.py once <任务名> [--post] [--deploy]   # 立即运行某个任务一次 (开关同上)
+
+作者: 曹皇 👑
+"""
+
+import asyncio
+import signal
+import sys
+from datetime import datetime
+from typing import List
+
+import requests
+
+import generate_twitter
+import gpu_price_monitor
+import twitter_bot
+from alert_content import AsyncGenerator, gpu_alert_item, save_alert_content
+from async_scraper import AsyncScraper
+from generate_report import generate_hourly_report
+from gpu_price_monitor import (format_alert_message, monitor_gpu_prices, retailer_fetch_jobs,
+                               scraper_headers)
+from openrouter_arbitrage import ArbitrageMonitor
+from price_archive import ArchiveWriter
+from retention import run_retention
+from scheduler import CATCH_UP_SKIP, Job, Scheduler
+from site_publisher import SitePublisher, publish_latest
+from tweet_outbox import Outbox
+
+# === 任务节奏 (秒) ===
+ARBITRAGE_INTERVAL = 5 * 60
+GPU_INTERVAL = 60 * 60
+GPU_OFFSET = 7 * 60                 # 每小时 :07，错开整点的套利扫描
+ALERT_CONTENT_DEADLINE = 45         # 降价警报推文并发生成的整批截止时间 (含在 gpu_monitor 超时内)
+REPORT_INTERVAL = 60 * 60
+REPORT_OFFSET = 2 * 60              # 每小时 :02，等整点那轮扫描落库
+DAY = 24 * 60 * 60
+CONTENT_OFFSET = 9 * 60 * 60        # 每天 09:00 生成推文
+POST_OFFSET = 9 * 60 * 60 + 10 * 60  # 每天 09:10 放入发件箱
+OUTBOX_INTERVAL = 5 * 60            # 发件箱 drain (限速等待 / 退避重试到期的推文)
+OUTBOX_MAX_WAIT = 60                # 单次 drain 内最多就地等待的秒数
+RETENTION_OFFSET = 4 * 60 * 60 + 30 * 60  # 每天 04:30 清理过期数据
+ARCHIVE_INTERVAL = 60 * 60
+ARCHIVE_OFFSET = 12 * 60            # 每小时 :12 把新快照导出到列式归档
+AUTO_POST = False                   # 自动发推需显式开启 (--post)
+AUTO_DEPLOY = False                 # 站点变化文件自动推送需显式开启 (--deploy)
+
+
+class Daemon:
+    """持有跨轮复用的客户端与句柄，并把各脚本的入口包装成调度任务"""
+
+    def __init__(self, auto_post: bool = AUTO_POST, auto_deploy: bool = AUTO_DEPLOY):
+        self.auto_post = auto_post
+        self.auto_deploy = auto_deploy
+        self.monitor = None     # 首次运行任务时才打开数据库与参考价来源 (list 只需要任务表)
+        self.publisher = None   # 发布状态常驻内存，内容未变化的一轮不碰磁盘
+        self.scraper = AsyncScraper(headers=scraper_headers())
+        self.gpu_client = None  # httpx.AsyncClient 必须在事件循环里创建
+        self.alert_generator = AsyncGenerator(deadline=ALERT_CONTENT_DEADLINE)
+        self.llm_client = None
+        self.bot = None         # 首次发布时才读凭证 (key_manager 进程内缓存)
+        self.outbox = None
+
+    def jobs(self) -> List[Job]:
+        return [
+            Job("arbitrage", self.scan, ARBITRAGE_INTERVAL,
+                jitter=20, timeout=4 * 60, immediate=True),
+            Job("gpu_monitor", self.gpu_monitor, GPU_INTERVAL, offset=GPU_OFFSET,
+                jitter=60, timeout=90 + ALERT_CONTENT_DEADLINE),
+            Job("report", self.report, REPORT_INTERVAL, offset=REPORT_OFFSET,
+                timeout=60, catch_up=CATCH_UP_SKIP),
+            Job("twitter_content", generate_twitter.save_content, DAY, offset=CONTENT_OFFSET,
+                timeout=120),
+            Job("twitter_post", self.post, DAY, offset=POST_OFFSET, jitter=120, timeout=60,
+                catch_up=CATCH_UP_SKIP, enabled=self.auto_post),
+            Job("twitter_outbox", self.drain_outbox, OUTBOX_INTERVAL, timeout=3 * 60,
+                catch_up=CATCH_UP_SKIP, enabled=self.auto_post),
+            Job("retention", self.retention, DAY, offset=RETENTION_OFFSET, timeout=30 * 60,
+                catch_up=CATCH_UP_SKIP),
+            Job("archive", self.archive, ARCHIVE_INTERVAL, offset=ARCHIVE_OFFSET, timeout=10 * 60,
+                catch_up=CATCH_UP_SKIP),
+        ]
+
+    def _arbitrage(self):
+        if self.monitor is None:
+            self.monitor = ArbitrageMonitor(session=requests.Session())
+            self.publisher = SitePublisher()
+        return self.monitor, self.publisher
+
+    def scan(self):
+        """扫描后紧接着在同一线程里发布站点 (读的是本轮刚更新的当前价格)"""
+        monitor, publisher = self._arbitrage()
+        monitor.run_once()
+        publish_latest(monitor, deploy=self.auto_deploy, publisher=publisher)
+
+    async def gpu_monitor(self):
+        if self.gpu_client is None:
+            self.gpu_client = self.scraper.new_client()
+        pages = await self.scraper.fetch_all(retailer_fetch_jobs(), client=self.gpu_client)
+        results = await asyncio.to_thread(monitor_gpu_prices, pages)
+        if results["alerts"]:
+            print(format_alert_message(results))
+            await self.alert_content(results["alerts"])
+
+    async def alert_content(self, alerts):
+        """每个降价警报并发生成一条推文；开启自动发推时放入发件箱 (限速由发件箱负责)"""
+        if self.llm_client is None:
+            self.llm_client = self.alert_generator.new_client()
+        results = await self.alert_generator.generate_all(map(gpu_alert_item, alerts), client=self.llm_client)
+        paths = await asyncio.to_thread(save_alert_content, results, "gpu")
+        if self.auto_post:
+            _, outbox = await asyncio.to_thread(self._twitter)
+            for result, path in zip(results.values(), paths):
+                try:
+                    await asyncio.to_thread(outbox.enqueue, result.tweet, f"file:{path.name}")
+                except ValueError as e:  # 单条不合规不影响其余警报入队
+                    print(f"⚠️ 警报推文未入队 {path.name}: {e}")
+
+    def report(self):
+        monitor, publisher = self._arbitrage()
+        print(generate_hourly_report(monitor.db_path))
+        publisher.refresh_reports()  # 每小时重新列一次站点历史报告，扫描后的发布不碰目录
+
+    def retention(self):
+        run_retention({"arbitrage": self._arbitrage()[0].db_path, "gpu_prices": gpu_price_monitor.DB_PATH})
+
+    def archive(self):
+        stats = ArchiveWriter().export(self._arbitrage()[0].store)
+        print(f"📦 归档导出: 写入变化点 {stats['written']:,} 行 ({stats['elapsed']:.2f}s)")
+
+    def _twitter(self):
+        if self.bot is None:
+            self.bot = twitter_bot.TwitterBot()
+            self.outbox = Outbox()  # 令牌桶常驻内存，从库中已发记录恢复
+        return self.bot, self.outbox
+
+    def post(self):
+        twitter_bot.post_latest(*self._twitter())
+
+    def drain_outbox(self):
+        bot, outbox = self._twitter()
+        stats = outbox.drain(bot, max_wait=OUTBOX_MAX_WAIT)
+        if stats:
+            print(f"📤 发件箱: {dict(stats)}")
+
+    async def close(self):
+        if self.gpu_client is not None:
+            await self.gpu_client.aclose()
+        if self.llm_client is not None:
+            await self.llm_client.aclose()
+        if self.monitor is not None:
+            self.monitor.close()
+            self.monitor.session.close()
+        if self.bot is not None:
+            self.bot.session.close()
+
+
+async def serve(auto_post: bool, auto_deploy: bool):
+    daemon = Daemon(auto_post, auto_deploy)
+    scheduler = Scheduler(daemon.jobs())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, scheduler.stop)
+    try:
+        await scheduler.run()
+    finally:
+        await daemon.close()
+    for job in scheduler.jobs:
+        scheduler.log(f"{job.name}: {job.stats}")
+
+
+async def run_once(name: str, auto_post: bool = AUTO_POST, auto_deploy: bool = AUTO_DEPLOY):
+    daemon = Daemon(auto_post, auto_deploy)
+    job = next((j for j in daemon.jobs() if j.name == name), None)
+    if job is None or not job.enabled:
+        print(f"❌ 任务 {name} {'不存在' if job is None else '未开启 (发推任务需要 --post)'}")
+        return
+    try:
+        stats = await Scheduler(daemon.jobs(), log_path=None).run_job_once(name)
+    finally:
+        await daemon.close()
+    print(stats)
+
+
+def list_jobs():
+    now = datetime.now().timestamp()
+    print("👑 曹皇守护进程任务")
+    print("-" * 80)
+    print(f"{'任务':<16} {'周期':>8} {'超时':>6} {'抖动':>6} {'补跑':<6} {'下次触发':<20}")
+    for job in Daemon().jobs():
+        state = "" if job.enabled else " (未开启)"
+        print(f"{job.name:<16} {job.interval:>7g}s {job.timeout or 0:>5g}s {job.jitter:>5g}s "
+              f"{job.catch_up:<6} {datetime.fromtimestamp(job.next_tick(now)):%Y-%m-%d %H:%M:%S}{state}")
+    print("-" * 80)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "list":
+        list_jobs()
+    elif args and args[0] == "once":
+        asyncio.run(run_once(args[1], auto_post="--post" in args, auto_deploy="--deploy" in args))
+    else:
+        asyncio.run(serve(auto_post="--post" in args, auto_deploy="--deploy" in args))
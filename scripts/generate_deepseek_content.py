@@ -3,52 +3,119 @@
 曹皇 - DeepSeek 内容生成器
 使用 DeepSeek API 生成 Twitter 内容，成本降低 90%
 
+- 所有请求复用一个 requests.Session (连接池 + keep-alive)
+- 结果按 (模型, prompt, max_tokens, temperature) 缓存在 generation_cache.py；
+  推文一次请求 TWITTER_VARIANTS 个版本，之后几天直接从缓存逐个取用
+
+用法:
+  python generate_deepseek_content.py          - 生成一条推文并保存
+  python generate_deepseek_content.py stats    - 生成缓存命中率
+
 作者: 曹皇 👑
 """
 
 import requests
-import subprocess
-import json
 from datetime import datetime
 from pathlib import Path
 
+import metrics
+from generation_cache import cache_key, get_cache
+from key_manager import get_key
+
 CONTENT_PATH = Path.home() / ".openclaw" / "workspace" / "content"
+DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_MODEL = "deepseek-chat"
+TWITTER_VARIANTS = 5  # 一次请求生成的推文版本数
+VARIANT_SEPARATOR = "====="
+
+_session = None
+
+def get_session():
+    """进程内共享的 Session (连接池复用 TLS 连接)"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
 
 def get_deepseek_key():
-    result = subprocess.run(
-        ['security', 'find-generic-password', '-s', 'deepseek-api-key', '-w'],
-        capture_output=True, text=True
-    )
-    return result.stdout.strip() if result.returncode == 0 else None
-
-def generate_with_deepseek(prompt, max_tokens=500):
-    """使用 DeepSeek 生成内容"""
-    key = get_deepseek_key()
-    if not key:
-        return None
-    
+    return get_key('deepseek')
+
+def build_request(key, prompt, max_tokens, temperature=0.7):
+    """chat/completions 的 (请求头, 请求体)；同步与异步 (alert_content.py) 调用共用"""
     headers = {
         "Authorization": f"Bearer {key}",
         "Content-Type": "application/json"
     }
     
     payload = {
-        "model": "deepseek-chat",
+        "model": DEEPSEEK_MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": max_tokens,
-        "temperature": 0.7
+        "temperature": temperature
     }
+    return headers, payload
+
+def parse_completion(data):
+    """响应 JSON → (内容, 消耗 token 数)"""
+    return data['choices'][0]['message']['content'], data.get('usage', {}).get('total_tokens', 0)
+
+def request_completion(prompt, max_tokens, temperature=0.7):
+    """调用一次 chat/completions，返回 (内容, 消耗 token 数)；失败返回 (None, 0)"""
+    key = get_deepseek_key()
+    if not key:
+        return None, 0
+    
+    headers, payload = build_request(key, prompt, max_tokens, temperature)
     
     try:
-        response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",
-            headers=headers, json=payload, timeout=30
-        )
+        with metrics.timer("generate", source="deepseek"):
+            response = get_session().post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=30)
         if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        return None
-    except:
+            return parse_completion(response.json())
+        return None, 0
+    except Exception:
+        return None, 0
+
+def split_variants(content):
+    """按分隔行拆出各个版本 (去掉空版本)"""
+    variants, current = [], []
+    for line in content.strip().split('\n'):
+        if line.strip() == VARIANT_SEPARATOR:
+            variants.append('\n'.join(current).strip())
+            current = []
+        else:
+            current.append(line)
+    variants.append('\n'.join(current).strip())
+    return [v for v in variants if v]
+
+def generate_with_deepseek(prompt, max_tokens=500, temperature=0.7, variants=1, use_cache=True):
+    """
+    使用 DeepSeek 生成内容 (先查缓存)
+
+    variants > 1 时一次请求生成多个版本 (max_tokens 按单个版本计)，本次返回第一个，
+    其余留在缓存里供之后的调用逐个取用
+    """
+    cache = get_cache() if use_cache else None
+    key = cache_key(DEEPSEEK_MODEL, prompt, max_tokens, temperature, variants)
+    if cache is not None:
+        cached = cache.take(key)
+        if cached is not None:
+            return cached
+    
+    if variants > 1:
+        request_prompt = (f"{prompt}\n\n请写 {variants} 个不同的版本，版本之间用单独一行 "
+                          f"{VARIANT_SEPARATOR} 分隔，不要编号，不要其他说明。")
+        content, tokens = request_completion(request_prompt, max_tokens * variants, temperature)
+        results = split_variants(content) if content else []
+    else:
+        content, tokens = request_completion(prompt, max_tokens, temperature)
+        results = [content] if content else []
+    
+    if not results:
         return None
+    if cache is None:
+        return results[0]
+    return cache.put(key, DEEPSEEK_MODEL, results, tokens)
 
 def generate_twitter_content():
     """生成 Twitter 内容"""
@@ -62,7 +129,7 @@ def generate_twitter_content():
 
 示例内容：监控发现RTX 4090降价8%，现在是入手好时机。"""
     
-    return generate_with_deepseek(prompt, max_tokens=200)
+    return generate_with_deepseek(prompt, max_tokens=200, variants=TWITTER_VARIANTS)
 
 def save_content():
     CONTENT_PATH.mkdir(exist_ok=True)
@@ -83,4 +150,12 @@ def save_content():
         return False
 
 if __name__ == "__main__":
-    save_content()
+    import sys
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        s = get_cache().stats()
+        print(f"生成缓存命中率 (最近 {s['days']} 天): {s['hit_rate']:.1%} "
+              f"({s['hits']} 命中 / {s['misses']} 未命中，节省约 {s['tokens_saved']:,} token)")
+    else:
+        save_content()
+        metrics.export()
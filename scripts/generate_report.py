@@ -6,59 +6,42 @@
 作者: 曹皇 👑
 """
 
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 
+import metrics
+from rollups import hour_summary, last_full_hour, top_signals
+from storage import get_storage
+
 DB_PATH = Path.home() / ".openclaw" / "workspace" / "data" / "arbitrage.db"
 
-def generate_hourly_report():
+@metrics.timed("report_render", report="hourly")
+def generate_hourly_report(db_path=DB_PATH):
     """生成小时级报告"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
-    
-    # 统计过去1小时数据点 (使用正确的列名)
-    cursor.execute('''
-        SELECT COUNT(*) FROM price_snapshots WHERE timestamp > ?
-    ''', (one_hour_ago,))
-    snapshot_count = cursor.fetchone()[0]
-    
-    # 统计套利机会
-    cursor.execute('''
-        SELECT COUNT(*), AVG(ABS(prompt_diff_pct)) 
-        FROM arbitrage_opportunities 
-        WHERE timestamp > ?
-    ''', (one_hour_ago,))
-    opp_stats = cursor.fetchone()
+    store = get_storage(db_path, schema="arbitrage")
     
-    # 获取最佳套利机会 (使用正确的列名)
-    cursor.execute('''
-        SELECT model_id, or_prompt_price, direct_prompt_price, prompt_diff_pct
-        FROM arbitrage_opportunities 
-        WHERE timestamp > ?
-        ORDER BY ABS(prompt_diff_pct) DESC LIMIT 3
-    ''', (one_hour_ago,))
-    top_opps = cursor.fetchall()
+    # 只读汇总表里最近一个整点小时的桶 (耗时与历史长度无关)
+    bucket = last_full_hour()
+    snapshot_count, opp_count, avg_abs_diff = hour_summary(store, bucket)
     
-    conn.close()
+    # 该小时价差最大的模型
+    top_opps = top_signals(store, bucket, 3)
     
-    avg_diff = (opp_stats[1] or 0) * 100
+    avg_diff = avg_abs_diff * 100
     
     # 构建报告
     report = f"""
 👑 **曹皇套利监控小时报告**
 
-**扫描统计**
+**扫描统计** ({bucket.replace('T', ' ')}:00 - {bucket[-2:]}:59)
 - 📡 扫描模型数: {snapshot_count} 个
-- 💎 套利机会: {opp_stats[0]} 次
+- 💎 套利机会: {opp_count} 次
 - 📊 平均价差: {avg_diff:.1f}%
 
 **🔥 TOP 3 套利信号**
 """
     
-    for idx, (model, or_price, direct_price, diff) in enumerate(top_opps, 1):
+    for idx, (model, diff) in enumerate(top_opps, 1):
         direction = "便宜" if diff > 0 else "贵"
         report += f"{idx}. {model.split('/')[-1]}: OpenRouter 比直供{direction} {abs(diff)*100:.0f}%\n"
     
@@ -71,3 +54,4 @@ def generate_hourly_report():
 
 if __name__ == "__main__":
     print(generate_hourly_report())
+    metrics.export()
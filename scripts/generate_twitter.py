@@ -6,30 +6,23 @@
 作者: 曹皇 👑
 """
 
-import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
+import metrics
+from rollups import best_deals
+from storage import get_storage
+
 DB_PATH = Path.home() / ".openclaw" / "workspace" / "data" / "arbitrage.db"
 CONTENT_PATH = Path.home() / ".openclaw" / "workspace" / "content"
 
-def generate_twitter_thread():
+@metrics.timed("report_render", report="twitter")
+def generate_twitter_thread(db_path=DB_PATH):
     """生成 Twitter 线程内容"""
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # 获取最佳套利机会
-    cursor.execute('''
-        SELECT model_id, prompt_diff_pct, timestamp
-        FROM arbitrage_opportunities 
-        WHERE prompt_diff_pct > 0
-        ORDER BY prompt_diff_pct DESC LIMIT 5
-    ''')
-    
-    deals = cursor.fetchall()
-    conn.close()
+    # 获取最佳套利机会 (天汇总表，昨天至今)
+    deals = best_deals(get_storage(db_path, schema="arbitrage"), datetime.now() - timedelta(days=1), 5)
     
     thread = []
     
@@ -43,7 +36,7 @@ def generate_twitter_thread():
 #AI #API #OpenRouter #省钱""")
 
     # 推文 2-4: 具体机会
-    for idx, (model, diff, ts) in enumerate(deals[:3], 1):
+    for idx, (model, diff) in enumerate(deals[:3], 1):
         savings = diff * 100
         if "gpt-4o-mini" in model:
             emoji = "🔥"
@@ -124,3 +117,4 @@ def save_content():
 
 if __name__ == "__main__":
     save_content()
+    metrics.export()
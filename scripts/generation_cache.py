@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 内容生成结果缓存 👑
+同一个 (模型, prompt, max_tokens, temperature, 版本数) 在 TTL 内不再重复调用 API
+
+- 单版本条目：TTL 内每次命中都返回同一段内容
+- 多版本条目 (variants > 1)：一次请求生成 N 个版本，之后每次命中取下一个未用过的，
+  用完再请求新一批 (每天的推文不会重复)
+- 条目存 SQLite (generation_cache.db)，过期的按 TTL 删除，超过 MAX_ENTRIES 按最近使用时间淘汰
+- 命中/未命中与节省的 token 按天累计在 generation_stats，stats 命令查看命中率；
+  进程内另计 metrics 计数 llm_cache{result=hit/miss}
+
+用法:
+  python scripts/generation_cache.py stats [天数]   # 命中率与节省的 token (默认 7 天)
+  python scripts/generation_cache.py prune          # 立即清理过期条目
+  python scripts/generation_cache.py clear          # 清空缓存条目 (保留统计)
+
+作者: 曹皇 👑
+"""
+
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import metrics
+from storage import get_storage
+
+DB_PATH = Path.home() / ".openclaw" / "workspace" / "data" / "generation_cache.db"
+CACHE_TTL = 3 * 24 * 60 * 60   # 秒
+MAX_ENTRIES = 500
+
+
+def cache_key(model: str, prompt: str, max_tokens: int, temperature: float, variants: int = 1) -> str:
+    raw = json.dumps([model, prompt, max_tokens, temperature, variants], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, db_path: Path = DB_PATH, ttl: float = CACHE_TTL, max_entries: int = MAX_ENTRIES):
+        self.store = get_storage(db_path, schema="generation_cache")
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def take(self, key: str) -> Optional[str]:
+        """命中返回内容 (多版本条目取下一个未用过的)，未命中/已用完/已过期返回 None"""
+        now = time.time()
+
+        def take_in_tx(conn) -> Optional[str]:
+            row = conn.execute('''
+                SELECT variants, served, tokens FROM generation_cache WHERE key = ? AND expires_at > ?
+            ''', (key, now)).fetchone()
+            content, saved = None, 0
+            if row is not None:
+                variants, served = json.loads(row[0]), row[1]
+                if len(variants) == 1 or served < len(variants):
+                    content = variants[0] if len(variants) == 1 else variants[served]
+                    saved = (row[2] or 0) // len(variants)
+                    conn.execute('''
+                        UPDATE generation_cache SET served = served + 1, hits = hits + 1, last_used = ?
+                        WHERE key = ?
+                    ''', (now, key))
+            _record(conn, now, hits=content is not None, misses=content is None, tokens_saved=saved)
+            return content
+
+        content = self.store.call(take_in_tx)
+        metrics.count("llm_cache", result="miss" if content is None else "hit")
+        return content
+
+    def put(self, key: str, model: str, variants: List[str], tokens: int = 0) -> str:
+        """写入新生成的结果 (覆盖同键旧条目)，返回第一个版本 (已算作使用过)"""
+        now = time.time()
+        with self.store.transaction():
+            self.store.execute('''
+                INSERT OR REPLACE INTO generation_cache
+                    (key, model, variants, served, tokens, hits, created_at, expires_at, last_used)
+                VALUES (?, ?, ?, 1, ?, 0, ?, ?, ?)
+            ''', (key, model, json.dumps(variants, ensure_ascii=False), tokens, now, now + self.ttl, now))
+            self.store.execute(_RECORD_SQL, (_day(now), 0, 0, tokens, 0))
+            self._evict(now)
+        return variants[0]
+
+    def _evict(self, now: float):
+        self.store.execute("DELETE FROM generation_cache WHERE expires_at <= ?", (now,))
+        self.store.execute('''
+            DELETE FROM generation_cache WHERE key IN (
+                SELECT key FROM generation_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def prune(self):
+        with self.store.transaction():
+            self._evict(time.time())
+
+    def clear(self):
+        self.store.execute("DELETE FROM generation_cache")
+
+    def stats(self, days: int = 7) -> Dict:
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        hits, misses, used, saved = self.store.query_one('''
+            SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0),
+                   COALESCE(SUM(tokens_used), 0), COALESCE(SUM(tokens_saved), 0)
+            FROM generation_stats WHERE day >= ?
+        ''', (since,))
+        entries = self.store.query_one(
+            "SELECT COUNT(*) FROM generation_cache WHERE expires_at > ?", (time.time(),))[0]
+        lookups = hits + misses
+        return {"days": days, "entries": entries, "hits": hits, "misses": misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "tokens_used": used, "tokens_saved": saved}
+
+
+_RECORD_SQL = '''
+    INSERT INTO generation_stats (day, hits, misses, tokens_used, tokens_saved) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(day) DO UPDATE SET
+        hits = hits + excluded.hits, misses = misses + excluded.misses,
+        tokens_used = tokens_used + excluded.tokens_used, tokens_saved = tokens_saved + excluded.tokens_saved
+'''
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def _record(conn, now: float, hits: bool = False, misses: bool = False, tokens_saved: int = 0):
+    conn.execute(_RECORD_SQL, (_day(now), int(hits), int(misses), 0, tokens_saved))
+
+
+_cache: Optional[GenerationCache] = None
+
+
+def get_cache() -> GenerationCache:
+    global _cache
+    if _cache is None:
+        _cache = GenerationCache()
+    return _cache
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "stats"
+    cache = get_cache()
+    if command == "prune":
+        cache.prune()
+        print("✅ 已清理过期 / 超出容量的条目")
+    elif command == "clear":
+        cache.clear()
+        print("✅ 已清空缓存条目")
+    elif command == "stats":
+        s = cache.stats(int(args[1]) if len(args) > 1 else 7)
+        print(f"👑 曹皇生成缓存 (最近 {s['days']} 天)")
+        print("-" * 50)
+        print(f"有效条目: {s['entries']}")
+        print(f"命中 / 未命中: {s['hits']} / {s['misses']}  (命中率 {s['hit_rate']:.1%})")
+        print(f"API 消耗 token: {s['tokens_used']:,}  缓存节省约: {s['tokens_saved']:,}")
+    else:
+        print(__doc__)
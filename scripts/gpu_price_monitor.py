@@ -5,13 +5,18 @@
 """
 
 import json
-import sqlite3
 import re
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import urllib.request
 import urllib.error
 
+import metrics
+from async_scraper import AsyncScraper, FetchJob
+from retail_extractors import extract_products
+from storage import get_storage
+
 # 数据库路径
 DB_PATH = Path.home() / ".openclaw/workspace/data/gpu_prices.db"
 DATA_DIR = Path.home() / ".openclaw/workspace/data"
@@ -68,40 +73,8 @@ RETAILERS = {
 }
 
 def init_db():
-    """初始化数据库"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # 价格历史表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS price_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            gpu_model TEXT NOT NULL,
-            retailer TEXT NOT NULL,
-            product_name TEXT,
-            price REAL,
-            currency TEXT DEFAULT 'USD',
-            in_stock BOOLEAN,
-            url TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # 降价警报表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS price_alerts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            gpu_model TEXT NOT NULL,
-            retailer TEXT NOT NULL,
-            old_price REAL,
-            new_price REAL,
-            drop_percent REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """初始化数据库 (表结构与索引见 migrations.py)"""
+    get_storage(DB_PATH, schema="gpu_prices")
 
 def get_headers():
     """获取请求头"""
@@ -122,19 +95,19 @@ def fetch_url(url):
     except Exception as e:
         return f"ERROR: {e}"
 
+# 通用价格正则模式 (加载时编译一次)
+PRICE_PATTERNS = [
+    re.compile(r'\$([\d,]+\.?\d*)'),  # $1,299.99
+    re.compile(r'([\d,]+\.?\d*)\s*USD'),  # 1299.99 USD
+    re.compile(r'price[\"\']?\s*[:=]\s*[\"\']?\$?([\d,]+\.?\d*)'),  # price: 1299.99
+]
+
 def extract_prices_from_html(html, retailer):
     """从HTML中提取价格"""
     prices = []
     
-    # 通用价格正则模式
-    price_patterns = [
-        r'\$([\d,]+\.?\d*)',  # $1,299.99
-        r'([\d,]+\.?\d*)\s*USD',  # 1299.99 USD
-        r'price[\"\']?\s*[:=]\s*[\"\']?\$?([\d,]+\.?\d*)',  # price: 1299.99
-    ]
-    
-    for pattern in price_patterns:
-        matches = re.findall(pattern, html)
+    for pattern in PRICE_PATTERNS:
+        matches = pattern.findall(html)
         for match in matches:
             try:
                 price_str = match.replace(',', '')
@@ -146,130 +119,130 @@ def extract_prices_from_html(html, retailer):
     
     return prices
 
+def build_search_url(retailer, gpu_model):
+    """拼接零售商搜索页URL"""
+    return RETAILERS[retailer]["base_url"] + RETAILERS[retailer]["search_urls"][gpu_model]
+
 def scrape_newegg_prices(gpu_model):
     """抓取Newegg价格"""
-    url = RETAILERS["newegg"]["base_url"] + RETAILERS["newegg"]["search_urls"][gpu_model]
-    html = fetch_url(url)
+    html = fetch_url(build_search_url("newegg", gpu_model))
     
     if html.startswith("ERROR"):
         return []
     
-    prices = []
-    
-    # Newegg 特定模式
-    # 商品块模式
-    item_pattern = r'<div class="item-container"[^>]*>(.*?)</div>\s*</div>\s*</div>'
-    items = re.findall(item_pattern, html, re.DOTALL)
-    
-    for item in items[:5]:  # 只取前5个结果
-        price_match = re.search(r'<li class="price-current">\s*<strong>(\d+)</strong>\s*<sup>(\d+)</sup>', item)
-        title_match = re.search(r'<a[^>]*class="item-title"[^>]*>(.*?)</a>', item, re.DOTALL)
-        
-        if price_match and title_match:
-            try:
-                dollars = price_match.group(1)
-                cents = price_match.group(2)
-                price = float(f"{dollars}.{cents}")
-                title = re.sub(r'<[^>]+>', '', title_match.group(1)).strip()
-                
-                # 验证是否是目标型号
-                keywords = GPU_MODELS[gpu_model]["keywords"]
-                if any(kw.lower() in title.lower() for kw in keywords):
-                    prices.append({
-                        "retailer": "Newegg",
-                        "product_name": title[:100],
-                        "price": price,
-                        "in_stock": "out of stock" not in item.lower() and "sold out" not in item.lower()
-                    })
-            except:
-                continue
-    
-    return prices
+    return parse_newegg_html(html, gpu_model)
+
+def parse_newegg_html(html, gpu_model):
+    """解析Newegg搜索页"""
+    return extract_products("newegg", html, GPU_MODELS[gpu_model]["keywords"])
 
 def scrape_bestbuy_prices(gpu_model):
     """抓取Best Buy价格"""
-    url = RETAILERS["bestbuy"]["base_url"] + RETAILERS["bestbuy"]["search_urls"][gpu_model]
-    html = fetch_url(url)
+    html = fetch_url(build_search_url("bestbuy", gpu_model))
     
     if html.startswith("ERROR"):
         return []
     
-    prices = []
-    
-    # Best Buy 特定模式
-    # 价格模式: $1,299.99
-    price_pattern = r'class="sr-price"[^>]*>.*?\$([\d,]+\.\d{2})'
-    title_pattern = r'class="sku-title"[^>]*>.*?<a[^>]*>(.*?)</a>'
-    
-    price_matches = re.findall(price_pattern, html, re.DOTALL)
-    title_matches = re.findall(title_pattern, html, re.DOTALL)
-    
-    for i, (price_str, title_html) in enumerate(zip(price_matches[:5], title_matches[:5])):
-        try:
-            price = float(price_str.replace(',', ''))
-            title = re.sub(r'<[^>]+>', '', title_html).strip()
-            
-            keywords = GPU_MODELS[gpu_model]["keywords"]
-            if any(kw.lower() in title.lower() for kw in keywords):
-                prices.append({
-                    "retailer": "Best Buy",
-                    "product_name": title[:100],
-                    "price": price,
-                    "in_stock": True  # Best Buy通常只显示有货商品
-                })
-        except:
-            continue
-    
-    return prices
+    return parse_bestbuy_html(html, gpu_model)
+
+def parse_bestbuy_html(html, gpu_model):
+    """解析Best Buy搜索页"""
+    return extract_products("bestbuy", html, GPU_MODELS[gpu_model]["keywords"])
+
+# 已实现解析器的零售商 (按输出顺序)
+PAGE_PARSERS = {
+    "newegg": parse_newegg_html,
+    "bestbuy": parse_bestbuy_html,
+}
+
+def retailer_fetch_jobs(gpu_models=None):
+    """所有 零售商×型号 搜索页的抓取任务"""
+    gpu_models = list(gpu_models or GPU_MODELS.keys())
+    return [
+        FetchJob(key=(retailer, gpu_model), url=build_search_url(retailer, gpu_model))
+        for gpu_model in gpu_models
+        for retailer in PAGE_PARSERS
+    ]
+
+def scraper_headers():
+    """httpx 自行协商压缩格式并解压，不沿用 urllib 的 Accept-Encoding"""
+    return {k: v for k, v in get_headers().items() if k != 'Accept-Encoding'}
+
+def fetch_all_retailer_pages(gpu_models=None):
+    """并发抓取所有 零售商×型号 搜索页，返回 {(retailer, gpu_model): FetchResult}"""
+    return AsyncScraper(headers=scraper_headers()).run(retailer_fetch_jobs(gpu_models))
 
 def get_baseline_price(gpu_model, retailer):
     """获取基准价格（上次记录的价格）"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    result = get_storage(DB_PATH).query_one('''
         SELECT price FROM price_history 
         WHERE gpu_model = ? AND retailer = ? 
         ORDER BY timestamp DESC LIMIT 1
     ''', (gpu_model, retailer))
     
-    result = cursor.fetchone()
-    conn.close()
-    
     return result[0] if result else None
 
 def save_price(gpu_model, retailer, product_name, price, in_stock):
-    """保存价格记录"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    """保存价格记录 (在 store.transaction() 内调用时随扫描一起提交)"""
+    get_storage(DB_PATH).execute('''
         INSERT INTO price_history (gpu_model, retailer, product_name, price, in_stock)
         VALUES (?, ?, ?, ?, ?)
     ''', (gpu_model, retailer, product_name, price, in_stock))
-    
-    conn.commit()
-    conn.close()
 
 def save_alert(gpu_model, retailer, old_price, new_price, drop_percent):
     """保存降价警报"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    get_storage(DB_PATH).execute('''
         INSERT INTO price_alerts (gpu_model, retailer, old_price, new_price, drop_percent)
         VALUES (?, ?, ?, ?, ?)
     ''', (gpu_model, retailer, old_price, new_price, drop_percent))
-    
-    conn.commit()
-    conn.close()
 
-def check_price_drops(gpu_model, retailer, new_price):
-    """检查是否降价 >= 5%"""
-    baseline = get_baseline_price(gpu_model, retailer)
-    
+class BaselineCache:
+    """
+    单轮运行内的基准价缓存: {(gpu_model, retailer, product_name): 最新价格}
+
+    开始时一次分组查询载入每个商品的最新价格，降价检查只读内存；
+    本轮新价格先更新到内存 (同一商品再次出现时以本轮价格为基准)，结束时 flush 批量写回
+    """
+
+    def __init__(self):
+        self.prices: Dict[Tuple[str, str, str], float] = {}
+        self.pending: List[tuple] = []
+
+    def load(self, gpu_models=None):
+        """
+        载入 gpu_models (默认 GPU_MODELS 全部型号) 下每个商品的最新价格
+
+        按 MAX(id) 取行：timestamp 只精确到秒，同一次 flush 的行时间相同，
+        同一商品一轮出现多次时要与内存里"后写入的为准"一致
+        """
+        gpu_models = list(gpu_models or GPU_MODELS)
+        rows = get_storage(DB_PATH).query(f'''
+            SELECT gpu_model, retailer, product_name, price, MAX(id)
+            FROM price_history
+            WHERE gpu_model IN ({", ".join("?" * len(gpu_models))})
+            GROUP BY gpu_model, retailer, product_name
+        ''', gpu_models)
+        self.prices = {(m, r, p): price for m, r, p, price, _ in rows}
+        return self
+
+    def get(self, gpu_model, retailer, product_name) -> Optional[float]:
+        return self.prices.get((gpu_model, retailer, product_name))
+
+    def update(self, gpu_model, retailer, product_name, price, in_stock):
+        self.prices[(gpu_model, retailer, product_name)] = price
+        self.pending.append((gpu_model, retailer, product_name, price, in_stock))
+
+    def flush(self) -> int:
+        """把本轮价格一次性写入 price_history，返回写入行数"""
+        written = get_storage(DB_PATH).insert_rows(
+            "price_history", ("gpu_model", "retailer", "product_name", "price", "in_stock"), self.pending)
+        self.pending = []
+        return written
+
+def check_price_drops(baseline, new_price):
+    """检查是否降价 >= 5% (baseline 为 None 表示首次出现，无基准价格)"""
     if baseline is None:
-        return None  # 首次运行，无基准价格
+        return None
     
     if new_price < baseline:
         drop_percent = ((baseline - new_price) / baseline) * 100
@@ -282,8 +255,13 @@ def check_price_drops(gpu_model, retailer, new_price):
     
     return None
 
-def monitor_gpu_prices():
-    """主监控函数"""
+def monitor_gpu_prices(pages=None):
+    """
+    主监控函数
+
+    pages: 已抓取好的 {(retailer, gpu_model): FetchResult}；调度器用常驻的 httpx 客户端抓取后传入，
+    为 None 时本函数自行并发抓取
+    """
     init_db()
     
     results = {
@@ -296,75 +274,89 @@ def monitor_gpu_prices():
     print(f"👑 曹皇显卡监控启动 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("-" * 60)
     
-    for gpu_model in GPU_MODELS.keys():
-        print(f"\n🔍 监控 {gpu_model}...")
-        
-        # 抓取各零售商价格
-        all_retailer_prices = []
+    # 一次性并发抓取所有页面
+    if pages is None:
+        pages = fetch_all_retailer_pages()
+    
+    # 每个商品的上次价格一次载入，降价检查只查内存
+    baselines = BaselineCache().load()
+    
+    # 本轮所有价格/警报写入合并为一个事务
+    with get_storage(DB_PATH).transaction():
+        for gpu_model in GPU_MODELS.keys():
+            print(f"\n🔍 监控 {gpu_model}...")
         
-        # Newegg
-        try:
-            newegg_prices = scrape_newegg_prices(gpu_model)
-            all_retailer_prices.extend(newegg_prices)
-            print(f"  Newegg: 找到 {len(newegg_prices)} 个商品")
-        except Exception as e:
-            print(f"  Newegg: 抓取失败 - {e}")
+            # 解析各零售商价格
+            all_retailer_prices = []
         
-        # Best Buy
-        try:
-            bestbuy_prices = scrape_bestbuy_prices(gpu_model)
-            all_retailer_prices.extend(bestbuy_prices)
-            print(f"  Best Buy: 找到 {len(bestbuy_prices)} 个商品")
-        except Exception as e:
-            print(f"  Best Buy: 抓取失败 - {e}")
+            for retailer_key, parse_page in PAGE_PARSERS.items():
+                retailer_name = RETAILERS[retailer_key]["name"]
+                page = pages[(retailer_key, gpu_model)]
+                tags = {"source": "gpu", "retailer": retailer_key, "model": gpu_model}
+                metrics.observe("fetch", page.elapsed, **tags)
+                metrics.observe("queue_wait", page.wait, **tags)
+                if not page.ok:
+                    metrics.count("fetch_errors", **tags)
+                    print(f"  {retailer_name}: 抓取失败 - {page.error}")
+                    continue
+                try:
+                    with metrics.timer("parse", **tags):
+                        retailer_prices = parse_page(page.html, gpu_model)
+                    metrics.count("products", len(retailer_prices), **tags)
+                    all_retailer_prices.extend(retailer_prices)
+                    print(f"  {retailer_name}: 找到 {len(retailer_prices)} 个商品 ({page.elapsed:.1f}s)")
+                except Exception as e:
+                    print(f"  {retailer_name}: 解析失败 - {e}")
         
-        # 处理价格数据
-        for item in all_retailer_prices:
-            retailer = item["retailer"]
-            price = item["price"]
-            product_name = item["product_name"]
-            in_stock = item["in_stock"]
-            
-            # 保存价格记录
-            save_price(gpu_model, retailer, product_name, price, in_stock)
+            # 处理价格数据
+            for item in all_retailer_prices:
+                retailer = item["retailer"]
+                price = item["price"]
+                product_name = item["product_name"]
+                in_stock = item["in_stock"]
             
-            results["all_prices"].append({
-                "gpu_model": gpu_model,
-                "retailer": retailer,
-                "product_name": product_name,
-                "price": price,
-                "in_stock": in_stock
-            })
-            
-            # 检查降价
-            price_drop = check_price_drops(gpu_model, retailer, price)
-            
-            if price_drop:
-                alert = {
+                results["all_prices"].append({
                     "gpu_model": gpu_model,
                     "retailer": retailer,
                     "product_name": product_name,
-                    "old_price": price_drop["old_price"],
-                    "new_price": price_drop["new_price"],
-                    "drop_percent": price_drop["drop_percent"],
+                    "price": price,
                     "in_stock": in_stock
-                }
-                results["alerts"].append(alert)
-                save_alert(gpu_model, retailer, price_drop["old_price"], price_drop["new_price"], price_drop["drop_percent"])
-                print(f"  🚨 降价警报: {retailer} ${price_drop['old_price']:.2f} → ${price_drop['new_price']:.2f} (-{price_drop['drop_percent']}%)")
-            else:
-                baseline = get_baseline_price(gpu_model, retailer)
-                if baseline is None:
-                    results["new_baselines"].append({
+                })
+            
+                # 检查降价 (先与上次价格比较，再把本轮价格记为新基准)
+                baseline = baselines.get(gpu_model, retailer, product_name)
+                price_drop = check_price_drops(baseline, price)
+                baselines.update(gpu_model, retailer, product_name, price, in_stock)
+            
+                if price_drop:
+                    alert = {
                         "gpu_model": gpu_model,
                         "retailer": retailer,
-                        "price": price
-                    })
-                    print(f"  📊 建立基准: {retailer} ${price:.2f}")
+                        "product_name": product_name,
+                        "old_price": price_drop["old_price"],
+                        "new_price": price_drop["new_price"],
+                        "drop_percent": price_drop["drop_percent"],
+                        "in_stock": in_stock
+                    }
+                    results["alerts"].append(alert)
+                    metrics.count("alerts", source="gpu", retailer=retailer, model=gpu_model)
+                    save_alert(gpu_model, retailer, price_drop["old_price"], price_drop["new_price"], price_drop["drop_percent"])
+                    print(f"  🚨 降价警报: {retailer} ${price_drop['old_price']:.2f} → ${price_drop['new_price']:.2f} (-{price_drop['drop_percent']}%)")
                 else:
-                    change = ((price - baseline) / baseline) * 100
-                    change_emoji = "📈" if change > 0 else "📉" if change < 0 else "➡️"
-                    print(f"  {change_emoji} {retailer}: ${price:.2f} (基准: ${baseline:.2f}, {'+' if change > 0 else ''}{change:.1f}%)")
+                    if baseline is None:
+                        results["new_baselines"].append({
+                            "gpu_model": gpu_model,
+                            "retailer": retailer,
+                            "price": price
+                        })
+                        print(f"  📊 建立基准: {retailer} ${price:.2f}")
+                    else:
+                        change = ((price - baseline) / baseline) * 100
+                        change_emoji = "📈" if change > 0 else "📉" if change < 0 else "➡️"
+                        print(f"  {change_emoji} {retailer}: ${price:.2f} (基准: ${baseline:.2f}, {'+' if change > 0 else ''}{change:.1f}%)")
+        
+        # 本轮价格批量写回
+        baselines.flush()
     
     print("\n" + "-" * 60)
     print(f"✅ 监控完成 - 发现 {len(results['alerts'])} 个降价警报")
@@ -411,7 +403,9 @@ def format_alert_message(results):
     return msg
 
 if __name__ == "__main__":
-    results = monitor_gpu_prices()
+    with metrics.timer("scan", source="gpu"):
+        results = monitor_gpu_prices()
+    metrics.export()
     
     # 输出JSON结果
     print("\n" + "=" * 60)
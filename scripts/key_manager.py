@@ -1,86 +1,257 @@
 #!/usr/bin/env python3
 """
 曹皇 - API Key 管理器
-从 macOS Keychain 安全读取 API Keys
+统一的凭证读取入口，按顺序查询多个后端，每个进程内解析一次并按 TTL 缓存
+
+后端 (BACKEND_ORDER 依次查询，先命中者生效)：
+- env        环境变量，名字由服务名转换: deepseek-api-key → DEEPSEEK_API_KEY
+- dotenv     ENV_FILE (.env 格式，python-dotenv 解析)，整个文件只读一次
+- encrypted  ENCRYPTED_FILE (.env 内容经 openssl AES-256 加密)，口令取自环境变量
+             CAOHUANG_SECRETS_PASSPHRASE，整个文件只解密一次 (一次 openssl 调用)
+- keychain   macOS Keychain (security 命令，仅 macOS；每个服务最多调用一次)
+
+未找到的服务也会缓存 (TTL 内不再重复查 Keychain)
+
+用法:
+  python key_manager.py check               - 检查所有 keys 及来源后端
+  python key_manager.py load                - 加载到环境变量
+  python key_manager.py get <服务>           - 打印某个 key (供 shell 脚本使用)
+  python key_manager.py encrypt <.env 文件>  - 生成加密凭证文件
 
 作者: 曹皇 👑
 """
 
-import subprocess
+import io
 import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import dotenv_values
+
+WORKSPACE = Path.home() / ".openclaw" / "workspace"
+ENV_FILE = WORKSPACE / ".env"
+ENCRYPTED_FILE = WORKSPACE / "secrets.env.enc"
+PASSPHRASE_ENV = "CAOHUANG_SECRETS_PASSPHRASE"
+OPENSSL_ARGS = ["-aes-256-cbc", "-pbkdf2", "-iter", "200000", "-salt"]
+BACKEND_ORDER = ("env", "dotenv", "encrypted", "keychain")
+CACHE_TTL = 3600  # 秒
 
-# Keychain 服务名映射
+# 服务简称 → Keychain 服务名
 KEY_SERVICES = {
     'openrouter': 'openrouter-api-key',
     'deepseek': 'deepseek-api-key',
     'together': 'together-api-key',
     'github': 'github-token',
+    'twitter-consumer-key': 'twitter-consumer-key',
+    'twitter-consumer-secret': 'twitter-consumer-secret',
+    'twitter-access-token': 'twitter-access-token',
+    'twitter-access-secret': 'twitter-access-secret',
 }
 
-def get_key(service_name):
-    """从 macOS Keychain 获取 API Key"""
-    service = KEY_SERVICES.get(service_name, service_name)
-    try:
+
+def env_name(service: str) -> str:
+    """Keychain 服务名对应的环境变量 / .env 键名"""
+    return service.upper().replace('-', '_')
+
+
+# === 后端 ===
+
+class EnvBackend:
+    name = "env"
+
+    def lookup(self, service: str) -> Optional[str]:
+        return os.environ.get(env_name(service)) or None
+
+
+class DotenvBackend:
+    """.env 文件，首次查询时整体读入"""
+    name = "dotenv"
+
+    def __init__(self, path: Path = ENV_FILE):
+        self.path = Path(path)
+        self._values: Optional[Dict[str, Optional[str]]] = None
+
+    def load(self) -> Dict[str, Optional[str]]:
+        return dotenv_values(self.path) if self.path.exists() else {}
+
+    def lookup(self, service: str) -> Optional[str]:
+        if self._values is None:
+            self._values = self.load()
+        return self._values.get(env_name(service)) or None
+
+
+class EncryptedFileBackend(DotenvBackend):
+    """openssl 加密的 .env 文件，首次查询时整体解密一次"""
+    name = "encrypted"
+
+    def __init__(self, path: Path = ENCRYPTED_FILE, passphrase_env: str = PASSPHRASE_ENV):
+        super().__init__(path)
+        self.passphrase_env = passphrase_env
+
+    def load(self) -> Dict[str, Optional[str]]:
+        if not self.path.exists() or not os.environ.get(self.passphrase_env) or not shutil.which("openssl"):
+            return {}
         result = subprocess.run(
-            ['security', 'find-generic-password', '-s', service, '-w'],
+            ["openssl", "enc", "-d", *OPENSSL_ARGS, "-in", str(self.path), "-pass", f"env:{self.passphrase_env}"],
             capture_output=True, text=True, timeout=10
         )
-        if result.returncode == 0:
-            return result.stdout.strip()
-        return None
-    except Exception as e:
-        print(f"⚠️ 读取 {service} 失败: {e}")
-        return None
+        if result.returncode != 0:
+            print(f"⚠️ 解密 {self.path} 失败: {result.stderr.strip()}")
+            return {}
+        return dotenv_values(stream=io.StringIO(result.stdout))
+
+
+class KeychainBackend:
+    name = "keychain"
+
+    def lookup(self, service: str) -> Optional[str]:
+        if sys.platform != "darwin" or not shutil.which("security"):
+            return None
+        try:
+            result = subprocess.run(
+                ['security', 'find-generic-password', '-s', service, '-w'],
+                capture_output=True, text=True, timeout=10
+            )
+            if result.returncode == 0:
+                return result.stdout.strip()
+            return None
+        except Exception as e:
+            print(f"⚠️ 读取 {service} 失败: {e}")
+            return None
+
+
+BACKENDS = {
+    "env": EnvBackend,
+    "dotenv": DotenvBackend,
+    "encrypted": EncryptedFileBackend,
+    "keychain": KeychainBackend,
+}
+
+
+class CredentialProvider:
+    """按后端顺序解析凭证，结果 (含未找到) 在进程内缓存 ttl 秒"""
+
+    def __init__(self, backends: Optional[List] = None, ttl: float = CACHE_TTL):
+        self.backends = backends if backends is not None else [BACKENDS[name]() for name in BACKEND_ORDER]
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[Optional[str], Optional[str], float]] = {}  # 服务 → (值, 后端, 过期时间)
+        self._lock = threading.Lock()
+
+    def resolve(self, service_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """(值, 来源后端名)"""
+        service = KEY_SERVICES.get(service_name, service_name)
+        cached = self._cache.get(service)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+        with self._lock:  # 同一服务并发首次查询时只查一次
+            cached = self._cache.get(service)
+            if cached is not None and cached[2] > time.monotonic():
+                return cached[0], cached[1]
+            value, source = None, None
+            for backend in self.backends:
+                value = backend.lookup(service)
+                if value:
+                    source = backend.name
+                    break
+            self._cache[service] = (value, source, time.monotonic() + self.ttl)
+            return value, source
+
+    def get(self, service_name: str) -> Optional[str]:
+        return self.resolve(service_name)[0]
+
+    def invalidate(self, service_name: Optional[str] = None):
+        """丢弃缓存 (轮换 key 后调用)；文件后端下次查询时重新读取"""
+        with self._lock:
+            if service_name is None:
+                self._cache.clear()
+                for backend in self.backends:
+                    if isinstance(backend, DotenvBackend):
+                        backend._values = None
+            else:
+                self._cache.pop(KEY_SERVICES.get(service_name, service_name), None)
+
+
+_provider: Optional[CredentialProvider] = None
+
+
+def get_provider() -> CredentialProvider:
+    global _provider
+    if _provider is None:
+        _provider = CredentialProvider()
+    return _provider
+
+
+def get_key(service_name):
+    """读取 API Key (见模块说明的后端顺序)"""
+    return get_provider().get(service_name)
 
 def set_key(service_name, api_key):
-    """将 API Key 存入 macOS Keychain (主人手动执行)"""
+    """写入 API Key (主人手动执行)"""
     service = KEY_SERVICES.get(service_name, service_name)
-    print(f"请手动执行:\n")
-    print(f"security add-generic-password -s '{service}' -a caohuang -w '{api_key}'")
+    print(f"任选其一:\n")
+    print(f"echo '{env_name(service)}={api_key}' >> {ENV_FILE}")
+    print(f"security add-generic-password -s '{service}' -a caohuang -w '{api_key}'   # macOS")
+
+def encrypt_env_file(source, target=ENCRYPTED_FILE):
+    """把 .env 文件加密为 encrypted 后端使用的文件 (口令取自 CAOHUANG_SECRETS_PASSPHRASE)"""
+    if not os.environ.get(PASSPHRASE_ENV):
+        print(f"❌ 请先设置环境变量 {PASSPHRASE_ENV}")
+        return False
+    subprocess.run(
+        ["openssl", "enc", *OPENSSL_ARGS, "-in", str(source), "-out", str(target), "-pass", f"env:{PASSPHRASE_ENV}"],
+        check=True, timeout=10
+    )
+    os.chmod(target, 0o600)
+    print(f"✅ 已加密到 {target}，确认无误后可删除明文 {source}")
+    return True
 
 def check_all_keys():
     """检查所有已配置的 API Keys"""
     print("👑 曹皇 API Key 状态检查\n")
-    print("-" * 40)
-    
-    for name, service in KEY_SERVICES.items():
-        key = get_key(name)
+    print("-" * 50)
+
+    provider = get_provider()
+    for name in KEY_SERVICES:
+        key, source = provider.resolve(name)
         status = "✅ 已配置" if key else "❌ 未配置"
         masked = f"{key[:8]}...{key[-4:]}" if key and len(key) > 12 else "N/A"
-        print(f"{name:12} {status} {masked if key else ''}")
-    
-    print("-" * 40)
-    
-    # 检查环境变量备选
-    print("\n环境变量检查:")
-    env_vars = ['OPENROUTER_API_KEY', 'DEEPSEEK_API_KEY', 'GITHUB_TOKEN']
-    for var in env_vars:
-        value = os.getenv(var)
-        status = "✅ 已设置" if value else "❌ 未设置"
-        print(f"{var:25} {status}")
+        print(f"{name:24} {status} {f'{masked} ({source})' if key else ''}")
+
+    print("-" * 50)
+    print(f"后端顺序: {' → '.join(b.name for b in provider.backends)}")
 
 def load_to_env():
-    """将 Keychain 中的 keys 加载到环境变量"""
+    """将各后端中的 keys 加载到环境变量"""
     keys = {}
-    for name in KEY_SERVICES:
+    for name, service in KEY_SERVICES.items():
         key = get_key(name)
         if key:
-            env_name = f"{name.upper()}_API_KEY"
-            os.environ[env_name] = key
+            os.environ[env_name(service)] = key
             keys[name] = True
     return keys
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "check":
         check_all_keys()
     elif len(sys.argv) > 1 and sys.argv[1] == "load":
         keys = load_to_env()
         print(f"已加载 {len(keys)} 个 API Key 到环境变量")
+    elif len(sys.argv) > 2 and sys.argv[1] == "get":
+        key = get_key(sys.argv[2])
+        if not key:
+            sys.exit(1)
+        print(key)
+    elif len(sys.argv) > 2 and sys.argv[1] == "encrypt":
+        sys.exit(0 if encrypt_env_file(sys.argv[2]) else 1)
     else:
         check_all_keys()
         print("\n用法:")
-        print("  python key_manager.py check  - 检查所有 keys")
-        print("  python key_manager.py load   - 加载到环境变量")
+        print("  python key_manager.py check              - 检查所有 keys")
+        print("  python key_manager.py load               - 加载到环境变量")
+        print("  python key_manager.py get <服务>          - 打印某个 key")
+        print("  python key_manager.py encrypt <.env 文件> - 生成加密凭证文件")
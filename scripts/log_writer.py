@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 异步批量日志写入 👑
+调用方只把结构化记录放进队列 (不碰磁盘)，后台线程批量写文件并回显到终端
+
+- 每个日志文件一个 LogWriter (get_log_writer 按路径复用)，文件在写线程里长开
+- 攒够 FLUSH_BYTES 或距上次落盘超过 FLUSH_INTERVAL 秒才 write + flush 一次
+- 文件超过 MAX_BYTES 时轮转为 .1 ... .BACKUP_COUNT，更早的删除
+- 进程退出 (atexit) 或 close() 时写完队列里剩余的记录；flush() 可同步等待落盘
+- 队列不设上限：检测循环里 put 永不阻塞
+
+用法:
+  python scripts/log_writer.py bench [条数]   # 对比逐条 open/append/close 与队列写入的调用方耗时
+
+作者: 曹皇 👑
+"""
+
+import atexit
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL = 1.0          # 秒
+MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件上限
+BACKUP_COUNT = 5              # 保留的轮转文件数
+
+
+class LogRecord(NamedTuple):
+    created: float             # time.time()
+    level: str
+    message: str
+    fields: Optional[Dict]     # 附加字段，格式化为 key=value
+
+    def format(self) -> str:
+        line = f"[{datetime.fromtimestamp(self.created):%Y-%m-%d %H:%M:%S}] [{self.level}] {self.message}"
+        if self.fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in self.fields.items())
+        return line + "\n"
+
+
+class LogWriter:
+    def __init__(self, path, echo: bool = True, flush_bytes: int = FLUSH_BYTES,
+                 flush_interval: float = FLUSH_INTERVAL, max_bytes: int = MAX_BYTES,
+                 backup_count: int = BACKUP_COUNT):
+        self.path = Path(path)
+        self.echo = echo
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # LogRecord / threading.Event (flush 请求) / None (关闭)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name=f"log-writer:{self.path.name}",
+                                        daemon=True)
+        self._writer.start()
+
+    # === 调用方 ===
+    def write(self, message: str, level: str = "INFO", **fields):
+        """入队一条记录 (不阻塞)"""
+        if self._closed:
+            raise RuntimeError(f"LogWriter 已关闭: {self.path}")
+        self._queue.put(LogRecord(time.time(), level, message, fields or None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前入队的记录全部落盘"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    # === 写线程 ===
+    def _writer_loop(self):
+        f = open(self.path, "a", encoding="utf-8")
+        size = f.tell()
+        pending: List[str] = []
+        pending_bytes = 0
+        last_flush = time.monotonic()
+        waiters: List[threading.Event] = []
+        running = True
+        while running:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # 到时间了
+            if item is None:
+                running = False
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not False:
+                line = item.format()
+                pending.append(line)
+                pending_bytes += len(line.encode())  # 按 UTF-8 字节计 (中文一字 3 字节)
+
+            due = (not running or waiters or pending_bytes >= self.flush_bytes
+                   or (pending and time.monotonic() - last_flush >= self.flush_interval))
+            if not due:
+                continue
+            if pending:
+                text = "".join(pending)
+                nbytes = len(text.encode())
+                try:
+                    if size and size + nbytes > self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "a", encoding="utf-8")
+                        size = 0
+                    f.write(text)
+                    f.flush()
+                    size += nbytes
+                    if self.echo:
+                        sys.stdout.write(text)
+                        sys.stdout.flush()
+                except (OSError, ValueError) as e:
+                    sys.stderr.write(f"日志写入失败 ({self.path}): {e}\n")
+                pending, pending_bytes = [], 0
+            last_flush = time.monotonic()
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+        f.close()
+
+    def _rotate(self):
+        """arbitrage.log → .1 → .2 ... 超出 backup_count 的删除"""
+        oldest = self.path.with_name(f"{self.path.name}.{self.backup_count}")
+        if oldest.exists():
+            oldest.unlink()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+
+_writers: Dict[Path, LogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(path) -> LogWriter:
+    """按路径复用 LogWriter (同一文件只有一个写线程)"""
+    key = Path(path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = _writers[key] = LogWriter(key)
+    return writer
+
+
+@atexit.register
+def close_all():
+    """写完全部队列并关闭 (进程退出时自动调用)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def bench(lines: int = 2000):
+    """调用方耗时：逐条 open/append/close (旧 ArbitrageMonitor.log 的写法，不含 print) vs 入队"""
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = Path(tmp) / "old.log"
+        start = time.perf_counter()
+        for i in range(lines):
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with open(old_path, "a") as f:
+                f.write(f"[{timestamp}] [INFO] 套利信号: vendor/model-{i} - OpenRouter 比直供 cheaper 20.0%\n")
+        old = time.perf_counter() - start
+
+        writer = LogWriter(Path(tmp) / "new.log", echo=False)
+        start = time.perf_counter()
+        for i in range(lines):
+            writer.write(f"套利信号: vendor/model-{i} - OpenRouter 比直供 cheaper 20.0%")
+        new = time.perf_counter() - start
+        writer.close()
+        drained = time.perf_counter() - start
+        written = sum(1 for _ in open(Path(tmp) / "new.log"))
+
+    print(f"{lines} 条日志，调用方耗时:")
+    print(f"  逐条 open/append/close   {old * 1000:8.2f}ms  ({old / lines * 1e6:.1f}µs/条)")
+    print(f"  队列入队                 {new * 1000:8.2f}ms  ({new / lines * 1e6:.1f}µs/条, {old / new:.0f}x)")
+    print(f"  关闭时全部落盘           {drained * 1000:8.2f}ms  (写入 {written} 行)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "bench":
+        bench(*(int(a) for a in args[1:2]))
+    else:
+        print(__doc__)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 阶段耗时与计数埋点 👑
+进程内直方图 + 计数器，每次运行后导出 Prometheus 文本文件和 JSON 摘要
+
+- timer(stage, **labels)：上下文管理器；timed(stage, **labels)：装饰器 (每次调用独立计时，线程安全)
+- 阶段: scan / fetch / decode / parse / match / detect / db_write / report_render / job / post / queue_wait / generate / generate_batch
+- 标签: source (openrouter / gpu / 参考价来源名)、retailer、model、db、report、job 等，取值不宜无限增长
+- 直方图用固定桶 (Prometheus 可直接 histogram_quantile)，另保留最近 RESERVOIR 个样本算 JSON 里的 p50 / p99
+- 常驻进程里数值自启动起累计 (与 Prometheus 语义一致)，cron 单次运行则只含本次
+- 导出文件带 version (git 短哈希)，compare 对比两次部署的 p50 / p99
+
+用法:
+  python scripts/metrics.py                       # 查看最近一次导出的摘要
+  python scripts/metrics.py compare <旧.json> [新.json]  # 对比两次导出 (默认新 = 最近一次)
+
+作者: 曹皇 👑
+"""
+
+import bisect
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRICS_DIR = Path.home() / ".openclaw" / "workspace" / "logs"
+PROM_PATH = METRICS_DIR / "metrics.prom"    # node_exporter textfile collector 可直接读取
+JSON_PATH = METRICS_DIR / "metrics.json"
+PREFIX = "caohuang"
+
+# 直方图桶上界 (秒)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RESERVOIR = 1024          # 每个序列保留的最近样本数 (算分位数)
+REGRESSION_RATIO = 1.2    # compare 中 p50 / p99 变慢超过 20% 标记为回退
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max", "recent")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.recent: deque = deque(maxlen=RESERVOIR)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        samples = sorted(self.recent)
+        return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(self, stage: str, seconds: float, **labels):
+        key = (stage, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, stage: str, **labels) -> Iterator[None]:
+        """计时块内耗时；抛异常时照常记录耗时，并计入 errors{stage=...}"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count("errors", stage=stage, **labels)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def timed(self, stage: str, **labels):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    # === 导出 ===
+    def to_prometheus(self, version: str) -> str:
+        lines = [f"# HELP {PREFIX}_build_info 当前部署版本",
+                 f"# TYPE {PREFIX}_build_info gauge",
+                 f'{PREFIX}_build_info{{version="{version}"}} 1',
+                 f"# HELP {PREFIX}_stage_seconds 各阶段耗时",
+                 f"# TYPE {PREFIX}_stage_seconds histogram"]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for (stage, labels), h in histograms:
+            base = [("stage", stage), *labels]
+            cumulative = 0
+            for bound, n in zip((*BUCKETS, "+Inf"), h.counts):
+                cumulative += n
+                lines.append(f"{PREFIX}_stage_seconds_bucket{_format(base + [('le', str(bound))])} {cumulative}")
+            lines.append(f"{PREFIX}_stage_seconds_sum{_format(base)} {h.sum:.6f}")
+            lines.append(f"{PREFIX}_stage_seconds_count{_format(base)} {h.count}")
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.extend(f"{PREFIX}_{name}_total{_format(list(labels))} {value:g}"
+                         for (n, labels), value in counters if n == name)
+        lines.append(f"# TYPE {PREFIX}_metrics_exported_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}_metrics_exported_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, version: str) -> Dict:
+        with self._lock:
+            stages = [{
+                "stage": stage, "labels": dict(labels), "count": h.count,
+                "total_s": round(h.sum, 6), "p50_ms": round(h.quantile(0.5) * 1000, 3),
+                "p99_ms": round(h.quantile(0.99) * 1000, 3), "max_ms": round(h.max * 1000, 3),
+            } for (stage, labels), h in sorted(self.histograms.items())]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {"exported_at": datetime.now().isoformat(), "version": version,
+                "stages": stages, "counters": counters}
+
+    def export(self, prom_path: Path = PROM_PATH, json_path: Path = JSON_PATH):
+        """写出两个文件 (临时文件 + rename，采集方不会读到半个文件)"""
+        version = deployed_version()
+        _replace(Path(prom_path), self.to_prometheus(version))
+        _replace(Path(json_path), json.dumps(self.summary(version), indent=1, ensure_ascii=False))
+
+
+def _format(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _replace(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+_version: Optional[str] = None
+
+
+def deployed_version() -> str:
+    """当前代码的 git 短哈希 (不在 git 仓库里时为 unknown)"""
+    global _version
+    if _version is None:
+        try:
+            _version = subprocess.run(
+                ["git", "-C", str(Path(__file__).parent), "rev-parse", "--short", "HEAD"],
+                capture_output=True, text=True, timeout=5, check=True).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            _version = "unknown"
+    return _version
+
+
+# 进程内全局注册表
+REGISTRY = Registry()
+observe = REGISTRY.observe
+count = REGISTRY.count
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+export = REGISTRY.export
+
+
+# === 命令行 ===
+
+def _series(entry: Dict) -> str:
+    labels = ",".join(f"{k}={v}" for k, v in entry["labels"].items())
+    return f"{entry['stage']}{{{labels}}}" if labels else entry["stage"]
+
+
+def show(json_path: Path = JSON_PATH):
+    summary = json.loads(Path(json_path).read_text())
+    print(f"👑 曹皇埋点摘要 ({summary['exported_at']}, 版本 {summary['version']})")
+    print("-" * 96)
+    print(f"{'阶段':<58} {'次数':>8} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for entry in summary["stages"]:
+        print(f"{_series(entry):<58} {entry['count']:>8} {entry['p50_ms']:>10.2f} "
+              f"{entry['p99_ms']:>10.2f} {entry['max_ms']:>10.2f}")
+    print("-" * 96)
+    for entry in summary["counters"]:
+        labels = ",".join(f"{k}={v}" for k, v in entry["labels"].items())
+        print(f"{entry['name']}{{{labels}}} = {entry['value']:g}")
+
+
+def compare(old_path: Path, new_path: Path = JSON_PATH) -> bool:
+    """对比两次导出的各阶段 p50 / p99；有回退返回 False"""
+    old, new = (json.loads(Path(p).read_text()) for p in (old_path, new_path))
+    before = {_series(e): e for e in old["stages"]}
+    print(f"👑 曹皇埋点对比: {old['version']} → {new['version']}")
+    print(f"{'阶段':<58} {'p50 ms':>18} {'p99 ms':>18}")
+    regressions = 0
+    for entry in new["stages"]:
+        prev = before.get(_series(entry))
+        if prev is None:
+            continue
+        slow = [entry[k] > prev[k] * REGRESSION_RATIO and entry[k] - prev[k] > 1 for k in ("p50_ms", "p99_ms")]
+        regressions += any(slow)
+        print(f"{_series(entry):<58} {prev['p50_ms']:>8.2f} → {entry['p50_ms']:<8.2f}"
+              f"{prev['p99_ms']:>8.2f} → {entry['p99_ms']:<8.2f}{'  ❌ 回退' if any(slow) else ''}")
+    print("✅ 无回退" if not regressions else f"❌ {regressions} 个阶段变慢超过 {REGRESSION_RATIO - 1:.0%}")
+    return not regressions
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "compare":
+        sys.exit(0 if compare(*(Path(a) for a in args[1:3])) else 1)
+    show()
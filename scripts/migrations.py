@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 数据库版本化迁移 👑
+用 PRAGMA user_version 记录版本，按顺序执行未应用的迁移 (同一个写事务内完成)
+
+用法:
+  python scripts/migrations.py status    # 查看各数据库的版本
+  python scripts/migrations.py migrate   # 升级到最新版本
+  python scripts/migrations.py check     # EXPLAIN QUERY PLAN 检查生产查询，出现全表扫描则退出码 1
+
+作者: 曹皇 👑
+"""
+
+import re
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+# rollups.py 维护；bucket 为 ISO 时间戳前缀 (小时 13 位 / 天 10 位)，报告按 bucket = ? 走主键
+ROLLUP_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        bucket TEXT NOT NULL,
+        model_id TEXT NOT NULL,
+        samples INTEGER NOT NULL DEFAULT 0,
+        prompt_min REAL,
+        prompt_max REAL,
+        prompt_sum REAL NOT NULL DEFAULT 0,
+        prompt_first REAL,
+        prompt_last REAL,
+        completion_min REAL,
+        completion_max REAL,
+        completion_sum REAL NOT NULL DEFAULT 0,
+        completion_first REAL,
+        completion_last REAL,
+        opp_count INTEGER NOT NULL DEFAULT 0,
+        opp_abs_diff_sum REAL NOT NULL DEFAULT 0,
+        best_diff REAL,
+        worst_diff REAL,
+        PRIMARY KEY (bucket, model_id)
+    ) WITHOUT ROWID
+'''
+
+# retention.py 在删除过期 price_history 行之前写入；bucket 同上 (UTC)，按 零售商 x 型号 汇总
+GPU_ROLLUP_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        bucket TEXT NOT NULL,
+        gpu_model TEXT NOT NULL,
+        retailer TEXT NOT NULL,
+        samples INTEGER NOT NULL DEFAULT 0,
+        price_min REAL,
+        price_max REAL,
+        price_sum REAL NOT NULL DEFAULT 0,
+        price_first REAL,
+        price_last REAL,
+        in_stock_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, gpu_model, retailer)
+    ) WITHOUT ROWID
+'''
+
+# schema 名 -> [(版本, 说明, [SQL 或 callable(conn)...])]，版本号必须连续递增，已发布的迁移不得修改
+MIGRATIONS: Dict[str, List[Tuple[int, str, List]]] = {
+    "arbitrage": [
+        (1, "基础表", [
+            '''
+            CREATE TABLE IF NOT EXISTS price_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model_id TEXT NOT NULL,
+                provider TEXT,
+                prompt_price REAL,
+                completion_price REAL,
+                timestamp TEXT NOT NULL,
+                source TEXT DEFAULT 'openrouter'
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS arbitrage_opportunities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model_id TEXT NOT NULL,
+                or_prompt_price REAL,
+                or_completion_price REAL,
+                direct_prompt_price REAL,
+                direct_completion_price REAL,
+                prompt_diff_pct REAL,
+                completion_diff_pct REAL,
+                timestamp TEXT NOT NULL,
+                acted_upon INTEGER DEFAULT 0
+            )
+            ''',
+            # 每轮扫描一条心跳：delta 模式下证明 "没写行 = 价格没变" 而不是 "没扫描"
+            '''
+            CREATE TABLE IF NOT EXISTS scan_heartbeats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                source TEXT DEFAULT 'openrouter',
+                mode TEXT NOT NULL,
+                model_count INTEGER NOT NULL,
+                written_count INTEGER NOT NULL
+            )
+            ''',
+        ]),
+        (2, "报告窗口 / 最新价格 / 时点还原的覆盖索引", [
+            # 小时报告 COUNT(*) WHERE timestamp > ?
+            "CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp ON price_snapshots (timestamp)",
+            # load_current_prices / prices_at / price_at
+            '''
+            CREATE INDEX IF NOT EXISTS idx_snapshots_source_model_ts
+            ON price_snapshots (source, model_id, timestamp, prompt_price, completion_price)
+            ''',
+            # 小时报告 COUNT / AVG(ABS(prompt_diff_pct)) / TOP N WHERE timestamp > ?
+            '''
+            CREATE INDEX IF NOT EXISTS idx_opps_timestamp
+            ON arbitrage_opportunities (timestamp, prompt_diff_pct, model_id, or_prompt_price, direct_prompt_price)
+            ''',
+            # Twitter 线程: WHERE prompt_diff_pct > 0 ORDER BY prompt_diff_pct DESC
+            '''
+            CREATE INDEX IF NOT EXISTS idx_opps_prompt_diff
+            ON arbitrage_opportunities (prompt_diff_pct, model_id, timestamp)
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_heartbeats_timestamp
+            ON scan_heartbeats (timestamp, model_count)
+            ''',
+        ]),
+        (3, "目录条件抓取: 校验状态表 + 心跳记录抓取结果", [
+            '''
+            CREATE TABLE IF NOT EXISTS fetch_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                model_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+            ''',
+            # changed / not_modified / hash_match；旧心跳为 NULL (无条件抓取)
+            "ALTER TABLE scan_heartbeats ADD COLUMN fetch_status TEXT",
+            # fetch_stats: WHERE timestamp > ? GROUP BY fetch_status
+            '''
+            CREATE INDEX IF NOT EXISTS idx_heartbeats_ts_status
+            ON scan_heartbeats (timestamp, fetch_status)
+            ''',
+        ]),
+        (4, "每模型小时/天汇总表 (报告只读汇总)，并从历史回填", [
+            *(ROLLUP_TABLE.format(table=table) for table in ("price_rollups_hourly", "price_rollups_daily")),
+            lambda conn: _backfill_rollups(conn),
+        ]),
+    ],
+    "gpu_prices": [
+        (1, "基础表", [
+            '''
+            CREATE TABLE IF NOT EXISTS price_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                gpu_model TEXT NOT NULL,
+                retailer TEXT NOT NULL,
+                product_name TEXT,
+                price REAL,
+                currency TEXT DEFAULT 'USD',
+                in_stock BOOLEAN,
+                url TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS price_alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                gpu_model TEXT NOT NULL,
+                retailer TEXT NOT NULL,
+                old_price REAL,
+                new_price REAL,
+                drop_percent REAL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+        ]),
+        (2, "旧版 price_alerts (gpu_name/source 列) 改名保留，重建新表", [
+            lambda conn: _rebuild_legacy_price_alerts(conn),
+        ]),
+        (3, "基准价与警报的覆盖索引", [
+            # get_baseline_price: WHERE gpu_model=? AND retailer=? ORDER BY timestamp DESC LIMIT 1
+            '''
+            CREATE INDEX IF NOT EXISTS idx_history_model_retailer_ts
+            ON price_history (gpu_model, retailer, timestamp, price)
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_alerts_model_retailer_ts
+            ON price_alerts (gpu_model, retailer, timestamp)
+            ''',
+        ]),
+        (4, "按商品分组取最新价的覆盖索引", [
+            # BaselineCache.load: GROUP BY gpu_model, retailer, product_name 取 MAX(id) (rowid 隐含在索引末尾)
+            '''
+            CREATE INDEX IF NOT EXISTS idx_history_product_ts
+            ON price_history (gpu_model, retailer, product_name, timestamp, price)
+            ''',
+        ]),
+        (5, "保留策略: 过期原始价格降采样到的小时/天汇总表 + 按时间定位过期行的索引", [
+            *(GPU_ROLLUP_TABLE.format(table=table) for table in ("price_history_hourly", "price_history_daily")),
+            # retention.py: SELECT MAX(id) FROM price_history WHERE timestamp < ?
+            "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON price_history (timestamp)",
+        ]),
+    ],
+    "outbox": [
+        (1, "推文发件箱", [
+            # tweet_outbox.py；时间均为 epoch 秒。status: pending / sending / posted / failed
+            '''
+            CREATE TABLE IF NOT EXISTS tweet_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idem_key TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                not_before REAL NOT NULL,
+                sent_at REAL,
+                tweet_id TEXT,
+                last_error TEXT
+            )
+            ''',
+            # next_due: WHERE status = ? AND not_before <= ? ORDER BY not_before, id
+            "CREATE INDEX IF NOT EXISTS idx_outbox_status_due ON tweet_outbox (status, not_before)",
+            # RateLimiter.sent_since: WHERE sent_at >= ? AND status IN (...)
+            "CREATE INDEX IF NOT EXISTS idx_outbox_sent ON tweet_outbox (sent_at, status)",
+        ]),
+    ],
+    "generation_cache": [
+        (1, "内容生成结果缓存 + 按天命中统计", [
+            # generation_cache.py；variants 为 JSON 数组，served 为已取用的版本数
+            '''
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                variants TEXT NOT NULL,
+                served INTEGER NOT NULL DEFAULT 0,
+                tokens INTEGER,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            ''',
+            # TTL 清理 / stats: WHERE expires_at > ?
+            "CREATE INDEX IF NOT EXISTS idx_generation_expires ON generation_cache (expires_at)",
+            # LRU 淘汰: ORDER BY last_used DESC
+            "CREATE INDEX IF NOT EXISTS idx_generation_last_used ON generation_cache (last_used)",
+            '''
+            CREATE TABLE IF NOT EXISTS generation_stats (
+                day TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                tokens_used INTEGER NOT NULL DEFAULT 0,
+                tokens_saved INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            ''',
+        ]),
+    ],
+}
+
+
+def _rebuild_legacy_price_alerts(conn):
+    """早期脚本建的 price_alerts 没有 gpu_model/retailer 列，save_alert 无法写入"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(price_alerts)")}
+    if "gpu_model" in columns:
+        return
+    conn.execute("ALTER TABLE price_alerts RENAME TO price_alerts_legacy")
+    conn.execute(MIGRATIONS["gpu_prices"][0][2][1])
+
+
+def _backfill_rollups(conn):
+    import rollups
+    for table in rollups.BUCKETS:
+        rollups.backfill(conn, table)
+
+
+def latest_version(schema: str) -> int:
+    return MIGRATIONS[schema][-1][0]
+
+
+def current_version(store) -> int:
+    return store.query_one("PRAGMA user_version")[0]
+
+
+def migrate(store, schema: str) -> List[int]:
+    """
+    把 store 升级到 schema 的最新版本，返回本次应用的版本号
+
+    读版本号与执行迁移在写线程的同一个 BEGIN IMMEDIATE 事务内完成，
+    多个进程同时启动时只有一个会真正执行迁移
+    """
+    if current_version(store) >= latest_version(schema):
+        return []
+
+    def apply(conn) -> List[int]:
+        applied = []
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, _description, statements in MIGRATIONS[schema]:
+            if target <= version:
+                continue
+            for sql in statements:
+                if callable(sql):
+                    sql(conn)
+                else:
+                    conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            applied.append(target)
+        return applied
+
+    return store.call(apply)
+
+
+# === 查询计划检查 ===
+
+def production_reads(tmp: Path) -> List[Tuple[str, str, Callable[[], object]]]:
+    """
+    生产代码里的全部读路径: [(schema, 数据库路径, 调用)]
+
+    新增查询时在这里登记，check 会拦截调用期间执行的 SQL 逐条 EXPLAIN
+    """
+    import generate_report
+    import generate_twitter
+    import generation_cache
+    import gpu_price_monitor
+    import openrouter_arbitrage
+    import price_archive
+    import retention
+    import tweet_outbox
+    from storage import get_storage
+
+    arbitrage_db = tmp / "arbitrage.db"
+    outbox_db = tmp / "outbox.db"
+    cache_db = tmp / "generation_cache.db"
+    gpu_db = tmp / "gpu_prices.db"
+    openrouter_arbitrage.LOG_PATH = tmp / "arbitrage.log"
+    gpu_price_monitor.DB_PATH = gpu_db
+    monitor = openrouter_arbitrage.ArbitrageMonitor(db_path=arbitrage_db)
+    now = datetime.now()
+
+    return [
+        ("arbitrage", arbitrage_db, monitor.get_hourly_report),
+        ("arbitrage", arbitrage_db, monitor.load_current_prices),
+        ("arbitrage", arbitrage_db, monitor.fetcher.reload),
+        ("arbitrage", arbitrage_db, monitor.fetch_stats),
+        ("arbitrage", arbitrage_db, lambda: monitor.rollups.has_bucket("price_rollups_hourly", now.isoformat()[:13])),
+        ("arbitrage", arbitrage_db, lambda: monitor.price_at("openai/gpt-4o", now)),
+        ("arbitrage", arbitrage_db, lambda: monitor.prices_at(now)),
+        ("arbitrage", arbitrage_db, lambda: generate_report.generate_hourly_report(arbitrage_db)),
+        ("arbitrage", arbitrage_db, lambda: generate_twitter.generate_twitter_thread(arbitrage_db)),
+        ("gpu_prices", gpu_db, lambda: gpu_price_monitor.get_baseline_price("RTX 4090", "Newegg")),
+        ("gpu_prices", gpu_db, lambda: gpu_price_monitor.BaselineCache().load()),
+        ("arbitrage", arbitrage_db, lambda: retention.expired_counts(get_storage(arbitrage_db), "arbitrage")),
+        ("gpu_prices", gpu_db, lambda: retention.expired_counts(get_storage(gpu_db), "gpu_prices")),
+        ("arbitrage", arbitrage_db, lambda: price_archive.ArchiveWriter(tmp / "archive").export(
+            get_storage(arbitrage_db))),
+        ("outbox", outbox_db, lambda: tweet_outbox.Outbox(outbox_db).status()),
+        ("outbox", outbox_db, lambda: tweet_outbox.Outbox(outbox_db).next_due(now.timestamp())),
+        ("outbox", outbox_db, lambda: tweet_outbox.Outbox(outbox_db).result("key")),
+        ("outbox", outbox_db, lambda: tweet_outbox.Outbox(outbox_db).reconcile(None)),
+        ("generation_cache", cache_db, lambda: generation_cache.GenerationCache(cache_db).stats()),
+    ]
+
+
+def full_scans(plan: List[tuple]) -> List[str]:
+    """从 EXPLAIN QUERY PLAN 结果中找出全表/全索引扫描 (物化子查询除外)"""
+    subqueries = {
+        m.group(1) for _, _, _, detail in plan
+        for m in [re.match(r"(?:MATERIALIZE|CO-ROUTINE) (\S+)", detail)] if m
+    }
+    bad = []
+    for _, _, _, detail in plan:
+        m = re.match(r"SCAN (\S+)", detail)
+        if m and m.group(1) not in subqueries and m.group(1) != "CONSTANT":
+            bad.append(detail)
+    return bad
+
+
+def check_query_plans(verbose: bool = True) -> List[Tuple[str, List[str]]]:
+    """在临时库上运行全部生产读路径，返回出现全扫描的 [(sql, 问题行)]"""
+    from storage import get_storage
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {}
+        for schema, db_path, read in production_reads(Path(tmp)):
+            store = stores[db_path] = get_storage(db_path, schema=schema)
+            statements: List[str] = []
+            with store.trace_reads(statements.append):
+                read()
+            for sql in statements:
+                if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                plan = store.query("EXPLAIN QUERY PLAN " + sql)
+                bad = full_scans(plan)
+                if verbose:
+                    print(f"{'❌' if bad else '✅'} {' '.join(sql.split())[:100]}")
+                    for row in plan:
+                        print(f"     {row[3]}")
+                if bad:
+                    failures.append((sql, bad))
+        for store in stores.values():
+            store.close()
+    return failures
+
+
+if __name__ == "__main__":
+    from storage import get_storage
+
+    def databases():
+        import gpu_price_monitor
+        import openrouter_arbitrage
+        import generation_cache
+        import tweet_outbox
+        return [("arbitrage", openrouter_arbitrage.DB_PATH), ("gpu_prices", gpu_price_monitor.DB_PATH),
+                ("outbox", tweet_outbox.DB_PATH), ("generation_cache", generation_cache.DB_PATH)]
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "check":
+        failures = check_query_plans()
+        print("-" * 60)
+        if failures:
+            print(f"❌ {len(failures)} 条查询出现全扫描")
+            sys.exit(1)
+        print("✅ 所有生产查询均走索引")
+    elif command == "migrate":
+        for schema, db_path in databases():
+            applied = migrate(get_storage(db_path), schema)
+            print(f"{schema:16} {db_path} 已应用: {applied or '无'}")
+    else:
+        for schema, db_path in databases():
+            version = current_version(get_storage(db_path))
+            print(f"{schema:16} v{version} / 最新 v{latest_version(schema)}  {db_path}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 模型名解析索引 👑
+把 OpenRouter 模型 id 解析到参考价表中的条目
+
+旧逻辑按 DIRECT_PRICING 的插入顺序做子串匹配，取第一个命中：
+- 每个模型 O(参考条目数)
+- "openai/gpt-4o-mini" 先命中 "gpt-4o"，被错误地按 gpt-4o 定价
+
+这里对参考表的 key 建一次 Aho-Corasick 自动机，扫描一遍 id 找出所有命中，
+返回最长 (最具体) 的那个；结果按 id 缓存，跨扫描复用。
+
+作者: 曹皇 👑
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class ModelResolver:
+    def __init__(self, keys: Iterable[str]):
+        # 节点 i: _goto[i] 子节点表, _fail[i] 失败指针, _best[i] 以该节点结尾的最长 key (含失败链)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[Optional[str]] = [None]
+        self._cache: Dict[str, Optional[str]] = {}
+
+        for key in keys:
+            self._insert(key)
+        self._build_fail_links()
+
+    def _insert(self, key: str):
+        node = 0
+        for ch in key.lower():
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        current = self._best[node]
+        if current is None or len(key) > len(current):
+            self._best[node] = key
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # 自身 key 是以此处结尾的最长后缀；没有时继承失败链上的 (更短的) key
+                if self._best[child] is None:
+                    self._best[child] = self._best[self._fail[child]]
+
+    def _scan(self, text: str) -> Optional[str]:
+        best = None
+        node = 0
+        for ch in text.lower():
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            hit = self._best[node]
+            if hit is not None and (best is None or len(hit) > len(best)):
+                best = hit
+        return best
+
+    def resolve(self, model_id: str) -> Optional[str]:
+        """返回 model_id 中出现的最长参考 key，没有则 None (结果缓存)"""
+        try:
+            return self._cache[model_id]
+        except KeyError:
+            key = self._cache[model_id] = self._scan(model_id)
+            return key
@@ -5,30 +5,49 @@ OpenRouter 实时价格差监控系统 v1.0
 
 功能：
 - 监控 OpenRouter 各模型实时价格
-- 对比直接提供商 vs OpenRouter 价差
+- 对比直接提供商 vs OpenRouter 价差 (参考价由 price_sources.py 的多个来源并发刷新、合并)
 - 识别套利机会 (价差 > 阈值时触发)
 - 记录到本地 SQLite，生成小时级报告
 
 作者: 曹皇 👑
 """
 
+import asyncio
 import requests
-import sqlite3
 import json
 import time
 import os
+from array import array
 from datetime import datetime, timedelta
 from dataclasses import dataclass
-from typing import List, Optional, Dict
+from typing import Iterable, Iterator, List, Optional, Dict, Set, Tuple, Union
 from pathlib import Path
 
+import metrics
+from arbitrage_batch import ReferenceIndex, evaluate_scan
+from catalog_fetch import CatalogFetch, CatalogStream, ConditionalFetcher
+from log_writer import get_log_writer
+from model_resolver import ModelResolver
+from price_sources import PriceSource, ReferenceBook, default_sources
+from price_batch import PriceBatch, as_price_batch
+from rollups import RollupWriter, hour_summary, last_full_hour
+from scan_stream import batched, iter_json_array
+from scheduler import Job, Scheduler
+from storage import get_storage
+
 # === 配置区 ===
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/models"
 PRICE_DIFF_THRESHOLD = 0.15  # 15% 价差触发记录
+# 快照存储模式: "delta" 只在价格变化/模型上下架时写行 (每轮另记一条心跳)，"full" 每轮全量写入
+SNAPSHOT_MODE = "delta"
+# 流式扫描: 响应体增量解码，检测与写库按批流水线执行 (峰值内存不随目录大小增长)
+STREAMING = False
+STREAM_BATCH_SIZE = 1000  # 每批模型数 (每批一个写事务)
 DB_PATH = Path.home() / ".openclaw" / "workspace" / "data" / "arbitrage.db"
 LOG_PATH = Path.home() / ".openclaw" / "workspace" / "logs" / "arbitrage.log"
 
-# 直接提供商参考价 (USD per 1M tokens) - 需定期更新
+# 直接提供商参考价 (USD per 1M tokens) - 需定期更新；作为 price_sources 的 static 来源兜底，
+# 文件 / 提供商 API 来源的同名 key 覆盖这里的值
 DIRECT_PRICING = {
     "gpt-4o": {"prompt": 2.50, "completion": 10.00},
     "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
@@ -42,6 +61,9 @@ DIRECT_PRICING = {
     "deepseek-coder": {"prompt": 0.14, "completion": 0.28},
 }
 
+# 价格输入: 列式 PriceBatch，或旧接口的 ModelPrice 列表 (各入口处自动转换为 PriceBatch)
+Prices = Union[PriceBatch, List["ModelPrice"]]
+
 @dataclass
 class ModelPrice:
     model_id: str
@@ -52,210 +74,458 @@ class ModelPrice:
     timestamp: datetime
 
 class ArbitrageMonitor:
-    def __init__(self):
+    def __init__(self, db_path: Path = DB_PATH, snapshot_mode: str = SNAPSHOT_MODE,
+                 streaming: bool = STREAMING, session: Optional[requests.Session] = None,
+                 sources: Optional[List[PriceSource]] = None):
+        if snapshot_mode not in ("delta", "full"):
+            raise ValueError(f"未知快照模式: {snapshot_mode}")
+        self.db_path = Path(db_path)
+        self.snapshot_mode = snapshot_mode
+        self.streaming = streaming
+        self.session = session
+        # delta 模式下每个模型当前生效的价格 {model_id: (prompt, completion)}，首次使用时从库中加载
+        self._current_prices: Optional[Dict[str, Tuple[float, float]]] = None
+        # 各参考价来源的当前结果，合并成一张参考价表 (每轮扫描与目录抓取并发刷新到期的来源)
+        self.references = ReferenceBook(sources if sources is not None else default_sources(DIRECT_PRICING))
+        self._reference_version = None
+        self._use_references()
         self.ensure_dirs()
         self.init_db()
         
+    def _use_references(self):
+        """参考价表变化时重建解析器与向量化索引 (表不变则跨扫描复用解析缓存)"""
+        if self.references.version == self._reference_version:
+            return
+        self._reference_version = self.references.version
+        self.reference_table = self.references.table()
+        # 参考价表 key 的最长匹配索引 (跨扫描缓存解析结果)
+        self.resolver = ModelResolver(self.reference_table)
+        # 向量化检测用的各参考来源数组与模型映射 (direct 与逐个检测共用同一个解析器)
+        self._reference_indexes = {"direct": ReferenceIndex(self.reference_table, self.resolver)}
+
+    def _collect_references(self, pending) -> bool:
+        """等待本轮提交的参考价来源，失败的来源沿用上次结果；返回参考价表是否变化"""
+        changed = self.references.collect(pending)
+        for name, error in self.references.errors().items():
+            if name in pending:
+                self.log(f"参考价来源 {name} 刷新失败 (沿用上次结果): {error}", "WARN")
+        if changed:
+            self._use_references()
+            self.log(f"参考价表已更新: {len(self.reference_table)} 个条目")
+        return changed
+
+    def close(self):
+        """关闭参考价来源的线程池与 Session (传入的 session 由调用方关闭)"""
+        self.references.close()
+
     def ensure_dirs(self):
-        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
         LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
         
     def init_db(self):
-        """初始化 SQLite 数据库"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS price_snapshots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                model_id TEXT NOT NULL,
-                provider TEXT,
-                prompt_price REAL,
-                completion_price REAL,
-                timestamp TEXT NOT NULL,
-                source TEXT DEFAULT 'openrouter'
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS arbitrage_opportunities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                model_id TEXT NOT NULL,
-                or_prompt_price REAL,
-                or_completion_price REAL,
-                direct_prompt_price REAL,
-                direct_completion_price REAL,
-                prompt_diff_pct REAL,
-                completion_diff_pct REAL,
-                timestamp TEXT NOT NULL,
-                acted_upon INTEGER DEFAULT 0
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        """初始化 SQLite 数据库 (表结构与索引见 migrations.py)"""
+        self.store = get_storage(self.db_path, schema="arbitrage")
+        # 目录条件抓取 (ETag / Last-Modified / 内容哈希)，校验状态存在 fetch_state 表
+        self.fetcher = ConditionalFetcher(self.store, OPENROUTER_API_URL, session=self.session)
+        # 小时/天汇总表：每个桶第一轮写全部模型，之后只写变价 / 有信号的模型
+        self.rollups = RollupWriter(self.store)
         
-    def log(self, message: str, level: str = "INFO"):
-        """写入日志"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_line = f"[{timestamp}] [{level}] {message}\n"
-        with open(LOG_PATH, "a") as f:
-            f.write(log_line)
-        print(log_line.strip())
+    def log(self, message: str, level: str = "INFO", **fields):
+        """写入日志 (入队即返回，后台线程批量落盘并回显，见 log_writer.py)"""
+        get_log_writer(LOG_PATH).write(message, level, **fields)
         
-    def fetch_openrouter_prices(self) -> List[ModelPrice]:
-        """从 OpenRouter 获取实时价格"""
+    def fetch_openrouter_prices(self) -> PriceBatch:
+        """从 OpenRouter 获取实时价格 (无条件全量抓取)"""
         try:
-            response = requests.get(OPENROUTER_API_URL, timeout=30)
+            response = (self.session or requests).get(OPENROUTER_API_URL, timeout=30)
             response.raise_for_status()
-            data = response.json()
-            
-            prices = []
-            for model in data.get("data", []):
-                model_id = model.get("id", "")
-                pricing = model.get("pricing", {})
-                
-                # 转换价格为 per 1M tokens
-                prompt_price = float(pricing.get("prompt", 0)) * 1_000_000
-                completion_price = float(pricing.get("completion", 0)) * 1_000_000
-                
-                mp = ModelPrice(
-                    model_id=model_id,
-                    name=model.get("name", model_id),
-                    provider="openrouter",
-                    prompt_price=prompt_price,
-                    completion_price=completion_price,
-                    timestamp=datetime.now()
-                )
-                prices.append(mp)
-                
-            return prices
+            return self.parse_models(response.json())
+        except Exception as e:
+            self.log(f"获取 OpenRouter 价格失败: {e}", "ERROR")
+            return PriceBatch.from_records([])
+
+    def fetch_catalog(self) -> Optional[CatalogFetch]:
+        """条件抓取模型目录；失败时记录日志并返回 None"""
+        try:
+            return self.fetcher.fetch()
         except Exception as e:
             self.log(f"获取 OpenRouter 价格失败: {e}", "ERROR")
-            return []
+            return None
+
+    @metrics.timed("parse", source="openrouter")
+    def parse_models(self, data: Dict) -> PriceBatch:
+        """把 /api/v1/models 响应转换为列式 PriceBatch (整批共用一个扫描时间戳)"""
+        return PriceBatch.from_records(data.get("data", []))
+
+    def iter_price_batches(self, records: Iterable[Dict],
+                           batch_size: int = STREAM_BATCH_SIZE) -> Iterator[PriceBatch]:
+        """把模型记录流按 batch_size 切成 PriceBatch (惰性，可直接接流式解码)"""
+        timestamp = datetime.now()
+        for chunk in batched(records, batch_size):
+            yield PriceBatch.from_records(chunk, timestamp)
             
-    def save_prices(self, prices: List[ModelPrice]):
-        """保存价格到数据库"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        for p in prices:
-            cursor.execute('''
-                INSERT INTO price_snapshots 
-                (model_id, provider, prompt_price, completion_price, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (p.model_id, p.provider, p.prompt_price, p.completion_price, 
-                  p.timestamp.isoformat()))
-        
-        conn.commit()
-        conn.close()
+    def load_current_prices(self) -> Dict[str, Tuple[float, float]]:
+        """读取每个模型最近一次记录的价格 (下架墓碑行视为不存在)"""
+        rows = self.store.query('''
+            SELECT s.model_id, s.prompt_price, s.completion_price
+            FROM price_snapshots s
+            JOIN (
+                SELECT model_id, MAX(id) AS id FROM price_snapshots
+                WHERE source = 'openrouter' GROUP BY model_id
+            ) last ON s.id = last.id
+        ''')
+        return {
+            model_id: (prompt, completion)
+            for model_id, prompt, completion in rows
+            if prompt is not None or completion is not None
+        }
+
+    def current_prices(self) -> Dict[str, Tuple[float, float]]:
+        """当前生效价格：delta 模式用内存中的状态 (不查库)，full 模式从库中读取"""
+        if self.snapshot_mode != "delta":
+            return self.load_current_prices()
+        if self._current_prices is None:
+            self._current_prices = self.load_current_prices()
+        return self._current_prices
+
+    def _delta_rows(self, prices: Prices) -> List[tuple]:
+        """只保留变化的行：新上架 / 价格变化 / 下架 (下架写一条价格为 NULL 的墓碑行)"""
+        seen: Set[str] = set()
+        batch = as_price_batch(prices)
+        return self._changed_rows(batch, seen) + self._tombstone_rows(seen, batch.timestamp.isoformat())
+
+    def _changed_rows(self, prices: Prices, seen: Set[str]) -> List[tuple]:
+        """新上架 / 价格变化的行，并把出现过的 model_id 记入 seen (可按批多次调用)"""
+        if self._current_prices is None:
+            self._current_prices = self.load_current_prices()
+        current = self._current_prices
+        batch = as_price_batch(prices)
+        scan_ts = batch.timestamp.isoformat()
+
+        rows = []
+        for model_id, prompt, completion in batch.price_pairs():
+            seen.add(model_id)
+            new = (prompt, completion)
+            if current.get(model_id) != new:
+                rows.append((model_id, batch.provider, prompt, completion, scan_ts))
+                current[model_id] = new
+        return rows
+
+    def _tombstone_rows(self, seen: Set[str], scan_ts: str) -> List[tuple]:
+        """本轮没出现的模型视为下架，写墓碑行"""
+        current = self._current_prices
+        rows = []
+        for model_id in [m for m in current if m not in seen]:
+            rows.append((model_id, "openrouter", None, None, scan_ts))
+            del current[model_id]
+        return rows
+
+    def _changed_models(self, rows: List[tuple]) -> Optional[Set[str]]:
+        """汇总表需要更新的模型：delta 模式为写了行的模型，full 模式不区分 (None = 全部)"""
+        return {row[0] for row in rows} if self.snapshot_mode == "delta" else None
+
+    def _insert_snapshots(self, rows: List[tuple]):
+        self.store.insert_rows(
+            "price_snapshots",
+            ("model_id", "provider", "prompt_price", "completion_price", "timestamp"),
+            rows)
+
+    def save_prices(self, prices: Prices, fetch_status: Optional[str] = None) -> List[tuple]:
+        """保存价格到数据库 (delta 模式只写变化行)，并记录本轮心跳 (快照 / 墓碑 / 心跳同用批次时间戳)；返回写入的行"""
+        prices = as_price_batch(prices)
+        scan_ts = prices.timestamp.isoformat()
+        if self.snapshot_mode == "delta":
+            rows = self._delta_rows(prices)
+        else:
+            rows = list(prices.snapshot_rows())
+
+        with self.store.transaction():
+            self._insert_snapshots(rows)
+            self.record_heartbeat(scan_ts, len(prices), len(rows), fetch_status)
+        return rows
+
+    def record_heartbeat(self, scan_ts: str, model_count: int, written_count: int,
+                         fetch_status: Optional[str] = None):
+        self.store.execute('''
+            INSERT INTO scan_heartbeats (timestamp, mode, model_count, written_count, fetch_status)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (scan_ts, self.snapshot_mode, model_count, written_count, fetch_status))
+
+    def record_unchanged_scan(self, fetch: CatalogFetch):
+        """
+        目录未变化：跳过解析/写入/检测，只记心跳 (模型数沿用上次) 并刷新校验状态
+
+        价格与上次相同：汇总表只在本轮是当前桶的第一轮时按当前价格铺桶，否则不写 (信号已在价格变化那轮记过)
+        """
+        current = self.current_prices()
+        unchanged = PriceBatch(list(current), array("d", (p for p, _ in current.values())),
+                               array("d", (c for _, c in current.values())))
+        try:
+            with self.store.transaction():
+                self.record_heartbeat(unchanged.timestamp.isoformat(), self.fetcher.model_count, 0, fetch.status)
+                self.rollups.update(unchanged, [], changed=())
+                self.fetcher.save_state(fetch)
+        except Exception:
+            self.rollups.reset()
+            raise
+
+    def price_at(self, model_id: str, at: datetime) -> Optional[Tuple[float, float]]:
+        """还原某模型在指定时刻生效的 (prompt, completion) 价格；未上架/已下架返回 None"""
+        row = self.store.query_one('''
+            SELECT prompt_price, completion_price FROM price_snapshots
+            WHERE model_id = ? AND source = 'openrouter' AND timestamp <= ?
+            ORDER BY timestamp DESC LIMIT 1
+        ''', (model_id, at.isoformat()))
+        if row is None or (row[0] is None and row[1] is None):
+            return None
+        return row[0], row[1]
+
+    def prices_at(self, at: datetime) -> Dict[str, Tuple[float, float]]:
+        """还原指定时刻全部模型的生效价格"""
+        rows = self.store.query('''
+            SELECT s.model_id, s.prompt_price, s.completion_price
+            FROM price_snapshots s
+            JOIN (
+                SELECT model_id, MAX(id) AS id FROM price_snapshots
+                WHERE source = 'openrouter' AND timestamp <= ? GROUP BY model_id
+            ) last ON s.id = last.id
+        ''', (at.isoformat(),))
+        return {
+            model_id: (prompt, completion)
+            for model_id, prompt, completion in rows
+            if prompt is not None or completion is not None
+        }
         
-    def detect_arbitrage(self, prices: List[ModelPrice]) -> List[Dict]:
-        """检测套利机会"""
+    def detect_arbitrage(self, prices: Prices) -> List[Dict]:
+        """检测套利机会 (逐模型循环版，保留作对照)"""
         opportunities = []
+        batch = as_price_batch(prices)
         
-        for price in prices:
-            model_key = None
-            # 模糊匹配模型名
-            for key in DIRECT_PRICING:
-                if key.lower() in price.model_id.lower():
-                    model_key = key
-                    break
-                    
+        for model_id, prompt_price, completion_price in batch.price_pairs():
+            # 模糊匹配模型名 (取最长命中，gpt-4o-mini 不会被当成 gpt-4o)
+            model_key = self.resolver.resolve(model_id)
             if not model_key:
                 continue
                 
-            direct = DIRECT_PRICING[model_key]
+            direct = self.reference_table[model_key]
             
             # 计算价差百分比
-            prompt_diff = (direct["prompt"] - price.prompt_price) / direct["prompt"] if direct["prompt"] > 0 else 0
-            completion_diff = (direct["completion"] - price.completion_price) / direct["completion"] if direct["completion"] > 0 else 0
+            prompt_diff = (direct["prompt"] - prompt_price) / direct["prompt"] if direct["prompt"] > 0 else 0
+            completion_diff = (direct["completion"] - completion_price) / direct["completion"] if direct["completion"] > 0 else 0
             
             # 记录显著价差 (>15%)
             if abs(prompt_diff) > PRICE_DIFF_THRESHOLD or abs(completion_diff) > PRICE_DIFF_THRESHOLD:
                 opp = {
-                    "model_id": price.model_id,
-                    "or_prompt": price.prompt_price,
-                    "or_completion": price.completion_price,
+                    "model_id": model_id,
+                    "or_prompt": prompt_price,
+                    "or_completion": completion_price,
                     "direct_prompt": direct["prompt"],
                     "direct_completion": direct["completion"],
                     "prompt_diff_pct": prompt_diff,
                     "completion_diff_pct": completion_diff,
-                    "timestamp": price.timestamp
+                    "timestamp": batch.timestamp
                 }
                 opportunities.append(opp)
                 
                 direction = " cheaper" if prompt_diff > 0 else " more expensive"
-                self.log(f"套利信号: {price.model_id} - OpenRouter 比直供{direction} {abs(prompt_diff)*100:.1f}%")
+                self.log(f"套利信号: {model_id} - OpenRouter 比直供{direction} {abs(prompt_diff)*100:.1f}%")
                 
         return opportunities
+
+    @metrics.timed("detect", source="openrouter")
+    def detect_arbitrage_batch(self, prices: Prices,
+                               thresholds: Tuple[float, ...] = (PRICE_DIFF_THRESHOLD,),
+                               references: Optional[Dict[str, Dict]] = None) -> Dict[Tuple[str, float], List[Dict]]:
+        """向量化检测: 一次计算多个参考价来源 x 多个阈值 (默认只用合并后的参考价表 + PRICE_DIFF_THRESHOLD)"""
+        if references is None:
+            references = {"direct": self.reference_table}
+        return evaluate_scan(prices, references, thresholds, self._reference_indexes)
+
+    def log_signals(self, opportunities: List[Dict]):
+        """逐条记录套利信号"""
+        for opp in opportunities:
+            metrics.count("signals", source="openrouter", model=opp["model_id"])
+            direction = " cheaper" if opp["prompt_diff_pct"] > 0 else " more expensive"
+            self.log(f"套利信号: {opp['model_id']} - OpenRouter 比直供{direction} {abs(opp['prompt_diff_pct'])*100:.1f}%")
         
     def save_opportunities(self, opportunities: List[Dict]):
         """保存套利机会"""
         if not opportunities:
             return
             
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        for opp in opportunities:
-            cursor.execute('''
-                INSERT INTO arbitrage_opportunities 
-                (model_id, or_prompt_price, or_completion_price, direct_prompt_price,
-                 direct_completion_price, prompt_diff_pct, completion_diff_pct, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (opp["model_id"], opp["or_prompt"], opp["or_completion"],
-                  opp["direct_prompt"], opp["direct_completion"],
-                  opp["prompt_diff_pct"], opp["completion_diff_pct"],
-                  opp["timestamp"].isoformat()))
+        self.store.insert_rows(
+            "arbitrage_opportunities",
+            ("model_id", "or_prompt_price", "or_completion_price", "direct_prompt_price",
+             "direct_completion_price", "prompt_diff_pct", "completion_diff_pct", "timestamp"),
+            ((opp["model_id"], opp["or_prompt"], opp["or_completion"],
+              opp["direct_prompt"], opp["direct_completion"],
+              opp["prompt_diff_pct"], opp["completion_diff_pct"],
+              opp["timestamp"].isoformat()) for opp in opportunities))
         
-        conn.commit()
-        conn.close()
+    def ingest_scan(self, prices: Prices, opportunities: List[Dict],
+                    fetch: Optional[CatalogFetch] = None):
+        """整批写入一次扫描：快照 + 套利信号 + 小时/天汇总 (只写变价 / 有信号的模型) (+ 目录校验状态)，单事务多行 INSERT"""
+        prices = as_price_batch(prices)
+        try:
+            with self.store.transaction(bulk=True):
+                rows = self.save_prices(prices, fetch.status if fetch else None)
+                self.save_opportunities(opportunities)
+                self.rollups.update(prices, opportunities, self._changed_models(rows))
+                if fetch is not None:
+                    self.fetcher.save_state(fetch, model_count=len(prices))
+        except Exception:
+            # 事务未提交，内存中的 delta 状态与校验状态作废，下次从库中重新加载；汇总表下轮重新铺桶
+            self._current_prices = None
+            self.fetcher.reload()
+            self.rollups.reset()
+            raise
         
     def get_hourly_report(self) -> str:
         """生成小时级报告"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
-        
-        # 统计过去1小时数据点
-        cursor.execute('''
-            SELECT COUNT(*) FROM price_snapshots WHERE timestamp > ?
-        ''', (one_hour_ago,))
-        snapshot_count = cursor.fetchone()[0]
-        
-        # 统计套利机会
-        cursor.execute('''
-            SELECT COUNT(*), AVG(ABS(prompt_diff_pct)) 
-            FROM arbitrage_opportunities 
-            WHERE timestamp > ?
-        ''', (one_hour_ago,))
-        opp_stats = cursor.fetchone()
-        
-        conn.close()
+        # 只读汇总表里最近一个整点小时的桶
+        bucket = last_full_hour()
+        snapshot_count, opp_count, avg_abs_diff = hour_summary(self.store, bucket)
         
         report = f"""
 📊 曹皇套利监控 - 小时报告
-时间: {datetime.now().strftime("%Y-%m-%d %H:%M")}
+时间: {datetime.now().strftime("%Y-%m-%d %H:%M")} (统计 {bucket.replace("T", " ")}:00 起一小时)
 ━━━━━━━━━━━━━━━━━━━━━━━━━━
 数据点: {snapshot_count} 条
-套利机会: {opp_stats[0]} 次
-平均价差: {opp_stats[1]*100:.1f}%
+套利机会: {opp_count} 次
+平均价差: {avg_abs_diff*100:.1f}%
 ━━━━━━━━━━━━━━━━━━━━━━━━━━
 状态: 🟢 监控中
         """
         return report.strip()
         
+    def ingest_stream(self, batches: Iterable[PriceBatch], stream: Optional[CatalogStream] = None) -> Dict:
+        """
+        流水线: PriceBatch 流 → 按批向量化检测 → 每批一个写事务 (变化行 + 套利信号)
+
+        流读完后再写下架墓碑行、心跳与目录校验状态 (需要看完全部模型/整个响应体)。
+        按批提交意味着中途失败时前面的批次已落库 (都是真实观测到的价格)，
+        此时内存中的 delta 状态与校验状态作废，下次从库中重新加载。
+        返回 {"models", "written", "opportunities", "first_write_s"}
+        """
+        start = time.perf_counter()
+        scan_ts = None  # 墓碑与心跳用第一批的时间戳 (iter_price_batches 各批共用同一个)
+        seen: Set[str] = set()
+        stats = {"models": 0, "written": 0, "opportunities": 0, "first_write_s": None}
+        try:
+            for batch in batches:
+                scan_ts = scan_ts or batch.timestamp.isoformat()
+                opportunities = self.detect_arbitrage_batch(batch)[("direct", PRICE_DIFF_THRESHOLD)]
+                self.log_signals(opportunities)
+                if self.snapshot_mode == "delta":
+                    rows = self._changed_rows(batch, seen)
+                else:
+                    rows = list(batch.snapshot_rows())
+                with self.store.transaction():
+                    self._insert_snapshots(rows)
+                    self.save_opportunities(opportunities)
+                    self.rollups.update(batch, opportunities, self._changed_models(rows))
+                if stats["first_write_s"] is None and rows:
+                    stats["first_write_s"] = time.perf_counter() - start
+                stats["models"] += len(batch)
+                stats["written"] += len(rows)
+                stats["opportunities"] += len(opportunities)
+
+            if not stats["models"]:
+                return stats  # 空目录多半是上游异常，不能据此把全部模型记为下架
+            fetch = stream.result() if stream is not None else None
+            tombstones = self._tombstone_rows(seen, scan_ts) if self.snapshot_mode == "delta" else []
+            with self.store.transaction():
+                self._insert_snapshots(tombstones)
+                self.record_heartbeat(scan_ts, stats["models"], stats["written"] + len(tombstones),
+                                      fetch.status if fetch else None)
+                if fetch is not None:
+                    self.fetcher.save_state(fetch, model_count=stats["models"])
+        except Exception:
+            self._current_prices = None
+            self.fetcher.reload()
+            self.rollups.reset()
+            raise
+        stats["written"] += len(tombstones)
+        return stats
+
+    def run_stream(self):
+        """流式执行单次监控 (STREAMING=True 时 run_once 走这里)"""
+        pending = self.references.begin_refresh()
+        try:
+            stream = self.fetcher.stream()
+        except Exception as e:
+            self.log(f"获取 OpenRouter 价格失败: {e}", "ERROR")
+            self._collect_references(pending)
+            return
+        if self._collect_references(pending) and isinstance(stream, CatalogFetch):
+            # 目录没变但参考价变了：不带条件头重抓一次，按新参考价重新检测
+            self.fetcher.invalidate()
+            try:
+                stream = self.fetcher.stream()
+            except Exception as e:
+                self.log(f"获取 OpenRouter 价格失败: {e}", "ERROR")
+                return
+        if isinstance(stream, CatalogFetch):  # 304
+            self.record_unchanged_scan(stream)
+            self.log(f"价格目录未变化 ({stream.status})，跳过解析/写入/检测")
+            return
+
+        try:
+            stats = self.ingest_stream(self.iter_price_batches(iter_json_array(stream.chunks())), stream)
+        except Exception as e:
+            self.log(f"流式扫描中断: {e}", "ERROR")
+            return
+        metrics.count("models", stats["models"], source="openrouter")
+        if not stats["models"]:
+            self.log("未能获取价格数据", "WARN")
+            return
+        self.log(f"已获取 {stats['models']} 个模型价格 (流式，写入 {stats['written']} 行)")
+        if stats["opportunities"]:
+            self.log(f"发现 {stats['opportunities']} 个套利信号")
+        else:
+            self.log("当前无明显套利机会")
+        
+    def fetch_stats(self, hours: int = 24) -> Dict[str, int]:
+        """过去 N 小时各抓取状态的扫描次数 (changed / not_modified / hash_match)"""
+        since = (datetime.now() - timedelta(hours=hours)).isoformat()
+        rows = self.store.query('''
+            SELECT COALESCE(fetch_status, 'unconditional'), COUNT(*) FROM scan_heartbeats
+            WHERE timestamp > ? GROUP BY fetch_status
+        ''', (since,))
+        return dict(rows)
+        
     def run_once(self):
-        """执行单次监控"""
+        """执行单次监控 (各阶段耗时见 metrics.py)"""
+        with metrics.timer("scan", source="openrouter"):
+            self._scan()
+
+    def _scan(self):
         self.log("开始扫描 OpenRouter 价格...")
+        if self.streaming:
+            self.run_stream()
+            return
         
-        prices = self.fetch_openrouter_prices()
+        pending = self.references.begin_refresh()  # 参考价来源与目录抓取并发
+        fetch = self.fetch_catalog()
+        if self._collect_references(pending) and fetch is not None and fetch.unchanged:
+            # 目录没变但参考价变了：不带条件头重抓一次，按新参考价重新检测
+            self.fetcher.invalidate()
+            fetch = self.fetch_catalog()
+        if fetch is not None and fetch.unchanged:
+            self.record_unchanged_scan(fetch)
+            self.log(f"价格目录未变化 ({fetch.status})，跳过解析/写入/检测")
+            return
+        
+        prices = self.parse_models(fetch.data) if fetch is not None else []
+        metrics.count("models", len(prices), source="openrouter")
         if prices:
-            self.save_prices(prices)
+            opportunities = self.detect_arbitrage_batch(prices)[("direct", PRICE_DIFF_THRESHOLD)]
+            self.log_signals(opportunities)
+            
+            self.ingest_scan(prices, opportunities, fetch)
             self.log(f"已获取 {len(prices)} 个模型价格")
             
-            opportunities = self.detect_arbitrage(prices)
             if opportunities:
-                self.save_opportunities(opportunities)
                 self.log(f"发现 {len(opportunities)} 个套利信号")
             else:
                 self.log("当前无明显套利机会")
@@ -263,20 +533,14 @@ class ArbitrageMonitor:
             self.log("未能获取价格数据", "WARN")
             
     def run_continuous(self, interval_minutes: int = 5):
-        """持续运行"""
+        """持续运行 (扫描对齐到墙钟网格，不随扫描耗时漂移；与其他周期任务同进程运行见 daemon.py)"""
         self.log(f"曹皇套利监控系统启动 - 每 {interval_minutes} 分钟扫描一次")
-        
-        while True:
-            try:
-                self.run_once()
-                self.log(f"下次扫描: {interval_minutes} 分钟后")
-                time.sleep(interval_minutes * 60)
-            except KeyboardInterrupt:
-                self.log("监控已手动停止", "INFO")
-                break
-            except Exception as e:
-                self.log(f"运行错误: {e}", "ERROR")
-                time.sleep(60)  # 错误后等待1分钟重试
+        interval = interval_minutes * 60
+        scheduler = Scheduler([Job("arbitrage", self.run_once, interval, timeout=interval, immediate=True)])
+        try:
+            asyncio.run(scheduler.run())
+        except KeyboardInterrupt:
+            self.log("监控已手动停止", "INFO")
 
 if __name__ == "__main__":
     import sys
@@ -285,5 +549,12 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == "report":
         print(monitor.get_hourly_report())
+    elif len(sys.argv) > 1 and sys.argv[1] == "stats":
+        stats = monitor.fetch_stats()
+        total = sum(stats.values())
+        skipped = total - stats.get("changed", 0) - stats.get("unconditional", 0)
+        print(f"过去 24 小时扫描 {total} 次，短路 {skipped} 次: {stats}")
     else:
         monitor.run_once()
+        metrics.export()
+    monitor.close()
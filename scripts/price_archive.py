@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 列式价格历史归档 👑
+把 price_snapshots 增量导出成定长二进制列文件，读取方用 numpy.memmap 打开，回测/画图不再逐行走 SQL
+
+目录结构 (ARCHIVE_PATH)：
+  manifest.json          已导出到的快照 id、模型字典长度、各分区行数与时间范围 (原子替换，读取方只信它)
+  models.txt             模型字典，一行一个 model_id，行号即列里的模型编号 (只追加)
+  last_prices.npy        每个模型最后归档的 (prompt, completion)，用于去掉未变化的行
+  YYYY-MM/               当月分区：按时间顺序只追加
+  YYYY-MM.sealed/        封存分区：按 (模型, 时间) 排序 + offsets.u32，单模型查询是零拷贝切片
+  YYYY-MM.N[.sealed]/    中断重试时重新写到已封存月份的分区 (只含重复的变化点)
+
+- 列: ts (datetime64[us]) / model (uint32) / prompt / completion (float64，下架墓碑为 NaN)，每行 28 字节
+- 只归档价格变化点 (full 模式的库里重复的价格也会被去掉)；memmap 要求定长未压缩，不做 zlib
+- 出现更晚月份的数据时封存上一个分区 (整体重排一次后不再改动)
+- 崩溃安全：列文件先追加、manifest 后替换；重新打开时把列文件截断到 manifest 记录的行数
+
+用法:
+  python scripts/price_archive.py export             # 从 arbitrage.db 增量导出
+  python scripts/price_archive.py info               # 分区 / 行数 / 大小
+  python scripts/price_archive.py history <model_id> # 某模型的价格变化历史
+  python scripts/price_archive.py bench [天数] [模型数] # 合成库上对比 SQL 与 memmap 的范围查询
+
+作者: 曹皇 👑
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+ARCHIVE_PATH = Path.home() / ".openclaw" / "workspace" / "data" / "archive" / "openrouter"
+EXPORT_CHUNK = 50_000   # 每次从库中读取的快照行数
+
+COLUMNS = {"ts": "datetime64[us]", "model": "<u4", "prompt": "<f8", "completion": "<f8"}
+UNSEEN = np.inf         # last_prices 中从未归档过的模型
+
+
+class History(NamedTuple):
+    ts: np.ndarray          # datetime64[us]
+    model: np.ndarray       # uint32，PriceArchive.models 的下标
+    prompt: np.ndarray      # USD per 1M tokens，墓碑为 NaN
+    completion: np.ndarray
+
+    def __len__(self):
+        return len(self.ts)
+
+
+def _concat(parts: List[History]) -> History:
+    """单个分片原样返回 (零拷贝)，多个分片拼接"""
+    parts = [p for p in parts if len(p)]
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return History(*(np.empty(0, dtype) for dtype in COLUMNS.values()))
+    return History(*(np.concatenate(cols) for cols in zip(*parts)))
+
+
+def _to_datetime64(value) -> Optional[np.datetime64]:
+    return None if value is None else np.datetime64(value, "us")
+
+
+class PriceArchive:
+    """只读访问归档 (其他进程导出时可以同时读取，看到的是上一次提交的 manifest)"""
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = Path(path)
+        self.reload()
+
+    def reload(self):
+        manifest_path = self.path / "manifest.json"
+        if manifest_path.exists():
+            self.manifest = json.loads(manifest_path.read_text())
+        else:
+            self.manifest = {"last_id": 0, "model_count": 0, "partitions": []}
+        lines = (self.path / "models.txt").read_text().splitlines() if self.manifest["model_count"] else []
+        self.models: List[str] = lines[:self.manifest["model_count"]]
+        self.index: Dict[str, int] = {m: i for i, m in enumerate(self.models)}
+        self._maps: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def columns(self, part: dict) -> Dict[str, np.ndarray]:
+        """分区各列的 memmap (只映射 manifest 记录的行数)"""
+        key = part["dir"]
+        if key not in self._maps:
+            rows = part["rows"]
+            cols = {}
+            for name, dtype in COLUMNS.items():
+                if rows:
+                    cols[name] = np.memmap(self.path / key / name, dtype=dtype, mode="r", shape=(rows,))
+                else:
+                    cols[name] = np.empty(0, dtype=dtype)
+            if part["sealed"]:
+                cols["offsets"] = np.fromfile(self.path / key / "offsets", dtype="<u4")
+            self._maps[key] = cols
+        return self._maps[key]
+
+    def _overlapping(self, start, end) -> List[dict]:
+        return [
+            part for part in self.manifest["partitions"] if part["rows"]
+            and (start is None or np.datetime64(part["ts_max"]) >= start)
+            and (end is None or np.datetime64(part["ts_min"]) <= end)
+        ]
+
+    def model_history(self, model_id: str, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> History:
+        """某模型 [start, end] 内的价格变化点；封存分区内是 memmap 切片 (零拷贝)"""
+        idx = self.index.get(model_id)
+        if idx is None:
+            return _concat([])
+        start, end = _to_datetime64(start), _to_datetime64(end)
+        parts = []
+        for part in self._overlapping(start, end):
+            cols = self.columns(part)
+            if part["sealed"]:
+                offsets = cols["offsets"]
+                if idx + 1 >= len(offsets):
+                    continue  # 封存之后才出现的模型
+                lo, hi = int(offsets[idx]), int(offsets[idx + 1])
+                ts = cols["ts"][lo:hi]
+                a = lo + (np.searchsorted(ts, start, "left") if start is not None else 0)
+                b = lo + (np.searchsorted(ts, end, "right") if end is not None else hi - lo)
+                parts.append(History(*(cols[name][a:b] for name in COLUMNS)))
+            else:
+                mask = cols["model"] == idx
+                if start is not None:
+                    mask &= cols["ts"] >= start
+                if end is not None:
+                    mask &= cols["ts"] <= end
+                parts.append(History(*(cols[name][mask] for name in COLUMNS)))
+        return _concat(parts)
+
+    def range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> History:
+        """
+        全部模型 [start, end] 内的价格变化点
+
+        当月分区按时间排序，取的是切片 (零拷贝)；封存分区整段落在区间内时也是整列视图，
+        但行序是 (模型, 时间)，需要时间序的调用方自行 argsort
+        """
+        start, end = _to_datetime64(start), _to_datetime64(end)
+        parts = []
+        for part in self._overlapping(start, end):
+            cols = self.columns(part)
+            inside = ((start is None or np.datetime64(part["ts_min"]) >= start)
+                      and (end is None or np.datetime64(part["ts_max"]) <= end))
+            if inside:
+                parts.append(History(*(cols[name] for name in COLUMNS)))
+            elif part["sealed"]:
+                mask = np.ones(part["rows"], dtype=bool)
+                if start is not None:
+                    mask &= cols["ts"] >= start
+                if end is not None:
+                    mask &= cols["ts"] <= end
+                parts.append(History(*(cols[name][mask] for name in COLUMNS)))
+            else:
+                a = np.searchsorted(cols["ts"], start, "left") if start is not None else 0
+                b = np.searchsorted(cols["ts"], end, "right") if end is not None else part["rows"]
+                parts.append(History(*(cols[name][a:b] for name in COLUMNS)))
+        return _concat(parts)
+
+    def prices_at(self, at: datetime) -> Dict[str, Tuple[float, float]]:
+        """还原 at 时刻全部模型的生效价格 (与 ArbitrageMonitor.prices_at 结果一致)"""
+        h = self.range(None, at)
+        if not len(h):
+            return {}
+        order = np.lexsort((h.ts, h.model))  # 按模型、再按时间 (稳定排序保留同一秒内的写入顺序)
+        model = h.model[order]
+        last = np.flatnonzero(np.append(model[1:] != model[:-1], True))
+        rows = order[last]
+        alive = ~(np.isnan(h.prompt[rows]) & np.isnan(h.completion[rows]))
+        return {
+            self.models[m]: (None if p != p else p, None if c != c else c)
+            for m, p, c in zip(h.model[rows][alive].tolist(), h.prompt[rows][alive].tolist(),
+                               h.completion[rows][alive].tolist())
+        }
+
+
+# === 导出 ===
+
+class ArchiveWriter(PriceArchive):
+    """单写者：增量导出 + 封存分区"""
+
+    def __init__(self, path=ARCHIVE_PATH):
+        super().__init__(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._recover()
+        last_path = self.path / "last_prices.npy"
+        self.last = np.load(last_path)[:len(self.models)] if last_path.exists() else np.empty((0, 2))
+        if len(self.last) < len(self.models):  # 上次导出在保存 last_prices 之前中断
+            self.last = np.vstack([self.last, np.full((len(self.models) - len(self.last), 2), UNSEEN)])
+
+    def _recover(self):
+        """丢弃上次中断时未提交 (manifest 之后) 的追加内容"""
+        models_path = self.path / "models.txt"
+        if models_path.exists():
+            lines = models_path.read_text().splitlines()
+            if len(lines) != len(self.models):
+                models_path.write_text("".join(m + "\n" for m in self.models))
+        for part in self.manifest["partitions"]:
+            if part["sealed"]:
+                continue
+            for name, dtype in COLUMNS.items():
+                column = self.path / part["dir"] / name
+                if column.exists():
+                    os.truncate(column, part["rows"] * np.dtype(dtype).itemsize)
+
+    def _commit(self, save_last: bool = True):
+        """
+        先替换 manifest 再存 last_prices：两步之间中断只会多写几个重复的变化点，不会漏
+
+        块中途封存分区时 save_last=False：此时 self.last 已含整块的新价格而 last_id 还是块之前的，
+        若一并落盘，中断后重读这一块会把后面月份的变化点当作未变化跳过
+        """
+        self.manifest["model_count"] = len(self.models)
+        tmp = self.path / "manifest.json.tmp"
+        tmp.write_text(json.dumps(self.manifest, indent=1))
+        os.replace(tmp, self.path / "manifest.json")
+        if save_last:
+            np.save(self.path / "last_prices.tmp.npy", self.last)
+            os.replace(self.path / "last_prices.tmp.npy", self.path / "last_prices.npy")
+        self._maps.clear()
+
+    def _add_models(self, model_ids: Iterable[str]) -> List[str]:
+        """给没见过的模型分配编号，last 每块只扩一次 (逐个 vstack 是 O(模型数²))；返回新模型"""
+        new_models = [m for m in dict.fromkeys(model_ids) if m not in self.index]
+        for model_id in new_models:
+            self.index[model_id] = len(self.models)
+            self.models.append(model_id)
+        if new_models:
+            self.last = np.vstack([self.last, np.full((len(new_models), 2), UNSEEN)])
+        return new_models
+
+    def _open_partition(self, month: str) -> dict:
+        parts = self.manifest["partitions"]
+        if parts and not parts[-1]["sealed"]:
+            if parts[-1]["name"] >= month:
+                return parts[-1]  # 同月 (或迟到的旧月份行) 继续追加
+            self.seal(parts[-1])
+        # 中断后重读的块可能再次写到已封存的月份：换一个目录名，封存时不覆盖原封存分区
+        used = {p["dir"].replace(".sealed", "") for p in parts}
+        directory, n = month, 1
+        while directory in used:
+            n += 1
+            directory = f"{month}.{n}"
+        # 目录不在 manifest 里：多半是上次中断前未提交的追加内容，清掉重来
+        shutil.rmtree(self.path / directory, ignore_errors=True)
+        (self.path / directory).mkdir()
+        part = {"name": month, "dir": directory, "rows": 0, "sealed": False, "ts_min": None, "ts_max": None}
+        parts.append(part)
+        return part
+
+    def _append(self, part: dict, ts: np.ndarray, model: np.ndarray, prompt: np.ndarray,
+                completion: np.ndarray):
+        for name, values in zip(COLUMNS, (ts, model, prompt, completion)):
+            with open(self.path / part["dir"] / name, "ab") as f:
+                values.astype(COLUMNS[name]).tofile(f)
+        part["rows"] += len(ts)
+        lo, hi = str(ts.min()), str(ts.max())
+        part["ts_min"] = lo if part["ts_min"] is None else min(part["ts_min"], lo)
+        part["ts_max"] = hi if part["ts_max"] is None else max(part["ts_max"], hi)
+
+    def seal(self, part: dict):
+        """把分区重排为 (模型, 时间) 顺序并写 offsets，之后单模型查询是连续切片"""
+        cols = self.columns(part)
+        order = np.lexsort((cols["ts"], cols["model"]))
+        sealed_dir = part["dir"] + ".sealed"
+        target = self.path / sealed_dir
+        shutil.rmtree(target, ignore_errors=True)
+        target.mkdir()
+        for name, dtype in COLUMNS.items():
+            cols[name][order].astype(dtype).tofile(target / name)
+        offsets = np.searchsorted(cols["model"][order], np.arange(len(self.models) + 1)).astype("<u4")
+        offsets.tofile(target / "offsets")
+        old_dir = part["dir"]
+        part["dir"], part["sealed"] = sealed_dir, True
+        self._commit(save_last=False)  # last_prices 只随块末的提交落盘
+        shutil.rmtree(self.path / old_dir, ignore_errors=True)
+
+    def export(self, store, chunk: int = EXPORT_CHUNK) -> Dict:
+        """从 price_snapshots 增量导出 id > last_id 的行，返回 {"read", "written", "elapsed"}"""
+        start = time.perf_counter()
+        stats = {"read": 0, "written": 0}
+        while True:
+            # NOT INDEXED：按 rowid 区间顺序读；否则规划器会走 source 索引再对全部 openrouter 行排序
+            rows = store.query('''
+                SELECT id, model_id, timestamp, prompt_price, completion_price FROM price_snapshots NOT INDEXED
+                WHERE id > ? AND source = 'openrouter' ORDER BY id LIMIT ?
+            ''', (self.manifest["last_id"], chunk))
+            if not rows:
+                break
+            stats["read"] += len(rows)
+            new_models = self._add_models(row[1] for row in rows)
+            keep = []
+            nan = float("nan")
+            for _id, model_id, ts, prompt, completion in rows:
+                idx = self.index[model_id]
+                price = (nan if prompt is None else prompt, nan if completion is None else completion)
+                # 与该模型上一个归档点相同则跳过 (NaN 墓碑视为相同)
+                if all(a == b or (a != a and b != b) for a, b in zip(price, self.last[idx])):
+                    continue
+                self.last[idx] = price
+                keep.append((ts, idx, price[0], price[1]))
+            if new_models:  # 字典先落盘：封存分区时提交的 manifest 会计入这些模型
+                with open(self.path / "models.txt", "a") as f:
+                    f.writelines(m + "\n" for m in new_models)
+
+            if keep:
+                ts = np.array([r[0] for r in keep], dtype="datetime64[us]")
+                model = np.array([r[1] for r in keep], dtype="<u4")
+                prompt = np.array([r[2] for r in keep], dtype="<f8")
+                completion = np.array([r[3] for r in keep], dtype="<f8")
+                months = np.array([r[0][:7] for r in keep])
+                # 按月份切段追加 (行按 id 即时间顺序到达，月份单调)
+                bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+                for a, b in zip(np.r_[0, bounds], np.r_[bounds, len(keep)]):
+                    part = self._open_partition(str(months[a]))
+                    self._append(part, ts[a:b], model[a:b], prompt[a:b], completion[a:b])
+                stats["written"] += len(keep)
+            self.manifest["last_id"] = rows[-1][0]
+            self._commit()
+        stats["elapsed"] = time.perf_counter() - start
+        return stats
+
+
+def export(db_path=None, path=ARCHIVE_PATH) -> Dict:
+    """从 arbitrage.db 增量导出到归档 (daemon.py 每小时调用)"""
+    from storage import get_storage
+    if db_path is None:
+        import openrouter_arbitrage
+        db_path = openrouter_arbitrage.DB_PATH
+    stats = ArchiveWriter(path).export(get_storage(db_path, schema="arbitrage"))
+    print(f"📦 归档导出: 读取 {stats['read']:,} 行，写入变化点 {stats['written']:,} 行 ({stats['elapsed']:.2f}s)")
+    return stats
+
+
+# === 命令行 ===
+
+def info(path=ARCHIVE_PATH):
+    archive = PriceArchive(path)
+    size = sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file()) if Path(path).exists() else 0
+    print(f"👑 曹皇价格归档 {path}")
+    print(f"已导出到快照 id {archive.manifest['last_id']}，模型 {len(archive.models)} 个，共 {size / 1024:,.0f}KB")
+    for part in archive.manifest["partitions"]:
+        print(f"  {part['dir']:<16} {part['rows']:>10,} 行  {part['ts_min']} ~ {part['ts_max']}")
+
+
+def show_history(model_id: str, path=ARCHIVE_PATH):
+    h = PriceArchive(path).model_history(model_id)
+    print(f"{model_id}: {len(h)} 个价格变化点")
+    for ts, prompt, completion in zip(h.ts.tolist(), h.prompt.tolist(), h.completion.tolist()):
+        print(f"  {ts}  prompt ${prompt:.4f}  completion ${completion:.4f}")
+
+
+def _build_bench_db(db_path: Path, days: int, models: int, change_ratio: float = 0.02):
+    """合成 full 模式的库：每 5 分钟一轮全量快照，每轮约 change_ratio 的模型调价"""
+    from storage import get_storage
+    store = get_storage(db_path, schema="arbitrage")
+    rng = np.random.default_rng(7)
+    prompt = rng.uniform(0.1, 20, models).round(4)
+    completion = (prompt * 3).round(4)
+    model_ids = [f"bench/model-{i}" for i in range(models)]
+    start = datetime.now() - timedelta(days=days)
+    for s in range(days * 288):
+        changed = rng.random(models) < change_ratio
+        prompt[changed] = (prompt[changed] * rng.uniform(0.8, 1.2, changed.sum())).round(4)
+        ts = (start + timedelta(minutes=5 * s)).isoformat()
+        store.insert_rows("price_snapshots",
+                          ("model_id", "provider", "prompt_price", "completion_price", "timestamp"),
+                          zip(model_ids, ["openrouter"] * models, prompt.tolist(), completion.tolist(),
+                              [ts] * models))
+    return store
+
+
+def bench(days: int = 30, models: int = 340):
+    """合成库上对比：SQL 逐行读取 vs memmap (单模型全历史 / 全部模型一周 / 时点还原)"""
+    import openrouter_arbitrage
+
+    def best_of(fn, rounds=5):
+        times = []
+        for _ in range(rounds):
+            t = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - t)
+        return min(times) * 1000, result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        print(f"生成合成库: {days} 天 x {models} 模型 (full 模式，每轮约 2% 调价)...")
+        store = _build_bench_db(tmp / "arbitrage.db", days, models)
+        db_rows = store.query_one("SELECT COUNT(*) FROM price_snapshots")[0]
+        writer = ArchiveWriter(tmp / "archive")
+        stats = writer.export(store)
+        writer.seal(writer.manifest["partitions"][-1])  # 当月分区也封存，测单模型零拷贝路径
+        archive = PriceArchive(tmp / "archive")
+        db_size = (tmp / "arbitrage.db").stat().st_size
+        archive_size = sum(f.stat().st_size for f in (tmp / "archive").rglob("*") if f.is_file())
+        print(f"库 {db_rows:,} 行 {db_size / 1024 / 1024:.1f}MB → 归档 {stats['written']:,} 个变化点 "
+              f"{archive_size / 1024 / 1024:.2f}MB，导出 {stats['read'] / stats['elapsed']:,.0f} 行/秒")
+
+        openrouter_arbitrage.LOG_PATH = tmp / "arbitrage.log"
+        monitor = openrouter_arbitrage.ArbitrageMonitor(db_path=tmp / "arbitrage.db", snapshot_mode="full")
+        model_id = "bench/model-7"
+        week_ago = datetime.now() - timedelta(days=7)
+        cases = [
+            ("单模型全历史", lambda: store.query('''
+                SELECT timestamp, prompt_price, completion_price FROM price_snapshots
+                WHERE source = 'openrouter' AND model_id = ? ORDER BY timestamp
+             ''', (model_id,)), lambda: archive.model_history(model_id)),
+            ("全部模型最近 7 天", lambda: store.query('''
+                SELECT model_id, timestamp, prompt_price, completion_price FROM price_snapshots
+                WHERE timestamp >= ?
+             ''', (week_ago.isoformat(),)), lambda: archive.range(week_ago)),
+            ("时点还原 (7 天前)", lambda: monitor.prices_at(week_ago), lambda: archive.prices_at(week_ago)),
+        ]
+        print(f"{'查询':<18} {'SQL ms':>10} {'memmap ms':>10} {'加速':>8}")
+        for name, sql, mm in cases:
+            sql_ms, _ = best_of(sql)
+            mm_ms, _ = best_of(mm)
+            print(f"{name:<18} {sql_ms:>10.2f} {mm_ms:>10.3f} {sql_ms / mm_ms:>7.0f}x")
+
+        expected = monitor.prices_at(week_ago)
+        got = archive.prices_at(week_ago)
+        print("✅ 时点还原与 SQL 一致" if got == expected else f"❌ 时点还原不一致 ({len(got)} vs {len(expected)})")
+        store.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "info"
+    if command == "export":
+        export()
+    elif command == "history":
+        show_history(args[1])
+    elif command == "bench":
+        bench(*(int(a) for a in args[1:3]))
+    else:
+        info()
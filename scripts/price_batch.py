@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 列式价格批次 👑
+一次扫描 = 一个 PriceBatch，代替成千上万个 ModelPrice 对象
+
+- 整批共用一个扫描时间戳和 provider，不再每行一次 datetime.now()
+- model_id 用 sys.intern 驻留，跨扫描的同名 id 共享同一个字符串对象
+- prompt / completion 价格存在 array('d') 里，detect 直接拿 NumPy 零拷贝视图
+- 需要逐行访问的旧调用方用 PriceRow (__slots__ 行视图，按需创建，不常驻)
+
+作者: 曹皇 👑
+"""
+
+import sys
+from array import array
+from datetime import datetime
+from itertools import repeat
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+PER_MILLION = 1_000_000
+
+
+class PriceRow:
+    """PriceBatch 第 i 行的只读视图，字段与 ModelPrice 相同"""
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch: "PriceBatch", index: int):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def model_id(self) -> str:
+        return self.batch.model_ids[self.index]
+
+    @property
+    def name(self) -> str:
+        # 批次不保存展示名 (下游从未使用)，用 model_id 代替
+        return self.batch.model_ids[self.index]
+
+    @property
+    def provider(self) -> str:
+        return self.batch.provider
+
+    @property
+    def prompt_price(self) -> float:
+        return self.batch.prompt_prices[self.index]
+
+    @property
+    def completion_price(self) -> float:
+        return self.batch.completion_prices[self.index]
+
+    @property
+    def timestamp(self) -> datetime:
+        return self.batch.timestamp
+
+    def __repr__(self):
+        return (f"PriceRow(model_id={self.model_id!r}, prompt_price={self.prompt_price}, "
+                f"completion_price={self.completion_price})")
+
+
+class PriceBatch:
+    """一次扫描的列式价格 (USD per 1M tokens)"""
+
+    __slots__ = ("model_ids", "prompt_prices", "completion_prices", "timestamp", "provider")
+
+    def __init__(self, model_ids: List[str], prompt_prices: array, completion_prices: array,
+                 timestamp: Optional[datetime] = None, provider: str = "openrouter"):
+        if not len(model_ids) == len(prompt_prices) == len(completion_prices):
+            raise ValueError("PriceBatch 各列长度不一致")
+        self.model_ids = model_ids
+        self.prompt_prices = prompt_prices
+        self.completion_prices = completion_prices
+        self.timestamp = timestamp or datetime.now()
+        self.provider = provider
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], timestamp: Optional[datetime] = None,
+                     provider: str = "openrouter") -> "PriceBatch":
+        """由 /api/v1/models 的模型记录构建 (价格为 per token，转换为 per 1M tokens)"""
+        intern = sys.intern
+        model_ids: List[str] = []
+        prompt = array("d")
+        completion = array("d")
+        for model in records:
+            pricing = model.get("pricing", {})
+            model_ids.append(intern(model.get("id", "")))
+            prompt.append(float(pricing.get("prompt", 0)) * PER_MILLION)
+            completion.append(float(pricing.get("completion", 0)) * PER_MILLION)
+        return cls(model_ids, prompt, completion, timestamp, provider)
+
+    @classmethod
+    def from_prices(cls, prices: Iterable, timestamp: Optional[datetime] = None) -> "PriceBatch":
+        """由 ModelPrice (或任何有 model_id / prompt_price / completion_price 的对象) 序列构建"""
+        prices = list(prices)
+        provider = prices[0].provider if prices else "openrouter"
+        if timestamp is None and prices:
+            timestamp = prices[0].timestamp
+        return cls([sys.intern(p.model_id) for p in prices],
+                   array("d", (p.prompt_price for p in prices)),
+                   array("d", (p.completion_price for p in prices)),
+                   timestamp, provider)
+
+    def __len__(self) -> int:
+        return len(self.model_ids)
+
+    def __iter__(self) -> Iterator[PriceRow]:
+        return (PriceRow(self, i) for i in range(len(self.model_ids)))
+
+    def __getitem__(self, index: int) -> PriceRow:
+        if index < 0:
+            index += len(self.model_ids)
+        if not 0 <= index < len(self.model_ids):
+            raise IndexError(index)
+        return PriceRow(self, index)
+
+    @property
+    def prompt(self) -> np.ndarray:
+        """prompt 价格列的 float64 视图 (零拷贝)"""
+        return np.frombuffer(self.prompt_prices, dtype=np.float64)
+
+    @property
+    def completion(self) -> np.ndarray:
+        return np.frombuffer(self.completion_prices, dtype=np.float64)
+
+    def price_pairs(self) -> Iterator[Tuple[str, float, float]]:
+        """逐行 (model_id, prompt, completion)，不创建行对象"""
+        return zip(self.model_ids, self.prompt_prices, self.completion_prices)
+
+    def snapshot_rows(self) -> Iterator[tuple]:
+        """price_snapshots 行: (model_id, provider, prompt, completion, timestamp)"""
+        return zip(self.model_ids, repeat(self.provider), self.prompt_prices, self.completion_prices,
+                   repeat(self.timestamp.isoformat()))
+
+
+def as_price_batch(prices: Union[PriceBatch, Iterable]) -> PriceBatch:
+    """PriceBatch 原样返回；ModelPrice 列表等旧输入转换为 PriceBatch"""
+    return prices if isinstance(prices, PriceBatch) else PriceBatch.from_prices(prices)
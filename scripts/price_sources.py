@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 参考价来源 👑
+手工维护的 DIRECT_PRICING 扩展为可插拔的多个来源，并发抓取后合并成一张参考价表，
+ArbitrageMonitor 的检测 (逐个 / 向量化) 都只读这张表
+
+来源 (default_sources 的顺序即优先级，同一 key 后面的覆盖前面的)：
+- static     openrouter_arbitrage.DIRECT_PRICING (内置兜底，永不过期)
+- file       REFERENCE_FILE (JSON {key: {prompt, completion}} 或 CSV key,prompt,completion)，不存在则跳过
+- deepseek   DeepSeek /models 列出在售模型，价格取 DEEPSEEK_LIST_PRICES (DeepSeek 没有价格接口)
+- together   Together /v1/models 自带 pricing.input / output
+未配置 API Key 的来源视为未启用 (不算失败)
+
+- 价格统一为 USD / 1M tokens；key 参与 ModelResolver 的最长子串匹配
+- 每个来源独立的 ttl / timeout；到期的网络来源在线程池里并发抓取，单个来源失败或超时只影响它自己：
+  沿用上次成功的结果 (没有则不参与合并)，并计入 metrics 计数 source_errors
+- 网络来源的成功结果写入 CACHE_DIR/<来源>.json，cron 每轮新进程也按 TTL 复用
+- OpenRouter 是被比较的一方 (观测价)，由 catalog_fetch.ConditionalFetcher 条件抓取；
+  ArbitrageMonitor 先 begin_refresh() 再抓目录，最后 collect()，整轮耗时 ≈ max(OpenRouter, 最慢来源)
+
+用法:
+  python scripts/price_sources.py           # 刷新到期的来源并列出各来源状态
+  python scripts/price_sources.py bench     # 模拟慢来源：串行 vs 并发刷新耗时
+
+作者: 曹皇 👑
+"""
+
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+import metrics
+from key_manager import get_key
+
+DATA_DIR = Path.home() / ".openclaw" / "workspace" / "data"
+REFERENCE_FILE = DATA_DIR / "reference_prices.json"
+CACHE_DIR = DATA_DIR / "reference_cache"
+
+# DeepSeek 官网价格 (USD / 1M tokens，缓存未命中) - 需定期更新
+DEEPSEEK_LIST_PRICES = {
+    "deepseek-chat": {"prompt": 0.14, "completion": 0.28},
+    "deepseek-coder": {"prompt": 0.14, "completion": 0.28},
+    "deepseek-reasoner": {"prompt": 0.55, "completion": 2.19},
+}
+
+# 参考价表: {key: {"prompt": x, "completion": y}}
+PriceTable = Dict[str, Dict[str, float]]
+
+
+class PriceSource:
+    """参考价来源：fetch() 返回 PriceTable，未启用 (如没有 API Key) 返回 None，失败照常抛出"""
+    name = "base"
+    ttl: float = 6 * 60 * 60    # 秒，结果的有效期
+    timeout: float = 10         # 秒，单次抓取的总耗时上限
+    local = False               # 本地来源 (不走网络) 在调用线程里同步读取，不入线程池、不写缓存文件
+
+    def fetch(self, http) -> Optional[PriceTable]:
+        raise NotImplementedError
+
+
+class StaticSource(PriceSource):
+    name = "static"
+    ttl = math.inf
+    local = True
+
+    def __init__(self, table: PriceTable):
+        self.table = table
+
+    def fetch(self, http) -> PriceTable:
+        return {key: dict(prices) for key, prices in self.table.items()}
+
+
+class FileSource(PriceSource):
+    """主人手工维护的参考价文件 (JSON 或 CSV)，每分钟重新读取"""
+    name = "file"
+    ttl = 60
+    local = True
+
+    def __init__(self, path: Path = REFERENCE_FILE):
+        self.path = Path(path)
+
+    def fetch(self, http) -> Optional[PriceTable]:
+        if not self.path.exists():
+            return None
+        if self.path.suffix == ".csv":
+            with open(self.path, newline="") as f:
+                return {row["key"].strip(): {"prompt": float(row["prompt"]), "completion": float(row["completion"])}
+                        for row in csv.DictReader(f) if row.get("key")}
+        data = json.loads(self.path.read_text())
+        return {key: {"prompt": float(v["prompt"]), "completion": float(v["completion"])}
+                for key, v in data.items()}
+
+
+class DeepSeekSource(PriceSource):
+    name = "deepseek"
+    url = "https://api.deepseek.com/models"
+
+    def fetch(self, http) -> Optional[PriceTable]:
+        key = get_key("deepseek")
+        if not key:
+            return None
+        response = http.get(self.url, headers={"Authorization": f"Bearer {key}"}, timeout=self.timeout)
+        response.raise_for_status()
+        listed = {model["id"] for model in response.json().get("data", [])}
+        return {model: dict(prices) for model, prices in DEEPSEEK_LIST_PRICES.items() if model in listed}
+
+
+def together_key(model_id: str) -> str:
+    """meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo → llama-3.1-70b (与 OpenRouter id 的子串对齐)"""
+    name = model_id.split("/")[-1].lower()
+    name = re.sub(r"^meta-", "", name)
+    return re.sub(r"(-(instruct|turbo|chat|hf|lite|reference|fp8))+$", "", name)
+
+
+class TogetherSource(PriceSource):
+    name = "together"
+    url = "https://api.together.xyz/v1/models"
+
+    def fetch(self, http) -> Optional[PriceTable]:
+        key = get_key("together")
+        if not key:
+            return None
+        response = http.get(self.url, headers={"Authorization": f"Bearer {key}"}, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        table = {}
+        for model in data.get("data", []) if isinstance(data, dict) else data:
+            pricing = model.get("pricing") or {}
+            if model.get("type") not in ("chat", "language") or not (pricing.get("input") or pricing.get("output")):
+                continue
+            table[together_key(model["id"])] = {"prompt": float(pricing.get("input") or 0),
+                                                "completion": float(pricing.get("output") or 0)}
+        return table
+
+
+def default_sources(static_table: PriceTable) -> List[PriceSource]:
+    return [StaticSource(static_table), FileSource(), DeepSeekSource(), TogetherSource()]
+
+
+@dataclass
+class SourceState:
+    table: Optional[PriceTable] = None   # 上次成功的结果
+    fetched_at: float = 0.0              # 上次成功 (或确认未启用) 的时间戳
+    error: Optional[str] = None          # 最近一次失败原因 (成功后清空)
+    enabled: bool = True
+
+
+# begin_refresh 返回值: {来源名: (Future, 截止时间 monotonic)}
+Pending = Dict[str, Tuple[Future, float]]
+
+
+class ReferenceBook:
+    """多个来源的当前结果 + 合并后的参考价表 (version 在表内容变化时递增)"""
+
+    def __init__(self, sources: List[PriceSource], cache_dir: Optional[Path] = CACHE_DIR,
+                 session: Optional[requests.Session] = None):
+        self.sources = list(sources)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        # 自己的 Session，只在线程池里用 (不与调用方抓目录的 Session 跨线程共用)；close() 时关闭
+        self.http = session or requests.Session()
+        self.states: Dict[str, SourceState] = {s.name: self._load_cached(s) for s in self.sources}
+        self._inflight: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.sources)),
+                                            thread_name_prefix="price-source")
+        self.version = 0
+        self._table: PriceTable = {}
+        self._refresh_local(time.time())
+        self._merge()
+
+    # === 缓存文件 ===
+    def _cache_path(self, source: PriceSource) -> Optional[Path]:
+        if source.local or self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{source.name}.json"
+
+    def _load_cached(self, source: PriceSource) -> SourceState:
+        path = self._cache_path(source)
+        if path is None or not path.exists():
+            return SourceState()
+        try:
+            cached = json.loads(path.read_text())
+            return SourceState(cached["table"], cached["fetched_at"], None, cached["table"] is not None)
+        except (OSError, ValueError, KeyError):
+            return SourceState()
+
+    def _save_cached(self, source: PriceSource, state: SourceState):
+        path = self._cache_path(source)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"fetched_at": state.fetched_at, "table": state.table}))
+        os.replace(tmp, path)
+
+    # === 刷新 ===
+    def _due(self, source: PriceSource, now: float) -> bool:
+        state = self.states[source.name]
+        if not state.fetched_at or (state.error is not None and state.table is None):
+            return True
+        return now - state.fetched_at >= source.ttl
+
+    def _fetch(self, source: PriceSource) -> Optional[PriceTable]:
+        with metrics.timer("fetch", source=source.name):
+            return source.fetch(self.http)
+
+    def _apply(self, source: PriceSource, table: Optional[PriceTable], now: float):
+        state = self.states[source.name]
+        state.table, state.fetched_at, state.error, state.enabled = table, now, None, table is not None
+        self._save_cached(source, state)
+
+    def _fail(self, source: PriceSource, error: str):
+        """失败只记原因，沿用上次成功的结果；fetched_at 不变，下一轮仍到期重试"""
+        self.states[source.name].error = error
+        metrics.count("source_errors", source=source.name)
+
+    def _refresh_local(self, now: float):
+        for source in self.sources:
+            if source.local and self._due(source, now):
+                try:
+                    self._apply(source, self._fetch(source), now)
+                except Exception as e:
+                    self._fail(source, str(e) or type(e).__name__)
+
+    def begin_refresh(self) -> Pending:
+        """本地来源就地刷新；到期的网络来源提交到线程池，立即返回 (调用方同时去做别的抓取)"""
+        now = time.time()
+        self._refresh_local(now)
+        pending: Pending = {}
+        for source in self.sources:
+            if source.local or not self._due(source, now):
+                continue
+            future = self._inflight.get(source.name)
+            if future is None or future.done():  # 上次超时的请求还没回来就不重复提交
+                future = self._inflight[source.name] = self._executor.submit(self._fetch, source)
+            pending[source.name] = (future, time.monotonic() + source.timeout)
+        return pending
+
+    def collect(self, pending: Pending) -> bool:
+        """等待各来源到各自的截止时间为止，合并结果；返回参考价表是否变化"""
+        by_name = {s.name: s for s in self.sources}
+        for name, (future, deadline) in pending.items():
+            source = by_name[name]
+            try:
+                table = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                self._fail(source, f"超时 ({source.timeout:g}s)")
+            except Exception as e:
+                self._fail(source, str(e) or type(e).__name__)
+            else:
+                self._apply(source, table, time.time())
+        return self._merge()
+
+    def refresh(self) -> bool:
+        return self.collect(self.begin_refresh())
+
+    def _merge(self) -> bool:
+        table: PriceTable = {}
+        for source in self.sources:
+            state = self.states[source.name]
+            if state.table:
+                table.update(state.table)
+        if table != self._table:
+            self._table = table
+            self.version += 1
+            return True
+        return False
+
+    def table(self) -> PriceTable:
+        """合并后的参考价表 (只读，内容变化时换新对象)"""
+        return self._table
+
+    def errors(self) -> Dict[str, str]:
+        return {name: state.error for name, state in self.states.items() if state.error}
+
+    def close(self):
+        """停止线程池并关闭 Session (常驻进程退出 / cron 单次运行结束时调用)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
+
+
+# === 命令行 ===
+
+def show(book: ReferenceBook):
+    now = time.time()
+    print(f"👑 曹皇参考价来源 (合并后 {len(book.table())} 个条目)")
+    print("-" * 72)
+    print(f"{'来源':<10} {'状态':<8} {'条目':>6} {'TTL':>8} {'超时':>6}  {'更新于':<12} 错误")
+    for source in book.sources:
+        state = book.states[source.name]
+        status = "未启用" if not state.enabled else "失败" if state.table is None and state.error else "正常"
+        age = f"{(now - state.fetched_at) / 60:.0f} 分钟前" if state.fetched_at else "-"
+        ttl = "∞" if math.isinf(source.ttl) else f"{source.ttl:g}s"
+        timeout = "-" if source.local else f"{source.timeout:g}s"
+        print(f"{source.name:<10} {status:<8} {len(state.table or {}):>6} {ttl:>8} {timeout:>6}  "
+              f"{age:<12} {state.error or ''}")
+
+
+class _SlowSource(PriceSource):
+    """bench 用：固定耗时的假来源"""
+
+    def __init__(self, name: str, delay: float):
+        self.name = name
+        self.delay = delay
+        self.timeout = delay + 1
+
+    def fetch(self, http) -> PriceTable:
+        time.sleep(self.delay)
+        return {f"{self.name}-model": {"prompt": 1.0, "completion": 2.0}}
+
+
+def bench(delays=(0.2, 0.5, 0.8, 1.0)):
+    sources = [_SlowSource(f"slow-{i}", d) for i, d in enumerate(delays)]
+    start = time.perf_counter()
+    for source in sources:
+        source.fetch(None)
+    serial = time.perf_counter() - start
+
+    book = ReferenceBook(sources, cache_dir=None)
+    start = time.perf_counter()
+    book.refresh()
+    concurrent = time.perf_counter() - start
+    book.close()
+
+    print(f"{len(sources)} 个来源 (各 {', '.join(f'{d:g}s' for d in delays)})：")
+    print(f"  串行抓取   {serial:.2f}s")
+    print(f"  并发刷新   {concurrent:.2f}s  (最慢来源 {max(delays):g}s，合并 {len(book.table())} 个条目)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "bench":
+        bench()
+    else:
+        from openrouter_arbitrage import DIRECT_PRICING
+        book = ReferenceBook(default_sources(DIRECT_PRICING))
+        book.refresh()
+        show(book)
+        book.close()
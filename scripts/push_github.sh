@@ -4,8 +4,8 @@
 
 cd "$(dirname "$0")/.."
 
-# 加载 GitHub Token 到 URL
-GITHUB_TOKEN=$(security find-generic-password -s github-token -w 2>/dev/null)
+# 加载 GitHub Token 到 URL (环境变量 / .env / 加密文件 / Keychain，见 key_manager.py)
+GITHUB_TOKEN=$(python3 scripts/key_manager.py get github 2>/dev/null)
 if [ -z "$GITHUB_TOKEN" ]; then
     echo "❌ GitHub Token 未配置"
     exit 1
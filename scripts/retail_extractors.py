@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 零售商商品提取器 👑
+正则在模块加载时编译一次；单遍扫描页面切出商品块，再在块内提取价格/标题/库存
+
+相比旧的全页多次正则：
+- 用字面量锚点 (str.find) 切块和定位字段，正则只在锚点后的小窗口内匹配
+- 不再用 DOTALL 的 .*? 跨整页匹配，单个正则最多扫描一个窗口
+- 价格与标题在同一商品块内配对，不会像 Best Buy 旧逻辑那样两列表 zip 错位
+- 只要前 N 个商品时读到第 N 块即停，不再扫完整页
+
+作者: 曹皇 👑
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Pattern, Sequence, Tuple
+
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+@dataclass
+class Product:
+    title: str
+    price: float
+    in_stock: bool
+
+
+class FieldPattern:
+    """字段定位：先 str.find 字面量锚点，再在锚点后 window 字符内跑预编译正则"""
+
+    def __init__(self, anchor: str, pattern: str, window: int = 400):
+        self.anchor = anchor
+        self.regex: Pattern = re.compile(pattern, re.DOTALL)
+        self.window = window
+
+    def search(self, block: str):
+        pos = block.find(self.anchor)
+        if pos < 0:
+            return None
+        start = pos + len(self.anchor)
+        return self.regex.match(block, start, start + self.window)
+
+
+class RetailerExtractor:
+    """按 block_marker 切块，块内依次匹配价格、标题、缺货标记"""
+
+    def __init__(self, name: str, block_marker: str, price: FieldPattern, title: FieldPattern,
+                 out_of_stock: Tuple[str, ...], max_block: int = 20_000):
+        self.name = name
+        self.block_marker = block_marker
+        self.price = price
+        self.title = title
+        self.out_of_stock = tuple(m.lower() for m in out_of_stock)
+        self.max_block = max_block  # 单个商品块最大长度，防止最后一块吞下整页尾部
+
+    def iter_blocks(self, html: str) -> Iterator[str]:
+        """单遍切块：相邻两个块标记之间即一个商品 (惰性产出，提前 break 不会扫完整页)"""
+        start = html.find(self.block_marker)
+        while start >= 0:
+            nxt = html.find(self.block_marker, start + len(self.block_marker))
+            end = nxt if nxt >= 0 else len(html)
+            yield html[start:min(end, start + self.max_block)]
+            start = nxt
+
+    def parse_price(self, match) -> float:
+        return float(match.group(1).replace(',', ''))
+
+    def parse_block(self, block: str) -> Optional[Product]:
+        price_match = self.price.search(block)
+        if not price_match:
+            return None
+        title_match = self.title.search(block)
+        if not title_match:
+            return None
+        try:
+            price = self.parse_price(price_match)
+        except ValueError:
+            return None
+        title = TAG_RE.sub('', title_match.group(1)).strip()
+        lower = block.lower()
+        in_stock = not any(marker in lower for marker in self.out_of_stock)
+        return Product(title=title, price=price, in_stock=in_stock)
+
+    def extract(self, html: str, limit: Optional[int] = None) -> List[Product]:
+        """提取页面内商品 (limit 为前 N 个商品块，与旧逻辑 "只取前5个结果" 对应)"""
+        products = []
+        for i, block in enumerate(self.iter_blocks(html)):
+            if limit is not None and i >= limit:
+                break
+            product = self.parse_block(block)
+            if product:
+                products.append(product)
+        return products
+
+
+class NeweggExtractor(RetailerExtractor):
+    def parse_price(self, match) -> float:
+        return float(f"{match.group(1).replace(',', '')}.{match.group(2)}")
+
+
+EXTRACTORS = {
+    "newegg": NeweggExtractor(
+        name="Newegg",
+        block_marker='<div class="item-container"',
+        # <strong>1799</strong><sup>99</sup> 或 $<strong>1,799</strong><sup>.99</sup>
+        price=FieldPattern('<li class="price-current"',
+                           r'[^>]*>.{0,200}?<strong>([\d,]+)</strong>\s*<sup>\.?(\d+)</sup>'),
+        title=FieldPattern('class="item-title"', r'[^>]*>(.*?)</a>'),
+        out_of_stock=("out of stock", "sold out"),
+    ),
+    "bestbuy": RetailerExtractor(
+        name="Best Buy",
+        block_marker='<li class="sku-item"',
+        price=FieldPattern('class="sr-price"', r'[^>]*>.{0,300}?\$([\d,]+\.\d{2})'),
+        title=FieldPattern('class="sku-title"', r'[^>]*>.{0,200}?<a[^>]*>(.*?)</a>'),
+        out_of_stock=(">sold out<",),
+    ),
+    "amazon": RetailerExtractor(
+        name="Amazon",
+        block_marker='data-component-type="s-search-result"',
+        price=FieldPattern('<span class="a-offscreen">', r'\$([\d,]+\.\d{2})</span>', window=40),
+        title=FieldPattern('<h2', r'[^>]*>.{0,300}?<span[^>]*>(.*?)</span>'),
+        out_of_stock=("currently unavailable",),
+    ),
+}
+
+
+def extract_products(retailer: str, html: str, keywords: Sequence[str], limit: int = 5) -> List[dict]:
+    """提取并按型号关键词过滤，返回 monitor_gpu_prices 使用的商品字典"""
+    extractor = EXTRACTORS[retailer]
+    keywords = [kw.lower() for kw in keywords]
+    results = []
+    for product in extractor.extract(html, limit=limit):
+        title = product.title.lower()
+        if any(kw in title for kw in keywords):
+            results.append({
+                "retailer": extractor.name,
+                "product_name": product.title[:100],
+                "price": product.price,
+                "in_stock": product.in_stock,
+            })
+    return results
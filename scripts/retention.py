@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 数据保留 / 降采样 / 空间回收 👑
+按层级保留：原始行 RETENTION_DAYS["raw"] 天，小时汇总 ["hourly"] 天，天汇总 ["daily"] (None = 永久)
+
+- 降采样：arbitrage.db 的原始行在入库时已计入 price_rollups_* (rollups.py)，过期后直接删除；
+  gpu_prices.db 没有实时汇总，过期的 price_history 行在删除的同一事务里先并入 price_history_hourly/daily
+- 锚点：每个模型 / 商品保留过期前的最后一行，delta 模式的当前价、时点还原和 GPU 基准价都依赖它
+- 分批删除：每批最多扫描 BATCH_ROWS 行、一个写事务，批间让出写锁，扫描事务最多等一批
+- 空间回收：auto_vacuum = INCREMENTAL + 分步 incremental_vacuum；旧库首次切换需要一次整库 VACUUM
+- 每张表记录删除行数、吞吐量和每批持锁时间
+
+用法:
+  python scripts/retention.py               # 各表过期行数 / 数据库大小 / 空闲页
+  python scripts/retention.py run           # 执行保留策略 (daemon.py 每天 04:30 也会跑)
+  python scripts/retention.py run --dry-run # 只统计会删除多少行
+  python scripts/retention.py bench [天数]  # 合成数据库上测吞吐量、持锁时间与并发扫描的提交延迟
+
+作者: 曹皇 👑
+"""
+
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from storage import get_storage
+
+# === 配置区 ===
+RETENTION_DAYS: Dict[str, Optional[int]] = {"raw": 7, "hourly": 90, "daily": None}
+BATCH_ROWS = 500            # 每个删除事务最多扫描的行数
+BATCH_PAUSE = 0.02          # 批间暂停 (秒)，让其他进程的写事务拿到锁
+VACUUM_STEP_PAGES = 256     # 每个 incremental_vacuum 事务回收的页数 (4KB 页 = 1MB)
+
+GPU_DOWNSAMPLE = '''
+    INSERT INTO {table} (bucket, gpu_model, retailer, samples, price_min, price_max, price_sum,
+                         price_first, price_last, in_stock_count)
+    SELECT bucket, gpu_model, retailer, COUNT(*), MIN(price), MAX(price), SUM(price), MAX(pf), MAX(pl), SUM(stock)
+    FROM (
+        SELECT replace(substr(timestamp, 1, {length}), ' ', 'T') AS bucket, gpu_model, retailer, price,
+               COALESCE(in_stock, 0) AS stock,
+               FIRST_VALUE(price) OVER w AS pf, LAST_VALUE(price) OVER w AS pl
+        FROM price_history
+        WHERE {where} AND price IS NOT NULL
+        WINDOW w AS (PARTITION BY substr(timestamp, 1, {length}), gpu_model, retailer ORDER BY id
+                     ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+    ) WHERE true
+    GROUP BY bucket, gpu_model, retailer
+    ON CONFLICT (bucket, gpu_model, retailer) DO UPDATE SET
+        samples = samples + excluded.samples,
+        price_min = MIN(COALESCE(price_min, excluded.price_min), excluded.price_min),
+        price_max = MAX(COALESCE(price_max, excluded.price_max), excluded.price_max),
+        price_sum = price_sum + excluded.price_sum,
+        price_first = COALESCE(price_first, excluded.price_first),
+        price_last = excluded.price_last,
+        in_stock_count = in_stock_count + excluded.in_stock_count
+'''
+
+
+def _downsample_gpu_history(conn, where: str, params: tuple):
+    """过期 price_history 行并入小时/天汇总 (按 id 升序分批，先到的批次是更早的价格)"""
+    for table, length in (("price_history_hourly", 13), ("price_history_daily", 10)):
+        conn.execute(GPU_DOWNSAMPLE.format(table=table, length=length, where=where), params)
+
+
+@dataclass
+class Policy:
+    schema: str
+    table: str
+    tier: str                                   # raw / hourly / daily
+    key: Tuple[str, ...] = ("id",)              # rowid 表按 id 分批；汇总表按主键分批
+    anchor: Tuple[str, ...] = ()                # 每组保留过期前最后一行
+    downsample: Optional[Callable] = None       # downsample(conn, where, params)，删除前在同一事务执行
+    utc: bool = False                           # 时间列为 CURRENT_TIMESTAMP (UTC, "YYYY-MM-DD HH:MM:SS")
+
+    def cutoff(self, now: datetime) -> Optional[str]:
+        """早于该值的行过期；该层级永久保留时返回 None"""
+        days = RETENTION_DAYS[self.tier]
+        if days is None:
+            return None
+        at = now - timedelta(days=days)
+        if self.utc:
+            at = at.astimezone(timezone.utc).replace(tzinfo=None)
+        if self.tier == "raw":
+            return at.strftime("%Y-%m-%d %H:%M:%S") if self.utc else at.isoformat()
+        return at.isoformat()[:13 if self.tier == "hourly" else 10]
+
+
+POLICIES = [
+    Policy("arbitrage", "price_snapshots", "raw", anchor=("source", "model_id")),
+    Policy("arbitrage", "arbitrage_opportunities", "raw"),
+    Policy("arbitrage", "scan_heartbeats", "raw"),
+    Policy("arbitrage", "price_rollups_hourly", "hourly", key=("bucket", "model_id")),
+    Policy("arbitrage", "price_rollups_daily", "daily", key=("bucket", "model_id")),
+    Policy("gpu_prices", "price_history", "raw", anchor=("gpu_model", "retailer", "product_name"),
+           downsample=_downsample_gpu_history, utc=True),
+    Policy("gpu_prices", "price_history_hourly", "hourly", key=("bucket", "gpu_model", "retailer"), utc=True),
+    Policy("gpu_prices", "price_history_daily", "daily", key=("bucket", "gpu_model", "retailer"), utc=True),
+]
+
+
+@dataclass
+class PurgeResult:
+    schema: str
+    table: str
+    cutoff: Optional[str]
+    deleted: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+    lock_holds: List[float] = field(default_factory=list)  # 每批写事务内耗时 (秒)
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def max_hold_ms(self) -> float:
+        return max(self.lock_holds, default=0.0) * 1000
+
+    @property
+    def p50_hold_ms(self) -> float:
+        return statistics.median(self.lock_holds) * 1000 if self.lock_holds else 0.0
+
+
+def database_paths() -> Dict[str, Path]:
+    import gpu_price_monitor
+    import openrouter_arbitrage
+    return {"arbitrage": openrouter_arbitrage.DB_PATH, "gpu_prices": gpu_price_monitor.DB_PATH}
+
+
+# === 过期行 ===
+
+def _eligible(policy: Policy) -> Tuple[str, int]:
+    """rowid 表一批的过期条件 (参数: 起始 id, 结束 id, 截止时间 [, 截止时间])"""
+    t = policy.table
+    where = "id > ? AND id <= ? AND timestamp < ?"
+    if not policy.anchor:
+        return where, 3
+    match = " AND ".join(f"a.{c} IS {t}.{c}" for c in policy.anchor)
+    return where + f" AND id < (SELECT MAX(a.id) FROM {t} a WHERE {match} AND a.timestamp < ?)", 4
+
+
+def expired_boundary(store, policy: Policy, cutoff: str) -> Optional[int]:
+    """最后一条过期行的 id (行按时间顺序写入，id 单调)"""
+    return store.query_one(f"SELECT MAX(id) FROM {policy.table} WHERE timestamp < ?", (cutoff,))[0]
+
+
+def count_expired(store, policy: Policy, now: datetime) -> int:
+    cutoff = policy.cutoff(now)
+    if cutoff is None:
+        return 0
+    if policy.tier != "raw":
+        return store.query_one(f"SELECT COUNT(*) FROM {policy.table} WHERE bucket < ?", (cutoff,))[0]
+    boundary = expired_boundary(store, policy, cutoff)
+    if boundary is None:
+        return 0
+    where, nparams = _eligible(policy)
+    params = (0, boundary, cutoff, cutoff)[:nparams]
+    return store.query_one(f"SELECT COUNT(*) FROM {policy.table} WHERE {where}", params)[0]
+
+
+def expired_counts(store, schema: str, now: Optional[datetime] = None) -> Dict[str, int]:
+    """{表名: 过期行数}"""
+    now = now or datetime.now()
+    return {p.table: count_expired(store, p, now) for p in POLICIES if p.schema == schema}
+
+
+def _purge_rows(store, policy: Policy, cutoff: str, result: PurgeResult,
+                batch_rows: int, pause: float):
+    boundary = expired_boundary(store, policy, cutoff)
+    if boundary is None:
+        return
+    t = policy.table
+    where, nparams = _eligible(policy)
+    cursor = 0
+    while cursor < boundary:
+        def batch(conn, lo=cursor):
+            start = time.perf_counter()
+            hi = conn.execute(f'''
+                SELECT MAX(id) FROM (SELECT id FROM {t} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?)
+            ''', (lo, boundary, batch_rows)).fetchone()[0]
+            if hi is None:
+                return boundary, 0, time.perf_counter() - start
+            params = (lo, hi, cutoff, cutoff)[:nparams]
+            if policy.downsample is not None:
+                policy.downsample(conn, where, params)
+            deleted = conn.execute(f"DELETE FROM {t} WHERE {where}", params).rowcount
+            return hi, deleted, time.perf_counter() - start
+
+        cursor, deleted, hold = store.call(batch)
+        result.deleted += deleted
+        result.batches += 1
+        result.lock_holds.append(hold)
+        time.sleep(pause)
+
+
+def _purge_buckets(store, policy: Policy, cutoff: str, result: PurgeResult,
+                   batch_rows: int, pause: float):
+    keys = ", ".join(policy.key)
+    sql = f'''
+        DELETE FROM {policy.table} WHERE ({keys}) IN (
+            SELECT {keys} FROM {policy.table} WHERE bucket < ? ORDER BY {keys} LIMIT ?
+        )
+    '''
+    while True:
+        def batch(conn):
+            start = time.perf_counter()
+            deleted = conn.execute(sql, (cutoff, batch_rows)).rowcount
+            return deleted, time.perf_counter() - start
+
+        deleted, hold = store.call(batch)
+        result.deleted += deleted
+        result.batches += 1
+        result.lock_holds.append(hold)
+        if deleted < batch_rows:
+            return
+        time.sleep(pause)
+
+
+def purge(store, policy: Policy, now: datetime, batch_rows: int = BATCH_ROWS,
+          pause: float = BATCH_PAUSE) -> PurgeResult:
+    """按策略删除一张表的过期行 (需要时先降采样)"""
+    cutoff = policy.cutoff(now)
+    result = PurgeResult(policy.schema, policy.table, cutoff)
+    if cutoff is None:
+        return result
+    start = time.perf_counter()
+    if policy.tier == "raw":
+        _purge_rows(store, policy, cutoff, result, batch_rows, pause)
+    else:
+        _purge_buckets(store, policy, cutoff, result, batch_rows, pause)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+# === 空间回收 ===
+
+def db_pages(store) -> Tuple[int, int, int]:
+    """(总页数, 空闲页数, 页大小)"""
+    return (store.query_one("PRAGMA page_count")[0], store.query_one("PRAGMA freelist_count")[0],
+            store.query_one("PRAGMA page_size")[0])
+
+
+def reclaim_space(store, step_pages: int = VACUUM_STEP_PAGES, pause: float = BATCH_PAUSE) -> Dict:
+    """
+    分步归还空闲页；返回 {"converted", "pages", "lock_holds", "elapsed"}
+
+    auto_vacuum 不是 INCREMENTAL 的旧库先整库 VACUUM 一次 (期间独占写锁，耗时与库大小成正比)
+    """
+    start = time.perf_counter()
+    stats = {"converted": False, "pages": 0, "lock_holds": [], "elapsed": 0.0}
+    if store.query_one("PRAGMA auto_vacuum")[0] != 2:
+        def convert(conn):
+            t = time.perf_counter()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return time.perf_counter() - t
+        stats["lock_holds"].append(store.call_outside_transaction(convert))
+        stats["converted"] = True
+
+    while True:
+        def step(conn):
+            t = time.perf_counter()
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # incremental_vacuum 每回收一页 step 一次，语句要 step 到结束才回收满 N 页；
+            # execute() 对无结果列的语句只 step 一次就 reset (fetchall 也无济于事)，executescript 会跑完。
+            # executescript 会先提交当前事务，所以这一步不在 store.call 的事务里执行 (语句自身是一个隐式事务)
+            conn.executescript(f"PRAGMA incremental_vacuum({int(step_pages)});")
+            freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return freed, time.perf_counter() - t
+
+        freed, hold = store.call_outside_transaction(step)
+        if not freed:
+            break
+        stats["pages"] += freed
+        stats["lock_holds"].append(hold)
+        time.sleep(pause)
+    # WAL 检查点后文件才真正变小
+    store.call_outside_transaction(lambda conn: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall())
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+# === 入口 ===
+
+def run_retention(paths: Optional[Dict[str, Path]] = None, now: Optional[datetime] = None,
+                  dry_run: bool = False, batch_rows: int = BATCH_ROWS, pause: float = BATCH_PAUSE,
+                  verbose: bool = True) -> List[PurgeResult]:
+    paths = paths or database_paths()
+    now = now or datetime.now()
+    results = []
+    if verbose:
+        print(f"👑 曹皇数据保留 - 原始 {RETENTION_DAYS['raw']} 天 / 小时汇总 {RETENTION_DAYS['hourly']} 天 / "
+              f"天汇总 {RETENTION_DAYS['daily'] or '永久'}{' (dry-run)' if dry_run else ''}")
+        print("-" * 96)
+        print(f"{'数据库':<11} {'表':<26} {'截止':<20} {'删除行':>9} {'批数':>5} {'行/秒':>10} "
+              f"{'持锁 p50 ms':>11} {'持锁 max ms':>11}")
+    for schema, db_path in paths.items():
+        store = get_storage(db_path, schema=schema)
+        for policy in [p for p in POLICIES if p.schema == schema]:
+            if dry_run:
+                result = PurgeResult(schema, policy.table, policy.cutoff(now),
+                                     deleted=count_expired(store, policy, now))
+            else:
+                result = purge(store, policy, now, batch_rows, pause)
+            results.append(result)
+            if verbose:
+                print(f"{schema:<11} {policy.table:<26} {result.cutoff or '永久保留':<20} {result.deleted:>9,} "
+                      f"{result.batches:>5} {result.rows_per_s:>10,.0f} {result.p50_hold_ms:>11.2f} "
+                      f"{result.max_hold_ms:>11.2f}")
+        if dry_run:
+            continue
+        pages, _, page_size = db_pages(store)
+        space = reclaim_space(store, pause=pause)
+        if verbose:
+            after = db_pages(store)[0]
+            holds = space["lock_holds"]
+            print(f"{schema:<11} {'(incremental_vacuum)':<26} {'首次切换 INCREMENTAL' if space['converted'] else '':<20} "
+                  f"{(pages - after) * page_size / 1024:>7,.0f}KB {len(holds):>5} {'':>10} "
+                  f"{(statistics.median(holds) if holds else 0) * 1000:>11.2f} {max(holds, default=0) * 1000:>11.2f}")
+    if verbose:
+        print("-" * 96)
+    return results
+
+
+def status(paths: Optional[Dict[str, Path]] = None):
+    paths = paths or database_paths()
+    now = datetime.now()
+    print("👑 曹皇数据保留状态")
+    print("-" * 72)
+    for schema, db_path in paths.items():
+        store = get_storage(db_path, schema=schema)
+        pages, free, page_size = db_pages(store)
+        mode = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}[store.query_one("PRAGMA auto_vacuum")[0]]
+        print(f"{schema}: {pages * page_size / 1024:,.0f}KB，空闲页 {free}，auto_vacuum={mode}  {db_path}")
+        expired = expired_counts(store, schema, now)
+        for policy in [p for p in POLICIES if p.schema == schema]:
+            total = store.query_one(f"SELECT COUNT(*) FROM {policy.table}")[0]
+            print(f"  {policy.table:<26} {policy.tier:<7} {total:>9,} 行，过期 {expired[policy.table]:>9,} 行")
+    print("-" * 72)
+
+
+# === 基准 ===
+
+def _build_bench_db(db_path: Path, days: int, models: int, scan_minutes: int = 5):
+    """合成 full 模式的 arbitrage.db：每 scan_minutes 分钟一轮，每轮 models 行快照 + 10% 信号 + 心跳"""
+    # 新库直接用 INCREMENTAL (与已切换过的生产库一致)，基准只测稳态的分步回收
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    store = get_storage(db_path, schema="arbitrage")
+    start = datetime.now() - timedelta(days=days)
+    scans = days * 24 * 60 // scan_minutes
+    model_ids = [f"bench/model-{i}" for i in range(models)]
+    for s in range(scans):
+        ts = (start + timedelta(minutes=s * scan_minutes)).isoformat()
+        with store.transaction(bulk=True):
+            store.insert_rows("price_snapshots",
+                              ("model_id", "provider", "prompt_price", "completion_price", "timestamp"),
+                              ((m, "openrouter", 1.0 + (s + i) % 7, 2.0, ts) for i, m in enumerate(model_ids)))
+            store.insert_rows("arbitrage_opportunities",
+                              ("model_id", "or_prompt_price", "direct_prompt_price", "prompt_diff_pct", "timestamp"),
+                              ((m, 1.0, 1.5, 0.33, ts) for m in model_ids[::10]))
+            store.execute('''
+                INSERT INTO scan_heartbeats (timestamp, mode, model_count, written_count) VALUES (?, 'full', ?, ?)
+            ''', (ts, models, models))
+    return store
+
+
+def bench(days: int = 10, models: int = 340):
+    """合成库上跑一次保留策略，同时用后台线程模拟扫描提交，对比空闲/清理期间的提交延迟"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "arbitrage.db"
+        print(f"生成合成库: {days} 天 x {models} 模型 (每 5 分钟一轮)...")
+        store = _build_bench_db(db_path, days, models)
+        rows = store.query_one("SELECT COUNT(*) FROM price_snapshots")[0]
+        print(f"price_snapshots {rows:,} 行，{db_pages(store)[0] * 4 / 1024:,.1f}MB")
+
+        latencies: Dict[str, List[float]] = {"idle": [], "retention": []}
+        phase = {"name": "idle"}
+        stop = threading.Event()
+
+        def scanner():
+            # 每 100ms 一个 340 行的扫描事务 (写入的是当前时间，不会被清理)
+            while not stop.is_set():
+                t = time.perf_counter()
+                store.insert_rows("scan_heartbeats", ("timestamp", "mode", "model_count", "written_count"),
+                                  [(datetime.now().isoformat(), "full", models, models)] * 340)
+                latencies[phase["name"]].append(time.perf_counter() - t)
+                time.sleep(0.1)
+
+        thread = threading.Thread(target=scanner, daemon=True)
+        thread.start()
+        time.sleep(2)
+        phase["name"] = "retention"
+        run_retention({"arbitrage": db_path})
+        stop.set()
+        thread.join()
+
+        print(f"{'并发扫描提交延迟':<16} {'次数':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name, values in latencies.items():
+            values = sorted(values)
+            if values:
+                p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+                print(f"{name:<16} {len(values):>6} {statistics.median(values) * 1000:>8.1f} "
+                      f"{p99 * 1000:>8.1f} {values[-1] * 1000:>8.1f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "status"
+    if command == "run":
+        run_retention(dry_run="--dry-run" in args)
+    elif command == "bench":
+        bench(*(int(a) for a in args[1:3]))
+    else:
+        status()
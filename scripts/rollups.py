@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 价格/套利汇总表 👑
+每个模型每小时、每天一行：观测次数、min / max / 均值 / 首末价格、套利信号次数与最大价差
+
+- 在写快照的同一个事务里 UPSERT (汇总表和原始表不会一个提交了另一个没提交)
+- 每个桶由落在其中的第一轮扫描铺满全部模型 (当前价格即桶的首价)，之后只写价格变化 / 有信号的模型：
+  价格没变时 min / max / 末价都不变，不必每轮把几百个模型 UPSERT 一遍 (304 轮通常一行不写)。
+  代价是行内 samples / *_sum 是写入的观测数 (铺桶 + 变价轮) 而不是扫描次数，均值是按观测而非按时间加权；
+  每小时的扫描模型数改从 scan_heartbeats 的 model_count 汇总
+- 报告只读汇总表的一个桶 (最多 模型数 行)，耗时与历史长度无关
+- 桶 key 直接取 ISO 时间戳前缀：小时 "2026-10-17T20"，天 "2026-10-17" (字符串序 = 时间序)
+
+作者: 曹皇 👑
+"""
+
+from datetime import datetime, timedelta
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from price_batch import PriceBatch
+
+HOURLY = "price_rollups_hourly"
+DAILY = "price_rollups_daily"
+# 表名 -> ISO 时间戳前缀长度
+BUCKETS = {HOURLY: 13, DAILY: 10}
+
+# best_diff / worst_diff 可能为 NULL (该桶还没有信号)：MAX(COALESCE(a, b), COALESCE(b, a)) 忽略 NULL 一侧
+UPSERT = '''
+    INSERT INTO {table} (
+        bucket, model_id, samples,
+        prompt_min, prompt_max, prompt_sum, prompt_first, prompt_last,
+        completion_min, completion_max, completion_sum, completion_first, completion_last,
+        opp_count, opp_abs_diff_sum, best_diff, worst_diff
+    ) VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, model_id) DO UPDATE SET
+        samples = samples + 1,
+        prompt_min = MIN(COALESCE(prompt_min, excluded.prompt_min), excluded.prompt_min),
+        prompt_max = MAX(COALESCE(prompt_max, excluded.prompt_max), excluded.prompt_max),
+        prompt_sum = prompt_sum + excluded.prompt_sum,
+        prompt_first = COALESCE(prompt_first, excluded.prompt_first),
+        prompt_last = excluded.prompt_last,
+        completion_min = MIN(COALESCE(completion_min, excluded.completion_min), excluded.completion_min),
+        completion_max = MAX(COALESCE(completion_max, excluded.completion_max), excluded.completion_max),
+        completion_sum = completion_sum + excluded.completion_sum,
+        completion_first = COALESCE(completion_first, excluded.completion_first),
+        completion_last = excluded.completion_last,
+        opp_count = opp_count + excluded.opp_count,
+        opp_abs_diff_sum = opp_abs_diff_sum + excluded.opp_abs_diff_sum,
+        best_diff = MAX(COALESCE(best_diff, excluded.best_diff), COALESCE(excluded.best_diff, best_diff)),
+        worst_diff = MIN(COALESCE(worst_diff, excluded.worst_diff), COALESCE(excluded.worst_diff, worst_diff))
+'''
+
+
+def bucket_of(timestamp: datetime, table: str) -> str:
+    return timestamp.isoformat()[:BUCKETS[table]]
+
+
+def _signal_stats(opportunities: Iterable[Dict]) -> Dict[str, Tuple[int, float, float, float]]:
+    """{model_id: (信号次数, |prompt 价差| 之和, 最大价差, 最小价差)}"""
+    stats: Dict[str, Tuple[int, float, float, float]] = {}
+    for opp in opportunities:
+        diff = opp["prompt_diff_pct"]
+        prev = stats.get(opp["model_id"])
+        if prev is None:
+            stats[opp["model_id"]] = (1, abs(diff), diff, diff)
+        else:
+            stats[opp["model_id"]] = (prev[0] + 1, prev[1] + abs(diff), max(prev[2], diff), min(prev[3], diff))
+    return stats
+
+
+def rollup_rows(batch: PriceBatch, opportunities: Iterable[Dict],
+                models: Optional[Collection[str]] = None) -> List[tuple]:
+    """一轮扫描 (或其中一批) 对应的 UPSERT 参数 (不含 bucket)；给了 models 时只要其中的模型"""
+    signals = _signal_stats(opportunities)
+    no_signal = (0, 0.0, None, None)
+    return [
+        (model_id, prompt, prompt, prompt, prompt, prompt,
+         completion, completion, completion, completion, completion,
+         *signals.get(model_id, no_signal))
+        for model_id, prompt, completion in batch.price_pairs()
+        if models is None or model_id in models or model_id in signals
+    ]
+
+
+def update_rollups(store, batch: PriceBatch, opportunities: Iterable[Dict]):
+    """把一轮扫描的全部模型计入小时/天汇总 (在调用方的事务内排队)"""
+    rows = rollup_rows(batch, opportunities)
+    if not rows:
+        return
+    for table in BUCKETS:
+        bucket = bucket_of(batch.timestamp, table)
+        store.executemany(UPSERT.format(table=table), [(bucket, *row) for row in rows])
+
+
+class RollupWriter:
+    """
+    汇总表的增量维护：桶内第一轮扫描写全部模型，之后只写 changed (价格变化) 与有信号的模型
+
+    "第一轮" 按扫描时间戳认定 (流式扫描的各批共用一个时间戳，都算铺桶)；
+    进程重启后先查库里该桶是否已有行。写事务回滚后调用 reset()，下一轮重新铺满当前桶
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._buckets: Dict[str, Tuple[str, Optional[datetime]]] = {}  # {表名: (当前桶, 铺桶扫描的时间戳)}
+        self._reseed = set()
+
+    def reset(self):
+        self._buckets.clear()
+        self._reseed = set(BUCKETS)
+
+    def has_bucket(self, table: str, bucket: str) -> bool:
+        return self.store.query_one(f"SELECT 1 FROM {table} WHERE bucket = ? LIMIT 1", (bucket,)) is not None
+
+    def _seeding(self, table: str, timestamp: datetime) -> bool:
+        bucket = bucket_of(timestamp, table)
+        state = self._buckets.get(table)
+        if state is None or state[0] != bucket:
+            seeded = table not in self._reseed and self.has_bucket(table, bucket)
+            self._reseed.discard(table)
+            state = self._buckets[table] = (bucket, None if seeded else timestamp)
+        return state[1] == timestamp
+
+    def update(self, batch: PriceBatch, opportunities: Iterable[Dict],
+               changed: Optional[Collection[str]] = None):
+        """changed 为 None 表示不知道哪些变了 (full 模式)，全部写入"""
+        opportunities = list(opportunities)
+        for table in BUCKETS:
+            models = None if changed is None or self._seeding(table, batch.timestamp) else changed
+            rows = rollup_rows(batch, opportunities, models)
+            if rows:
+                bucket = bucket_of(batch.timestamp, table)
+                self.store.executemany(UPSERT.format(table=table), [(bucket, *row) for row in rows])
+
+
+def last_full_hour(now: Optional[datetime] = None) -> str:
+    """最近一个已结束小时的桶 (报告统计区间)"""
+    return bucket_of((now or datetime.now()) - timedelta(hours=1), HOURLY)
+
+
+def hour_summary(store, bucket: str) -> Tuple[int, int, float]:
+    """某小时的 (扫描模型数, 套利信号次数, 平均 |价差|)；扫描模型数取自该小时的心跳"""
+    next_bucket = bucket_of(datetime.fromisoformat(bucket + ":00") + timedelta(hours=1), HOURLY)
+    samples, = store.query_one('''
+        SELECT COALESCE(SUM(model_count), 0) FROM scan_heartbeats WHERE timestamp >= ? AND timestamp < ?
+    ''', (bucket, next_bucket))
+    signals, abs_diff_sum = store.query_one(f'''
+        SELECT COALESCE(SUM(opp_count), 0), COALESCE(SUM(opp_abs_diff_sum), 0)
+        FROM {HOURLY} WHERE bucket = ?
+    ''', (bucket,))
+    return samples, signals, abs_diff_sum / signals if signals else 0.0
+
+
+def top_signals(store, bucket: str, limit: int = 3) -> List[Tuple[str, float]]:
+    """某小时 |价差| 最大的模型 [(model_id, 带符号价差)]"""
+    return store.query(f'''
+        SELECT model_id,
+               CASE WHEN ABS(worst_diff) > ABS(best_diff) THEN worst_diff ELSE best_diff END AS diff
+        FROM {HOURLY} WHERE bucket = ? AND opp_count > 0
+        ORDER BY ABS(diff) DESC LIMIT ?
+    ''', (bucket, limit))
+
+
+def best_deals(store, since: datetime, limit: int = 5) -> List[Tuple[str, float]]:
+    """since 所在日起 OpenRouter 比直供便宜最多的模型 [(model_id, 价差)]"""
+    return store.query(f'''
+        SELECT model_id, MAX(best_diff) AS diff
+        FROM {DAILY} WHERE bucket >= ? AND best_diff > 0
+        GROUP BY model_id ORDER BY diff DESC LIMIT ?
+    ''', (bucket_of(since, DAILY), limit))
+
+
+def backfill(conn, table: str):
+    """
+    从已有的 price_snapshots / arbitrage_opportunities 回填汇总表 (迁移时执行一次)
+
+    历史上 delta 模式只写变化行，回填出的 samples 是写入行数而不是扫描次数，属近似值
+    """
+    length = BUCKETS[table]
+    conn.execute(f'''
+        INSERT INTO {table} (
+            bucket, model_id, samples,
+            prompt_min, prompt_max, prompt_sum, prompt_first, prompt_last,
+            completion_min, completion_max, completion_sum, completion_first, completion_last
+        )
+        SELECT bucket, model_id, COUNT(*), MIN(p), MAX(p), SUM(p), MAX(pf), MAX(pl),
+               MIN(c), MAX(c), SUM(c), MAX(cf), MAX(cl)
+        FROM (
+            SELECT substr(timestamp, 1, {length}) AS bucket, model_id,
+                   prompt_price AS p, completion_price AS c,
+                   FIRST_VALUE(prompt_price) OVER w AS pf, LAST_VALUE(prompt_price) OVER w AS pl,
+                   FIRST_VALUE(completion_price) OVER w AS cf, LAST_VALUE(completion_price) OVER w AS cl
+            FROM price_snapshots
+            WHERE source = 'openrouter' AND prompt_price IS NOT NULL
+            WINDOW w AS (PARTITION BY substr(timestamp, 1, {length}), model_id ORDER BY timestamp, id
+                         ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        )
+        GROUP BY bucket, model_id
+    ''')
+    conn.execute(f'''
+        INSERT INTO {table} (bucket, model_id, samples, opp_count, opp_abs_diff_sum, best_diff, worst_diff)
+        SELECT substr(timestamp, 1, {length}), model_id, 0,
+               COUNT(*), SUM(ABS(prompt_diff_pct)), MAX(prompt_diff_pct), MIN(prompt_diff_pct)
+        FROM arbitrage_opportunities WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, model_id) DO UPDATE SET
+            opp_count = excluded.opp_count,
+            opp_abs_diff_sum = excluded.opp_abs_diff_sum,
+            best_diff = excluded.best_diff,
+            worst_diff = excluded.worst_diff
+    ''')
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 扫描流式处理工具 👑
+把 /api/v1/models 响应体按块增量解码成模型记录的惰性生成器，再按批切分给下游阶段
+
+- 不再 response.json() 整体解析：缓冲区只保留 "当前块 + 一条未解析完的记录"
+- 只依赖标准库 (json.JSONDecoder.raw_decode)，不引入 ijson
+
+作者: 曹皇 👑
+"""
+
+import codecs
+import json
+import re
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str = "data") -> Iterator[dict]:
+    """
+    从字节块流中逐条产出顶层对象 key 对应数组里的元素
+
+    假定 key 数组位于顶层 (OpenRouter 的 {"data": [...]} 结构)；
+    响应在数组结束前中断时抛 ValueError
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf = ""
+    eof = False
+
+    def more():
+        nonlocal buf, eof
+        try:
+            buf += utf8.decode(next(chunks))
+        except StopIteration:
+            buf += utf8.decode(b"", final=True)
+            eof = True
+
+    # 定位 "key": [
+    opener = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    while True:
+        m = opener.search(buf)
+        if m:
+            buf = buf[m.end():]
+            break
+        if eof:
+            raise ValueError(f"响应中没有 {key!r} 数组")
+        buf = buf[-(len(key) + 64):]  # 保留尾部，防止 key 被切在两个块之间
+        more()
+
+    pos = 0
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == "]":
+            for _ in chunks:  # 读完响应体剩余部分 (上游按块计算内容哈希)
+                pass
+            return
+        if pos < len(buf):
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                pos = end
+                continue
+        if eof:
+            raise ValueError(f"{key!r} 数组在结束前被截断")
+        # 当前记录不完整：丢掉已消费的部分，再读一块
+        buf, pos = buf[pos:], 0
+        more()
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """把任意可迭代对象按 size 切成列表批次 (最后一批可能不足 size)"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+曹皇 - asyncio 周期任务调度器 👑
+一个进程里按各自节奏运行所有周期任务 (套利扫描 / 显卡监控 / 报告 / 内容生成 / 发布)
+
+- 无漂移：触发时刻对齐到墙钟网格 (offset + k * interval)，任务耗时不会累积成偏移
+- 抖动：每次触发额外随机延迟 0~jitter 秒，避免多个任务/多台机器同一秒打同一个 API
+- 防重叠：上一轮还没结束 (含超时后仍在跑的线程) 时跳过本轮并计数
+- 超时：协程任务超时取消；同步任务在线程里跑，超时后不再等待但仍占着 "运行中"，直到线程真正结束
+- 补跑策略 (睡眠/挂起醒来后错过了多个触发点)：
+    "once"  只补跑一次，然后回到网格 (默认)
+    "all"   逐个补跑，最多 max_catch_up 次
+    "skip"  不补跑，等下一个网格点
+- 睡眠按 MAX_SLEEP 分段并用墙钟重新计算 (挂起期间单调时钟不走，长 sleep 会睡过头)
+- 每次运行结束记录 job 耗时与结果计数，并导出埋点文件 (见 metrics.py)
+
+作者: 曹皇 👑
+"""
+
+import asyncio
+import inspect
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from log_writer import get_log_writer
+
+LOG_PATH = Path.home() / ".openclaw" / "workspace" / "logs" / "scheduler.log"
+MAX_SLEEP = 30.0  # 单次 sleep 上限 (秒)
+
+CATCH_UP_ONCE = "once"
+CATCH_UP_ALL = "all"
+CATCH_UP_SKIP = "skip"
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Any]            # 同步函数 (线程池里跑) 或 async 函数
+    interval: float                    # 周期 (秒)
+    offset: float = 0.0                # 网格偏移 (秒，相对本地时间零点，如每天 9:00 = 9 * 3600)
+    jitter: float = 0.0                # 触发后随机延迟上限 (秒)
+    timeout: Optional[float] = None    # 单次运行超时 (秒)
+    catch_up: str = CATCH_UP_ONCE
+    max_catch_up: int = 3
+    immediate: bool = False            # 启动时先运行一次，不等第一个网格点
+    enabled: bool = True
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "runs": 0, "failures": 0, "timeouts": 0, "overlaps": 0, "missed": 0})
+    _active: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.interval <= 0:
+            raise ValueError(f"{self.name}: interval 必须为正数")
+        if self.catch_up not in (CATCH_UP_ONCE, CATCH_UP_ALL, CATCH_UP_SKIP):
+            raise ValueError(f"{self.name}: 未知补跑策略 {self.catch_up}")
+
+    def next_tick(self, now: float) -> float:
+        """now 之后的下一个网格点 (墙钟时间戳，网格按本地时区对齐)"""
+        local_offset = time.localtime(now).tm_gmtoff
+        k = math.floor((now + local_offset - self.offset) / self.interval) + 1
+        return k * self.interval + self.offset - local_offset
+
+    @property
+    def running(self) -> bool:
+        return self._active is not None and not self._active.done()
+
+
+class Scheduler:
+    def __init__(self, jobs: List[Job], clock: Callable[[], float] = time.time,
+                 max_sleep: float = MAX_SLEEP, log_path: Optional[Path] = LOG_PATH,
+                 export_metrics: bool = True):
+        self.jobs = [job for job in jobs if job.enabled]
+        self.export_metrics = export_metrics
+        self.clock = clock
+        self.max_sleep = max_sleep
+        self.log_path = log_path
+        self._stopping: Optional[asyncio.Event] = None
+
+    def log(self, message: str, level: str = "INFO"):
+        if self.log_path is not None:
+            get_log_writer(self.log_path).write(message, level)
+        else:
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] [{level}] {message}")
+
+    # === 主循环 ===
+    async def run(self):
+        """运行直到 stop()；退出前等待仍在运行的任务结束"""
+        self._stopping = asyncio.Event()
+        self.log(f"调度器启动: {', '.join(f'{j.name}/{j.interval:g}s' for j in self.jobs)}")
+        await asyncio.gather(*(self._job_loop(job) for job in self.jobs))
+        active = [job._active for job in self.jobs if job.running]
+        if active:
+            self.log(f"等待 {len(active)} 个运行中的任务结束...")
+            await asyncio.gather(*active, return_exceptions=True)
+        self.log("调度器已停止")
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _sleep_until(self, target: float) -> bool:
+        """睡到墙钟 target；收到 stop 返回 False"""
+        while not self._stopping.is_set():
+            remaining = target - self.clock()
+            if remaining <= 0:
+                return True
+            try:
+                await asyncio.wait_for(self._stopping.wait(), min(remaining, self.max_sleep))
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def _job_loop(self, job: Job):
+        if job.immediate:
+            self._launch(job)
+        due = job.next_tick(self.clock())
+        while await self._sleep_until(due):
+            now = self.clock()
+            missed = int((now - due) // job.interval)  # 醒来时已整段错过的触发点数
+            if missed:
+                job.stats["missed"] += missed
+                self.log(f"{job.name}: 错过 {missed} 个触发点 (补跑策略 {job.catch_up})", "WARN")
+
+            if missed and job.catch_up == CATCH_UP_SKIP:
+                runs = 0
+            elif missed and job.catch_up == CATCH_UP_ALL:
+                runs = min(missed + 1, job.max_catch_up)
+            else:
+                runs = 1
+
+            for i in range(runs):
+                if i == 0 and job.jitter:
+                    if not await self._sleep_until(self.clock() + random.uniform(0, job.jitter)):
+                        return
+                execution = self._launch(job)
+                if runs > 1 and execution is not None:
+                    await asyncio.wait({execution})  # 补跑逐个串行
+            due = job.next_tick(self.clock())
+
+    # === 单次执行 ===
+    def _launch(self, job: Job) -> Optional[asyncio.Task]:
+        if job.running:
+            job.stats["overlaps"] += 1
+            self.log(f"{job.name}: 上一轮仍在运行，跳过本轮", "WARN")
+            return None
+        return asyncio.ensure_future(self._execute(job))
+
+    async def _execute(self, job: Job):
+        start = time.perf_counter()
+        if inspect.iscoroutinefunction(job.func):
+            job._active = asyncio.ensure_future(job.func())
+        else:
+            job._active = asyncio.get_running_loop().run_in_executor(None, job.func)
+        active = job._active
+
+        done, _ = await asyncio.wait({active}, timeout=job.timeout)
+        elapsed = time.perf_counter() - start
+        metrics.observe("job", elapsed, job=job.name)
+        try:
+            self._finish(job, active, done, elapsed)
+        finally:
+            if self.export_metrics:
+                try:
+                    await asyncio.to_thread(metrics.export)
+                except OSError as e:
+                    self.log(f"埋点导出失败: {e}", "WARN")
+
+    def _finish(self, job: Job, active: asyncio.Future, done: set, elapsed: float):
+        if not done:
+            job.stats["timeouts"] += 1
+            metrics.count("jobs", job=job.name, result="timeout")
+            if isinstance(active, asyncio.Task):
+                active.cancel()
+                self.log(f"{job.name}: 超时 ({job.timeout:g}s)，已取消", "ERROR")
+            else:
+                # 线程无法强杀：不再等待，但 _active 保留，结束前后续触发都按重叠跳过
+                active.add_done_callback(lambda f: f.exception())
+                self.log(f"{job.name}: 超时 ({job.timeout:g}s)，线程仍在运行，结束前跳过后续触发", "ERROR")
+            return
+        job.stats["runs"] += 1
+        error = active.exception()
+        if error is not None:
+            job.stats["failures"] += 1
+            metrics.count("jobs", job=job.name, result="failure")
+            self.log(f"{job.name}: 运行失败 ({elapsed:.1f}s): {error}", "ERROR")
+        else:
+            metrics.count("jobs", job=job.name, result="ok")
+            self.log(f"{job.name}: 完成 ({elapsed:.1f}s)")
+
+    async def run_job_once(self, name: str):
+        """立即运行某个任务一次 (调试用，忽略网格)"""
+        job = next(j for j in self.jobs if j.name == name)
+        await self._execute(job)
+        return job.stats
+
+
+# === 自检 ===
+class _SkewClock:
+    """墙钟 + 可调偏移，用来模拟挂起 (墙钟跳变而事件循环的单调时钟没走)"""
+
+    def __init__(self):
+        self.skew = 0.0
+
+    def __call__(self) -> float:
+        return time.time() + self.skew
+
+
+async def _check_async() -> List[str]:
+    failures = []
+    clock = _SkewClock()
+    starts: List[float] = []
+
+    def quick():
+        starts.append(clock())
+        time.sleep(0.03)
+
+    def slow():
+        time.sleep(0.45)
+
+    aligned = Job("aligned", quick, 0.2)
+    overlap = Job("overlap", slow, 0.2)
+    timeout = Job("timeout", slow, 0.2, timeout=0.1)
+    catch_all = Job("catch_all", quick, 0.5, catch_up=CATCH_UP_ALL)
+    catch_once = Job("catch_once", lambda: None, 0.5)
+    catch_skip = Job("catch_skip", lambda: None, 0.5, catch_up=CATCH_UP_SKIP)
+    scheduler = Scheduler([aligned, overlap, timeout], clock=clock, max_sleep=0.05, log_path=None,
+                          export_metrics=False)
+    scheduler.log = lambda *args, **kwargs: None
+
+    async def stop_after(seconds):
+        await asyncio.sleep(seconds)
+        scheduler.stop()
+
+    await asyncio.gather(scheduler.run(), stop_after(1.5))
+
+    # 无漂移：每次触发都落在 0.2s 网格附近，不随执行耗时累积
+    drift = max(abs(t - round(t / 0.2) * 0.2) for t in starts) if starts else 1.0
+    if drift > 0.05 or aligned.stats["runs"] < 6:
+        failures.append(f"对齐: runs={aligned.stats['runs']} 最大偏离 {drift * 1000:.0f}ms")
+    if overlap.stats["overlaps"] < 3:
+        failures.append(f"防重叠: {overlap.stats}")
+    if timeout.stats["timeouts"] < 1 or timeout.stats["overlaps"] < 1:
+        failures.append(f"超时: {timeout.stats}")
+
+    # 刚过一个触发点后挂起 2.5s (5 个触发点)：all 补跑 max_catch_up 次，once 补一次，skip 不补
+    scheduler = Scheduler([catch_all, catch_once, catch_skip], clock=clock, max_sleep=0.05, log_path=None,
+                          export_metrics=False)
+    scheduler.log = lambda *args, **kwargs: None
+
+    async def suspend():
+        await asyncio.sleep(0.5 - clock() % 0.5 + 0.05)
+        before = {job.name: job.stats["runs"] for job in scheduler.jobs}
+        clock.skew += 2.5
+        await asyncio.sleep(0.15)
+        after = {job.name: job.stats["runs"] for job in scheduler.jobs}
+        scheduler.stop()
+        return before, after
+
+    _, (before, after) = await asyncio.gather(scheduler.run(), suspend())
+    expected = {"catch_all": catch_all.max_catch_up, "catch_once": 1, "catch_skip": 0}
+    for name, want in expected.items():
+        got = after[name] - before[name]
+        if got != want:
+            failures.append(f"补跑 {name}: 期望 {want} 次，实际 {got} 次")
+    if catch_skip.stats["missed"] < 4:
+        failures.append(f"补跑: 未检测到挂起 {catch_skip.stats}")
+    return failures
+
+
+def check() -> bool:
+    print("👑 曹皇调度器自检 (对齐 / 防重叠 / 超时 / 补跑)")
+    failures = asyncio.run(_check_async())
+    for failure in failures:
+        print(f"  ❌ {failure}")
+    print("✅ 全部通过" if not failures else f"❌ {len(failures)} 项失败")
+    return not failures
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        sys.exit(0 if check() else 1)
+    print("用法: python scripts/scheduler.py check   (常驻运行见 daemon.py)")
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 情报站增量发布 👑
+由最新一轮扫描生成 GitHub Pages 站点 (index.html / data/latest_scan.json)，只重写、只发布内容变化的文件
+
+- Top-K 用堆 (heapq.nsmallest / nlargest)，不对全部模型排序
+- 每个产物按内容 SHA-256 比对：先用上次的发布时间渲染，哈希与上次一致说明内容没变，
+  不读不写磁盘；变化时才用本次时间重新渲染并写入
+- 原子写入：同目录临时文件 + fsync + os.replace，读取方 (Pages / 前端 fetch) 不会看到半个 JSON
+- 发布状态 (各产物哈希与发布时间) 存在站点目录的 .publish_state.json
+- 历史报告列表 (reports/report-*.md) 启动时读一次，之后由调用方 refresh_reports() 刷新 (守护进程每小时)
+- 部署只 git add / commit / push 本次变化的文件 (默认关闭，--deploy 开启)
+
+用法:
+  python scripts/site_publisher.py             # 由库中当前价格生成站点
+  python scripts/site_publisher.py --deploy    # 生成并推送变化的文件
+  python scripts/site_publisher.py --force     # 忽略哈希全部重写
+
+作者: 曹皇 👑
+"""
+
+import hashlib
+import heapq
+import html
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+SITE_PATH = Path.home() / ".openclaw" / "workspace" / "ai-arbitrage-insights"
+STATE_FILE = ".publish_state.json"
+CHEAPEST_K = 10       # latest_scan.json 最便宜模型条数
+EXPENSIVE_K = 5
+PAGE_K = 5            # 首页表格条数
+AUTO_DEPLOY = False   # 推送需显式开启 (--deploy)
+
+
+# === 站点数据 ===
+
+def build_site_data(prices: Dict[str, Tuple[float, float]], timestamp: datetime) -> Dict:
+    """{model_id: (prompt, completion)} → latest_scan.json 结构 (免费模型不参与排名)"""
+    paid = [(model_id, prompt) for model_id, (prompt, _) in prices.items() if prompt and prompt > 0]
+    by_price = lambda item: item[1]
+    return {
+        "timestamp": timestamp.isoformat(),
+        "total_models": len(prices),
+        "cheapest_models": [{"id": m, "input": round(p, 4)}
+                            for m, p in heapq.nsmallest(CHEAPEST_K, paid, key=by_price)],
+        "most_expensive": [{"id": m, "input": round(p, 4)}
+                           for m, p in heapq.nlargest(EXPENSIVE_K, paid, key=by_price)],
+    }
+
+
+def render_json(data: Dict, reports: List[str]) -> bytes:
+    return json.dumps(data, indent=2, ensure_ascii=False).encode()
+
+
+PAGE = Template('''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>AI 套利情报站 | 曹皇</title>
+    <style>
+        * { margin: 0; padding: 0; box-sizing: border-box; }
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            background: #0d1117;
+            color: #c9d1d9;
+            line-height: 1.6;
+            padding: 20px;
+        }
+        .container { max-width: 900px; margin: 0 auto; }
+        header { text-align: center; padding: 40px 0; border-bottom: 1px solid #30363d; }
+        h1 { font-size: 2.5em; color: #58a6ff; margin-bottom: 10px; }
+        .subtitle { color: #8b949e; font-size: 1.1em; }
+        .stats {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 20px;
+            margin: 30px 0;
+        }
+        .stat-card {
+            background: #161b22;
+            border: 1px solid #30363d;
+            border-radius: 12px;
+            padding: 20px;
+            text-align: center;
+        }
+        .stat-value { font-size: 2em; font-weight: bold; color: #3fb950; }
+        .stat-label { color: #8b949e; margin-top: 5px; }
+        .report-section {
+            background: #161b22;
+            border: 1px solid #30363d;
+            border-radius: 12px;
+            padding: 25px;
+            margin: 20px 0;
+        }
+        .report-header {
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 20px;
+            padding-bottom: 15px;
+            border-bottom: 1px solid #30363d;
+        }
+        .report-title { color: #58a6ff; font-size: 1.3em; }
+        .report-time { color: #8b949e; font-size: 0.9em; }
+        table { width: 100%; border-collapse: collapse; margin: 15px 0; }
+        th, td {
+            padding: 12px;
+            text-align: left;
+            border-bottom: 1px solid #30363d;
+        }
+        th { color: #8b949e; font-weight: 600; }
+        .price-low { color: #3fb950; }
+        .price-high { color: #f85149; }
+        .tag {
+            display: inline-block;
+            padding: 3px 10px;
+            border-radius: 12px;
+            font-size: 0.85em;
+            background: #238636;
+            color: white;
+        }
+        footer {
+            text-align: center;
+            padding: 30px 0;
+            color: #8b949e;
+            border-top: 1px solid #30363d;
+            margin-top: 30px;
+        }
+        .badge {
+            display: inline-block;
+            background: #58a6ff;
+            color: #0d1117;
+            padding: 5px 15px;
+            border-radius: 20px;
+            font-size: 0.9em;
+            font-weight: 600;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <header>
+            <h1>🤖 AI 套利情报站</h1>
+            <p class="subtitle">实时监控 OpenRouter 价格差异，发现套利机会</p>
+            <p style="margin-top: 10px;"><span class="badge">由 曹皇 自动维护</span></p>
+        </header>
+
+        <div class="stats">
+            <div class="stat-card">
+                <div class="stat-value">$total_models</div>
+                <div class="stat-label">监控模型数</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-value">$lowest</div>
+                <div class="stat-label">最低单价/M</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-value">$spread</div>
+                <div class="stat-label">价格差距</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-value" id="update-time">$updated_short</div>
+                <div class="stat-label">最后更新</div>
+            </div>
+        </div>
+
+        <div class="report-section">
+            <div class="report-header">
+                <span class="report-title">📊 最新情报报告</span>
+                <span class="report-time">$updated</span>
+            </div>
+
+            <h3 style="color: #58a6ff; margin: 20px 0 10px;">🥇 最便宜模型 Top $page_k</h3>
+            <table>
+                <thead>
+                    <tr><th>排名</th><th>模型</th><th>价格 (per 1M)</th></tr>
+                </thead>
+                <tbody>
+$cheapest_rows
+                </tbody>
+            </table>
+
+            <h3 style="color: #58a6ff; margin: 20px 0 10px;">💎 最贵模型 Top $page_k</h3>
+            <table>
+                <thead>
+                    <tr><th>排名</th><th>模型</th><th>价格 (per 1M)</th></tr>
+                </thead>
+                <tbody>
+$expensive_rows
+                </tbody>
+            </table>
+
+            <h3 style="color: #58a6ff; margin: 20px 0 10px;">🎯 关键套利信号</h3>
+            <ul style="list-style: none; padding: 0;">
+$signals
+            </ul>
+        </div>
+
+        <div class="report-section">
+            <div class="report-header">
+                <span class="report-title">📁 历史报告</span>
+            </div>
+            <ul style="list-style: none; padding: 0;">
+$reports
+            </ul>
+        </div>
+
+        <footer>
+            <p>🤖 由 曹皇 (Cao Huang) 自动维护</p>
+            <p style="margin-top: 10px;">数据来源: OpenRouter API | 每小时更新</p>
+            <p style="margin-top: 10px;">
+                <a href="https://github.com/huangcaopoxiao/ai-arbitrage-insights" style="color: #58a6ff;">GitHub</a>
+            </p>
+        </footer>
+    </div>
+</body>
+</html>
+''')
+
+
+def _price_rows(models: List[Dict], css: str) -> str:
+    return "\n".join(
+        f'                    <tr><td>{rank}</td><td>{html.escape(m["id"])}</td>'
+        f'<td class="{css}">${m["input"]:.2f}</td></tr>'
+        for rank, m in enumerate(models, 1)
+    )
+
+
+def list_reports(site: Path) -> List[str]:
+    """站点 reports/ 下的历史报告文件名 (新的在前)"""
+    return [path.name for path in sorted((site / "reports").glob("report-*.md"), reverse=True)]
+
+
+def _report_links(reports: List[str]) -> str:
+    links = []
+    for name in reports:
+        stem = html.escape(Path(name).stem[len("report-"):])
+        links.append(f'''                <li style="padding: 10px 0; border-bottom: 1px solid #30363d;">
+                    <a href="reports/{html.escape(name)}" style="color: #58a6ff; text-decoration: none;">
+                        📄 报告 #{stem}
+                    </a>
+                    <span style="float: right; color: #8b949e;">{stem[:10]}</span>
+                </li>''')
+    return "\n".join(links)
+
+
+def render_index(data: Dict, reports: List[str]) -> bytes:
+    cheapest = data["cheapest_models"][:PAGE_K]
+    expensive = data["most_expensive"][:PAGE_K]
+    updated = datetime.fromisoformat(data["timestamp"])
+    # 价格已保留 4 位小数，极低价的付费模型可能被舍入成 0，此时不算倍数
+    spread = (expensive[0]["input"] / cheapest[0]["input"]
+              if cheapest and expensive and cheapest[0]["input"] > 0 else None)
+    signals = []
+    if cheapest and expensive:
+        low, high = cheapest[0], expensive[0]
+        if spread is not None:
+            signals.append(f'{html.escape(high["id"].split("/")[-1])} 与最便宜模型价差 '
+                           f'<strong>{spread:,.0f}x</strong>')
+        signals.append(f'{html.escape(low["id"])} (${low["input"]:.2f}/M) 为当前最低价付费模型')
+    return PAGE.substitute(
+        total_models=data["total_models"],
+        lowest=f'${cheapest[0]["input"]:.2f}' if cheapest else "-",
+        spread=f'{spread:,.0f}x' if spread is not None else "-",
+        updated_short=f"{updated:%H:%M}",
+        updated=f"{updated:%Y-%m-%d %H:%M}",
+        page_k=PAGE_K,
+        cheapest_rows=_price_rows(cheapest, "price-low"),
+        expensive_rows=_price_rows(expensive, "price-high"),
+        signals="\n".join(f'                <li style="padding: 8px 0;"><span class="tag">信号 #{i}</span> {s}</li>'
+                          for i, s in enumerate(signals, 1)),
+        reports=_report_links(reports),
+    ).encode()
+
+
+@dataclass
+class Artifact:
+    path: str                                   # 相对站点目录
+    render: Callable[[Dict, List[str]], bytes]     # (站点数据, 历史报告文件名)
+
+
+ARTIFACTS = [
+    Artifact("data/latest_scan.json", render_json),
+    Artifact("index.html", render_index),
+]
+
+
+# === 写入与发布 ===
+
+def atomic_write(path: Path, content: bytes):
+    """同目录临时文件写完 fsync 后 rename，读取方只会看到旧文件或完整的新文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SitePublisher:
+    """常驻时在内存里保留发布状态，内容未变化的一轮不碰磁盘"""
+
+    def __init__(self, site: Path = SITE_PATH):
+        self.site = Path(site)
+        state_path = self.site / STATE_FILE
+        self.state: Dict[str, Dict[str, str]] = json.loads(state_path.read_text()) if state_path.exists() else {}
+        self.reports = list_reports(self.site)
+
+    def refresh_reports(self):
+        """重新列出 reports/ (新报告在下一次 publish 时进入首页)"""
+        self.reports = list_reports(self.site)
+
+    @metrics.timed("report_render", report="site")
+    def publish(self, prices: Dict[str, Tuple[float, float]], timestamp: Optional[datetime] = None,
+                force: bool = False) -> List[str]:
+        """生成全部产物，返回本次重写的相对路径"""
+        timestamp = timestamp or datetime.now()
+        data = build_site_data(prices, timestamp)
+        changed = []
+        for artifact in ARTIFACTS:
+            prev = self.state.get(artifact.path)
+            if prev is not None and not force:
+                # 按上次发布时间渲染：字节相同 = 内容未变
+                content = artifact.render(dict(data, timestamp=prev["published"]), self.reports)
+                if hashlib.sha256(content).hexdigest() == prev["sha256"]:
+                    continue
+            content = artifact.render(data, self.reports)
+            atomic_write(self.site / artifact.path, content)
+            metrics.count("site_writes", artifact=artifact.path)
+            self.state[artifact.path] = {"sha256": hashlib.sha256(content).hexdigest(),
+                                         "published": timestamp.isoformat()}
+            changed.append(artifact.path)
+        if changed:
+            atomic_write(self.site / STATE_FILE, json.dumps(self.state, indent=1).encode())
+        return changed
+
+    def deploy(self, changed: List[str]) -> bool:
+        """只提交并推送变化的文件 (站点目录所在的 git 仓库)"""
+        if not changed:
+            return False
+        git = ["git", "-C", str(self.site)]
+        subprocess.run(git + ["add", "--", *changed], check=True)
+        message = f"曹皇自动更新: {datetime.now():%Y-%m-%d %H:%M} | {', '.join(changed)}"
+        subprocess.run(git + ["commit", "-m", message, "--", *changed], check=True)
+        subprocess.run(git + ["push", "origin", "main"], check=True)
+        return True
+
+
+def publish_latest(monitor=None, site: Path = SITE_PATH, deploy: bool = AUTO_DEPLOY,
+                   force: bool = False, publisher: Optional[SitePublisher] = None) -> List[str]:
+    """由监控器当前价格发布站点 (daemon.py 每轮扫描后调用)"""
+    own_monitor = monitor is None
+    if own_monitor:
+        from openrouter_arbitrage import ArbitrageMonitor
+        monitor = ArbitrageMonitor()
+    publisher = publisher or SitePublisher(site)
+    try:
+        changed = publisher.publish(monitor.current_prices(), force=force)
+    finally:
+        if own_monitor:
+            monitor.close()
+    if changed:
+        print(f"🌐 站点已更新: {', '.join(changed)}")
+        if deploy:
+            publisher.deploy(changed)
+    else:
+        print("🌐 站点内容未变化，跳过写入")
+    return changed
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    publish_latest(deploy="--deploy" in args, force="--force" in args)
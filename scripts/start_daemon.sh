@@ -0,0 +1,13 @@
+#!/bin/bash
+# 曹皇 - 常驻守护进程启动脚本 👑
+# 套利扫描 / 显卡监控 / 报告 / 推文生成 (/ 发布) 全部在一个进程里调度，见 scripts/daemon.py
+
+cd "$(dirname "$0")/.."
+source venv/bin/activate
+
+export PYTHONPATH="${PYTHONPATH}:$(pwd)"
+
+python scripts/daemon.py "$@" >> logs/daemon.log 2>&1 &
+echo $! > .daemon.pid
+
+echo "曹皇守护进程已启动 (PID: $(cat .daemon.pid))"
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 共享 SQLite 存储层 👑
+显卡监控 / 套利监控 / 报告脚本共用
+
+设计：
+- 每个数据库一个 Storage 实例 (get_storage 按路径复用)
+- WAL 模式 + busy_timeout：写入时报告脚本照常读取，不再 "database is locked"
+- 单写线程：所有写操作排队串行执行，一次扫描的写入合并为一个事务
+- 读连接按线程长驻复用，不再每次查询 connect/close
+
+作者: 曹皇 👑
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import metrics
+
+BUSY_TIMEOUT_MS = 5000
+
+# 批量导入期间临时调整的 PRAGMA (结束后恢复原值)
+BULK_PRAGMAS = {
+    "cache_size": -65536,       # 64MB 页缓存
+    "temp_store": 2,            # MEMORY
+    "wal_autocheckpoint": 0,    # 导入期间不做自动 checkpoint，提交后统一做一次
+}
+
+# 单条语句绑定参数上限 (SQLite 3.32+ 为 32766，旧版本为 999)
+MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+MULTI_ROW_CHUNK = 500  # 多行 INSERT 每条语句最多行数
+
+# (sql, params, is_many)；sql 也可以是 callable(conn)，在写线程的同一事务内调用
+Statement = Tuple[Any, Any, bool]
+
+
+class Storage:
+    def __init__(self, db_path, busy_timeout_ms: int = BUSY_TIMEOUT_MS):
+        self.db_path = Path(db_path)
+        self.schema: Optional[str] = None  # 已迁移到最新版本的 schema 名 (见 migrations.py)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        # (语句, bulk, future)；bulk 为 None 表示不开事务 (call_outside_transaction)
+        self._queue: "queue.Queue[Optional[Tuple[List[Statement], Optional[bool], Future]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name=f"sqlite-writer:{self.db_path.name}",
+                                        daemon=True)
+        self._ready = threading.Event()
+        self._closed = False
+        self._writer.start()
+        self._ready.wait()
+
+    # === 连接 ===
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    # === 写线程 ===
+    def _writer_loop(self):
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        self._ready.set()
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            statements, bulk, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if bulk is None:  # call_outside_transaction
+                try:
+                    future.set_result(statements[0][0](conn))
+                except BaseException as e:
+                    future.set_exception(e)
+                continue
+            saved = self._apply_pragmas(conn, BULK_PRAGMAS) if bulk else None
+            start = time.perf_counter()
+            try:
+                result = len(statements)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for sql, params, many in statements:
+                        if callable(sql):
+                            result = sql(conn)
+                        elif many:
+                            conn.executemany(sql, params)
+                        else:
+                            conn.execute(sql, params)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                metrics.observe("db_write", time.perf_counter() - start, db=self.db_path.stem)
+                metrics.count("db_statements", len(statements), db=self.db_path.stem)
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                if saved is not None:
+                    self._apply_pragmas(conn, saved)
+                    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+        conn.close()
+
+    @staticmethod
+    def _apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Any]) -> Dict[str, Any]:
+        """设置 PRAGMA，返回旧值以便恢复"""
+        saved = {}
+        for name, value in pragmas.items():
+            saved[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+            conn.execute(f"PRAGMA {name} = {value}")
+        return saved
+
+    def _submit(self, statements: List[Statement], bulk: Optional[bool] = False) -> Future:
+        if self._closed:
+            raise RuntimeError(f"Storage 已关闭: {self.db_path}")
+        future: Future = Future()
+        self._queue.put((statements, bulk, future))
+        return future
+
+    # === 写接口 ===
+    @contextmanager
+    def transaction(self, bulk: bool = False):
+        """
+        把块内所有写操作合并为一个事务，退出时提交 (嵌套时并入外层)
+
+        bulk=True 时写线程在该事务期间启用 BULK_PRAGMAS，适合整批导入一次扫描
+        """
+        if getattr(self._local, "batch", None) is not None:
+            if bulk:
+                self._local.bulk = True
+            yield
+            return
+
+        self._local.batch = []
+        self._local.bulk = bulk
+        try:
+            yield
+            batch, bulk = self._local.batch, self._local.bulk
+        finally:
+            self._local.batch = None
+            self._local.bulk = False
+        if batch:
+            self._submit(batch, bulk).result()
+
+    def _write(self, statement: Statement):
+        batch = getattr(self._local, "batch", None)
+        if batch is not None:
+            batch.append(statement)
+        else:
+            self._submit([statement]).result()
+
+    def execute(self, sql: str, params: Sequence = ()):
+        """写入一条语句 (事务块内只入队，块结束时统一提交)"""
+        self._write((sql, tuple(params), False))
+
+    def executemany(self, sql: str, rows: Iterable[Sequence]):
+        self._write((sql, [tuple(r) for r in rows], True))
+
+    def call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        在写线程的事务里执行 fn(conn)，用于 "先读后写" 必须原子完成的场景 (如迁移)
+
+        不能在 transaction() 块内调用：块内写入尚未提交，拿不到返回值
+        """
+        if getattr(self._local, "batch", None) is not None:
+            raise RuntimeError("Storage.call() 不能在 transaction() 块内调用")
+        return self._submit([(fn, None, False)]).result()
+
+    def call_outside_transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        在写线程上、不开事务地执行 fn(conn)：只用于 VACUUM / 切换 auto_vacuum 这类不能在事务内执行的维护操作
+
+        仍经过写队列，与其他写操作串行
+        """
+        if getattr(self._local, "batch", None) is not None:
+            raise RuntimeError("Storage.call_outside_transaction() 不能在 transaction() 块内调用")
+        return self._submit([(fn, None, False)], bulk=None).result()
+
+    def insert_rows(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+        """
+        多行 INSERT 批量写入 (INSERT ... VALUES (...), (...), ...)
+
+        比逐行 executemany 少走大量 VM 调度，适合整批导入。返回写入行数。
+        """
+        ncols = len(columns)
+        chunk = max(1, min(MULTI_ROW_CHUNK, MAX_VARIABLES // ncols))
+        head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        placeholder = "(" + ", ".join("?" * ncols) + ")"
+        full_sql = head + ", ".join([placeholder] * chunk)
+
+        total = 0
+        pending: List[Any] = []
+        with self.transaction():
+            for row in rows:
+                pending.extend(row)
+                total += 1
+                if len(pending) == chunk * ncols:
+                    self._write((full_sql, pending, False))
+                    pending = []
+            if pending:
+                tail_sql = head + ", ".join([placeholder] * (len(pending) // ncols))
+                self._write((tail_sql, pending, False))
+        return total
+
+    # === 读接口 ===
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """只读查询 (看到的是已提交的数据)"""
+        return self._reader().execute(sql, tuple(params)).fetchall()
+
+    def query_one(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        return self._reader().execute(sql, tuple(params)).fetchone()
+
+    @contextmanager
+    def trace_reads(self, callback: Callable[[str], None]):
+        """块内当前线程读连接执行的每条 SQL 都会传给 callback (用于查询计划检查)"""
+        conn = self._reader()
+        conn.set_trace_callback(callback)
+        try:
+            yield
+        finally:
+            conn.set_trace_callback(None)
+
+    # === 生命周期 ===
+    def close(self):
+        """等待写队列清空后关闭所有连接"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+
+
+_instances: Dict[Path, Storage] = {}
+_instances_lock = threading.Lock()
+
+
+def get_storage(db_path, schema: Optional[str] = None) -> Storage:
+    """
+    获取进程内共享的 Storage 实例 (同一数据库只开一套连接)
+
+    指定 schema 时首次打开会先执行 migrations.py 中未应用的迁移
+    """
+    key = Path(db_path).expanduser().resolve()
+    with _instances_lock:
+        store = _instances.get(key)
+        if store is None or store._closed:
+            store = Storage(key)
+            _instances[key] = store
+        if schema is not None and store.schema != schema:
+            from migrations import migrate
+            migrate(store, schema)
+            store.schema = schema
+        return store
+
+
+@atexit.register
+def close_all():
+    """进程退出前刷完写队列"""
+    with _instances_lock:
+        for store in _instances.values():
+            store.close()
+        _instances.clear()
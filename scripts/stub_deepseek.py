@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+曹皇 - DeepSeek chat/completions 本地桩服务 👑
+在 127.0.0.1 上模拟 /v1/chat/completions，用来验证警报推文并发生成 (alert_content.py)，不访问真实 API
+
+- latency：每个请求的固定处理时间 (秒)，模拟模型生成耗时
+- fail(status, times)：让接下来的若干请求返回指定状态码 (429 附带 Retry-After: 0)
+- stall(n)：让接下来的 n 个请求挂起 (超过客户端超时)，模拟个别慢请求
+- 记录最大同时在途请求数，用来核对并发上限
+
+用法:
+  python scripts/stub_deepseek.py check     # 跑一组场景 (并发上限 / 重试 / 慢请求不拖整批)，不符则退出码 1
+  python scripts/stub_deepseek.py bench     # 1 / 10 / 100 个警报：逐条同步请求 vs 并发生成的整批耗时
+  python scripts/stub_deepseek.py serve     # 前台运行桩服务，打印地址
+
+作者: 曹皇 👑
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+STALL_SECONDS = 5.0
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128  # 默认 listen 队列只有 5，100 个并发连接会触发 SYN 重传 (1s)
+    daemon_threads = True     # 关闭时不等挂起中的请求
+
+
+class StubDeepSeek:
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failures = deque()  # 状态码，或 "stall"
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, payload, headers=None):
+                body = json.dumps(payload, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    failure = stub._failures.popleft() if stub._failures else None
+                try:
+                    if failure == "stall":
+                        time.sleep(STALL_SECONDS)
+                    else:
+                        time.sleep(stub.latency)
+                    if failure not in (None, "stall"):
+                        headers = {"Retry-After": "0"} if failure == 429 else None
+                        self._reply(failure, {"error": {"message": "stub failure"}}, headers)
+                        return
+                    prompt = request["messages"][0]["content"]
+                    self._reply(200, {
+                        "choices": [{"message": {"role": "assistant",
+                                                 "content": f"📊 {prompt.splitlines()[-1][:120]} #AI"}}],
+                        "usage": {"total_tokens": 150},
+                    })
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端已超时断开
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/chat/completions"
+
+    def fail(self, status: int, times: int = 1):
+        self._failures.extend([status] * times)
+
+    def stall(self, times: int = 1):
+        self._failures.extend(["stall"] * times)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def synthetic_alerts(n: int):
+    """n 个互不相同的显卡降价警报 (gpu_price_monitor 警报结构)"""
+    return [{"gpu_model": f"RTX 40{60 + i % 4 * 10}", "retailer": ("Newegg", "BestBuy")[i % 2],
+             "product_name": f"Stub GPU SKU-{i}", "old_price": 1000.0 + i, "new_price": 900.0 + i,
+             "drop_percent": round(100 / (1000 + i) * 100, 1), "in_stock": i % 3 != 0}
+            for i in range(n)]
+
+
+def _use_stub(stub):
+    import generate_deepseek_content
+    generate_deepseek_content.DEEPSEEK_API_URL = stub.url
+    os.environ.setdefault("DEEPSEEK_API_KEY", "stub")
+
+
+def check() -> bool:
+    """依次验证: 并发上限 → 429/5xx 重试 → 慢请求超时不拖整批 → 整批截止时间 → 缓存命中"""
+    from alert_content import AsyncGenerator, gpu_alert_item
+
+    ok = True
+
+    def verify(name, passed, detail):
+        nonlocal ok
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} {name}: {detail}")
+
+    items = [gpu_alert_item(a) for a in synthetic_alerts(20)]
+    with StubDeepSeek(latency=0.1) as stub:
+        _use_stub(stub)
+        results = AsyncGenerator(concurrency=4, use_cache=False).run(items)
+        verify("并发上限", all(r.ok for r in results.values()) and stub.max_in_flight == 4,
+               f"20 条全部成功，桩服务最大同时在途 {stub.max_in_flight} (上限 4)")
+
+    with StubDeepSeek() as stub:
+        _use_stub(stub)
+        stub.fail(429)
+        stub.fail(503)
+        results = AsyncGenerator(concurrency=1, backoff_base=0.01, use_cache=False).run(items[:3])
+        attempts = [r.attempts for r in results.values()]
+        verify("429 / 5xx 重试", all(r.ok for r in results.values()) and stub.requests == 5,
+               f"各条尝试次数 {attempts}，桩服务 {stub.requests} 次请求")
+
+    with StubDeepSeek() as stub:
+        _use_stub(stub)
+        stub.stall()
+        start = time.perf_counter()
+        results = AsyncGenerator(concurrency=8, timeout=0.5, max_attempts=1, use_cache=False).run(items[:10])
+        elapsed = time.perf_counter() - start
+        failed = [r for r in results.values() if not r.ok]
+        verify("慢请求不拖整批", len(failed) == 1 and failed[0].text == failed[0].fallback and elapsed < 1.5,
+               f"9 条成功 + 1 条超时 ({failed[0].error if failed else '-'}) 用模板，整批 {elapsed:.2f}s")
+
+    with StubDeepSeek() as stub:
+        _use_stub(stub)
+        stub.stall()
+        start = time.perf_counter()
+        results = AsyncGenerator(concurrency=8, timeout=30, deadline=0.5, use_cache=False).run(items[:10])
+        elapsed = time.perf_counter() - start
+        failed = [r for r in results.values() if not r.ok]
+        verify("整批截止时间", len(failed) == 1 and elapsed < 1.5,
+               f"截止时取消 {len(failed)} 条 ({failed[0].error if failed else '-'})，整批 {elapsed:.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp, StubDeepSeek() as stub:
+        import generation_cache
+        _use_stub(stub)
+        generation_cache._cache = generation_cache.GenerationCache(Path(tmp) / "cache.db")
+        AsyncGenerator().run(items[:10])
+        before = stub.requests
+        results = AsyncGenerator().run(items[:10])
+        verify("缓存命中", stub.requests == before and all(r.cached for r in results.values()),
+               f"第二批 10 条全部命中缓存，桩服务请求数 {before} → {stub.requests}")
+        generation_cache._cache = None
+    return ok
+
+
+def bench(sizes=(1, 10, 100), latency: float = 0.2):
+    """
+    每个请求 latency 秒：逐条同步 generate_with_deepseek vs AsyncGenerator 并发
+
+    并发侧与守护进程一样复用同一个 AsyncClient (连接池)，两侧都不走缓存
+    """
+    import asyncio
+    import generate_deepseek_content
+    from alert_content import CONCURRENCY, AsyncGenerator, gpu_alert_item
+
+    batches = {n: [gpu_alert_item(a) for a in synthetic_alerts(n)] for n in sizes}
+    generator = AsyncGenerator(use_cache=False)
+
+    async def run_concurrent():
+        timings = {}
+        async with generator.new_client() as client:
+            for n, items in batches.items():
+                start = time.perf_counter()
+                results = await generator.generate_all(items, client=client)
+                timings[n] = (time.perf_counter() - start, sum(r.ok for r in results.values()))
+        return timings
+
+    print(f"👑 警报推文生成整批耗时 (桩服务每请求 {latency * 1000:.0f}ms，并发上限 {CONCURRENCY}，不走缓存)")
+    print("-" * 64)
+    print(f"{'警报数':>6} {'逐条同步':>12} {'并发生成':>12} {'加速':>8} {'成功':>8}")
+    with StubDeepSeek(latency=latency) as stub:
+        _use_stub(stub)
+        sequential = {}
+        for n, items in batches.items():
+            start = time.perf_counter()
+            for item in items:
+                generate_deepseek_content.generate_with_deepseek(item.prompt, max_tokens=200, use_cache=False)
+            sequential[n] = time.perf_counter() - start
+        concurrent = asyncio.run(run_concurrent())
+    for n in sizes:
+        elapsed, ok = concurrent[n]
+        print(f"{n:>6} {sequential[n]:>11.2f}s {elapsed:>11.2f}s {sequential[n] / elapsed:>7.1f}x {ok:>5}/{n}")
+    print("-" * 64)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "serve":
+        with StubDeepSeek() as stub:
+            print(f"👑 桩服务已启动: {stub.url} (Ctrl+C 退出)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+    elif command == "bench":
+        bench()
+    else:
+        sys.exit(0 if check() else 1)
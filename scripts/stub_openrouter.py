@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+曹皇 - OpenRouter 目录本地桩服务 👑
+在 127.0.0.1 上模拟 /api/v1/models，用来验证条件抓取的短路逻辑，不访问真实 API
+
+- validators=True: 返回 ETag / Last-Modified，并对 If-None-Match / If-Modified-Since 回 304
+- validators=False: 不带校验头、忽略条件请求 (每次 200)，只能靠内容哈希短路
+- bump(): 改一个模型的价格，模拟目录更新
+
+用法:
+  python scripts/stub_openrouter.py check     # 跑一组场景，核对短路计数，不符则退出码 1
+  python scripts/stub_openrouter.py serve     # 前台运行桩服务，打印地址
+
+作者: 曹皇 👑
+"""
+
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+MODEL_COUNT = 340
+
+
+def synthetic_catalog(n: int = MODEL_COUNT) -> dict:
+    """生成与 /api/v1/models 同结构的目录 (价格为 per token 字符串)"""
+    return {"data": [
+        {
+            "id": f"vendor-{i % 20}/model-{i}",
+            "name": f"Model {i}",
+            "pricing": {"prompt": f"{(i % 97 + 1) / 1e7:.10f}", "completion": f"{(i % 89 + 1) / 2.5e6:.10f}"},
+        }
+        for i in range(n)
+    ]}
+
+
+class StubOpenRouter:
+    def __init__(self, validators: bool = True, model_count: int = MODEL_COUNT):
+        self.validators = validators
+        self.catalog = synthetic_catalog(model_count)
+        self.version = 0
+        self.requests = 0
+        self.not_modified = 0
+        self._encode()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.validators and (
+                        self.headers.get("If-None-Match") == stub.etag
+                        or self.headers.get("If-Modified-Since") == stub.last_modified):
+                    stub.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(stub.body)))
+                if stub.validators:
+                    self.send_header("ETag", stub.etag)
+                    self.send_header("Last-Modified", stub.last_modified)
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1/models"
+
+    def _encode(self):
+        self.body = json.dumps(self.catalog).encode()
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+        # 同一秒内多次 bump 时 Last-Modified 不变，靠版本号区分
+        self.last_modified = f"{formatdate(usegmt=True)}; v={self.version}"
+
+    def bump(self):
+        """修改第一个模型的价格，目录随之变化"""
+        self.version += 1
+        self.catalog["data"][0]["pricing"]["prompt"] = f"{self.version / 1e6:.10f}"
+        self._encode()
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def check() -> bool:
+    """依次验证: 首次全量 → 304 短路 → 目录变化 → 无校验头时哈希短路"""
+    import openrouter_arbitrage
+    from openrouter_arbitrage import ArbitrageMonitor
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        openrouter_arbitrage.LOG_PATH = Path(tmp) / "arbitrage.log"
+        for validators, expected in (
+            (True, ["changed", "not_modified", "not_modified", "changed", "not_modified"]),
+            (False, ["changed", "hash_match", "hash_match", "changed", "hash_match"]),
+        ):
+            with StubOpenRouter(validators=validators) as stub:
+                openrouter_arbitrage.OPENROUTER_API_URL = stub.url
+                monitor = ArbitrageMonitor(db_path=Path(tmp) / f"validators_{validators}.db")
+                for i in range(len(expected)):
+                    if i == 3:
+                        stub.bump()
+                    # 每轮新建监控实例，模拟 cron 每次启动新进程 (校验状态从库中恢复)
+                    ArbitrageMonitor(db_path=monitor.db_path).run_once()
+                stats = monitor.fetch_stats()
+                want = {status: expected.count(status) for status in set(expected)}
+                passed = stats == want
+                ok &= passed
+                print(f"{'✅' if passed else '❌'} validators={validators}: 短路统计 {stats} (期望 {want})，"
+                      f"桩服务 {stub.requests} 次请求 / {stub.not_modified} 次 304")
+    return ok
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "serve":
+        with StubOpenRouter() as stub:
+            print(f"👑 桩服务已启动: {stub.url} (Ctrl+C 退出)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+    else:
+        sys.exit(0 if check() else 1)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+曹皇 - Twitter API 本地桩服务 👑
+在 127.0.0.1 上模拟 statuses/update 与 statuses/user_timeline，用来验证发件箱的
+限速、退避重试与崩溃后不重复发帖，不访问真实 API (不校验 OAuth 签名)
+
+- fail(status, headers)：让下一次 POST 返回指定状态码 (可连续排多个)
+- drop()：下一次 POST 照常发出，但不回响应直接断开 (模拟发出后进程崩溃 / 连接中断)
+- 同一正文再次发送时回 403 + 错误码 187 (与真实 API 的重复内容检查一致)
+
+用法:
+  python scripts/stub_twitter.py check     # 跑一组场景，核对发帖结果，不符则退出码 1
+  python scripts/stub_twitter.py serve     # 前台运行桩服务，打印地址
+
+作者: 曹皇 👑
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+class StubTwitter:
+    def __init__(self):
+        self.tweets = []        # [(id_str, text)]
+        self.requests = 0
+        self._failures = deque()  # (status, headers) 或 "drop"
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive，验证 Session 复用
+
+            def _reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+                text = form.get("status", [""])[0]
+                with stub._lock:
+                    stub.requests += 1
+                    failure = stub._failures.popleft() if stub._failures else None
+                    if failure is not None and failure != "drop":
+                        status, headers = failure
+                        self._reply(status, {"errors": [{"code": 0, "message": "stub failure"}]}, headers)
+                        return
+                    if any(t == text for _, t in stub.tweets):
+                        self._reply(403, {"errors": [{"code": 187, "message": "Status is a duplicate."}]})
+                        return
+                    tweet_id = str(1000 + len(stub.tweets))
+                    stub.tweets.append((tweet_id, text))
+                if failure == "drop":
+                    self.close_connection = True
+                    return
+                self._reply(200, {"id_str": tweet_id, "text": text,
+                                  "created_at": time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime())})
+
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                count = int(query.get("count", ["20"])[0])
+                with stub._lock:
+                    recent = stub.tweets[-count:][::-1]
+                self._reply(200, [{"id_str": i, "full_text": t} for i, t in recent])
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/1.1"
+
+    def fail(self, status: int, headers=None, times: int = 1):
+        for _ in range(times):
+            self._failures.append((status, headers or {}))
+
+    def drop(self):
+        self._failures.append("drop")
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _bot(url):
+    from twitter_bot import TwitterBot
+    bot = TwitterBot(api_base=url, timeout=5)
+    bot.consumer_key = bot.consumer_secret = bot.access_token = bot.access_secret = "stub"
+    return bot
+
+
+def check() -> bool:
+    """依次验证: 5xx / 429 重试 → 幂等入队 → 发出后断开不重发 → 拒绝连接安全重试 → 无凭证不动发件箱 → 窗口限速 → 每日上限"""
+    from tweet_outbox import Outbox, RateLimiter
+    from storage import get_storage
+
+    ok = True
+
+    def verify(name, passed, detail):
+        nonlocal ok
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} {name}: {detail}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def outbox(name, **limits):
+            db = Path(tmp) / f"{name}.db"
+            store = get_storage(db, schema="outbox")
+            return Outbox(db, limiter=RateLimiter(store, **limits), backoff_base=0.05, sending_stale=0)
+
+        with StubTwitter() as stub:
+            bot = _bot(stub.url)
+            box = outbox("retry")
+            keys = [box.enqueue(f"推文 {i} #AI") for i in range(3)]
+            box.enqueue("推文 0 #AI")  # 同一正文 → 同一幂等键，不重复入队
+            stub.fail(503)
+            stub.fail(429, {"x-rate-limit-reset": str(int(time.time()) + 1)})
+            stats = box.drain(bot, max_wait=10)
+            posted = [box.result(k)["posted"] for k in keys]
+            verify("5xx / 429 重试", all(posted) and len(stub.tweets) == 3 and stub.requests == 5,
+                   f"{dict(stats)}，桩服务 {stub.requests} 次请求 / {len(stub.tweets)} 条推文")
+
+        with StubTwitter() as stub:
+            bot = _bot(stub.url)
+            box = outbox("crash")
+            key = box.enqueue("发出后连接断开")
+            stub.drop()
+            first = box.drain(bot)
+            second = box.drain(bot)  # 核对时间线：已发出，补记 posted 而不是重发
+            result = box.result(key)
+            verify("发出后断开不重发", result["posted"] and result["tweet_id"] == "1000" and len(stub.tweets) == 1,
+                   f"{dict(first)} → {dict(second)}，桩服务 {stub.requests} 次发帖 / {len(stub.tweets)} 条推文")
+
+        with StubTwitter() as stub:
+            url = stub.url
+        bot = _bot(url)  # 桩服务已关闭：连接被拒绝，请求肯定没发出
+        box = outbox("refused")
+        key = box.enqueue("连接被拒绝")
+        stats = box.drain(bot)
+        result = box.result(key)
+        verify("拒绝连接安全重试", stats["retry"] == 1 and result["status"] == "pending"
+               and box.status()["sent_24h"] == 0,
+               f"{dict(stats)}，行状态 {result['status']} (尝试 {result['attempts']} 次，不计入限额)")
+
+        bot = _bot(url)
+        bot.consumer_key = bot.consumer_secret = bot.access_token = bot.access_secret = None
+        box = outbox("no_credentials")
+        key = box.enqueue("没有凭证")
+        stats = box.drain(bot)
+        result, status = box.result(key), box.status()
+        verify("无凭证不动发件箱", not stats and result["status"] == "pending" and result["attempts"] == 0
+               and status["sent_24h"] == 0,
+               f"drain {dict(stats) or '未发送'}，行状态 {result['status']}，24 小时计数 {status['sent_24h']}")
+
+        with StubTwitter() as stub:
+            bot = _bot(stub.url)
+            box = outbox("window", window_cap=2, window_seconds=3600)
+            for i in range(4):
+                box.enqueue(f"限速 {i}")
+            stats = box.drain(bot)
+            # 新进程 (新令牌桶) 从库中恢复窗口内已发条数
+            again = outbox("window", window_cap=2, window_seconds=3600).drain(bot)
+            verify("窗口限速", len(stub.tweets) == 2 and not again["posted"],
+                   f"{dict(stats)}，新进程再 drain {dict(again) or '无发送'}，剩余 {box.status()['counts']['pending']} 条待发")
+
+        with StubTwitter() as stub:
+            bot = _bot(stub.url)
+            box = outbox("daily", window_cap=100, daily_cap=3)
+            for i in range(5):
+                box.enqueue(f"每日上限 {i}")
+            stats = box.drain(bot)
+            wait = box.limiter.wait_time(time.time())
+            verify("每日上限", len(stub.tweets) == 3 and wait > 23 * 3600,
+                   f"{dict(stats)}，下一条需等待 {wait / 3600:.1f} 小时")
+    return ok
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "serve":
+        with StubTwitter() as stub:
+            print(f"👑 桩服务已启动: {stub.url} (Ctrl+C 退出)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+    else:
+        sys.exit(0 if check() else 1)
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+曹皇 - 推文发件箱 👑
+所有推文先写入 SQLite 发件箱 (outbox.db)，再由 drain 按限速逐条发出
+
+- 限速：令牌桶 WINDOW_CAP 条 / WINDOW_SECONDS 秒 (防止连发被判垃圾信息)，
+  外加滚动 24 小时 DAILY_CAP 条 (基础版每日上限)；两者都从库中已发记录恢复，跨进程有效
+- 凭证不全时 drain 直接返回，不认领、不计入限额；请求在认领前就在本地签好名，本地出错的行保持 pending
+- 429 按 x-rate-limit-reset / Retry-After 暂停整个发件箱；5xx 与连接没建立 (连接超时 / DNS / 拒绝连接) 指数退避重试，
+  超过 MAX_ATTEMPTS 次标记 failed；其余 4xx (凭证错误、内容违规) 直接 failed
+- 幂等：同一幂等键 (默认为正文 sha256) 只入队一次；发送前先把行标记为 sending 并提交，
+  结果不明 (崩溃 / 连接中断 / 读超时) 的行不会盲目重发，超过 SENDING_STALE 秒后
+  拉取最近推文核对：已发出的补记为 posted，确认没发出的才回到 pending；
+  Twitter 回复 "重复内容" (错误码 187) 也视为已发
+- 埋点：post (单次请求耗时)、queue_wait (入队到发出)，计数 tweets{outcome=...}
+
+行状态: pending → sending → posted / failed (sending 可回到 pending 重试)
+
+用法:
+  python scripts/tweet_outbox.py status            # 各状态行数、最老待发、24 小时内已发
+  python scripts/tweet_outbox.py drain [最长等待秒]  # 发送到期的推文 (默认等待 60 秒内到期的)
+  python scripts/tweet_outbox.py enqueue <文件>     # 把文件开头 280 字符放入发件箱
+
+作者: 曹皇 👑
+"""
+
+import hashlib
+import html
+import random
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+import urllib3
+
+import metrics
+from storage import get_storage
+from twitter_bot import TWEET_MAX_CHARS
+
+DB_PATH = Path.home() / ".openclaw" / "workspace" / "data" / "outbox.db"
+
+WINDOW_CAP = 5                  # 令牌桶容量：每个窗口最多连发条数
+WINDOW_SECONDS = 15 * 60
+DAILY_CAP = 50                  # 滚动 24 小时上限
+DAY = 24 * 60 * 60
+MAX_ATTEMPTS = 6                # 5xx / 连接超时的最多尝试次数 (429 不计)
+BACKOFF_BASE = 30.0             # 秒，第 n 次失败后等待 BACKOFF_BASE * 2^(n-1) (带抖动)
+BACKOFF_MAX = 60 * 60
+SENDING_STALE = 120             # 秒，sending 超过这么久才去核对 (大于请求超时)
+RECONCILE_COUNT = 50            # 核对时拉取的最近推文条数
+DUPLICATE_STATUS = 187          # Twitter 错误码: Status is a duplicate
+
+PENDING, SENDING, POSTED, FAILED = "pending", "sending", "posted", "failed"
+STATUSES = (PENDING, SENDING, POSTED, FAILED)
+
+
+def idempotency_key(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _never_sent(error: Exception) -> bool:
+    """连接阶段就失败的异常 (连接超时 / DNS 解析失败 / 拒绝连接)：请求肯定没到服务端"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def _normalize(text: str) -> str:
+    """核对用：时间线返回的正文经过 HTML 转义、链接被替换成 t.co"""
+    text = re.sub(r"https?://\S+", "<url>", html.unescape(text))
+    return " ".join(text.split())
+
+
+class TokenBucket:
+    """capacity 个令牌，每 window 秒匀速补满"""
+
+    def __init__(self, capacity: int, window: float, tokens: Optional[float] = None,
+                 now: Optional[float] = None):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity if tokens is None else tokens)
+        self.updated = time.time() if now is None else now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, now: float) -> float:
+        """还要等多少秒才有一个令牌"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """窗口令牌桶 + 滚动 24 小时上限 + 服务端 429 暂停"""
+
+    def __init__(self, store, window_cap: int = WINDOW_CAP, window_seconds: float = WINDOW_SECONDS,
+                 daily_cap: int = DAILY_CAP):
+        self.store = store
+        self.daily_cap = daily_cap
+        now = time.time()
+        # 上一个进程在窗口内已发的条数先扣掉 (cron 每次新进程也不会超发)
+        recent = self.sent_since(now - window_seconds)
+        self.bucket = TokenBucket(window_cap, window_seconds, tokens=max(0, window_cap - recent), now=now)
+        self.paused_until = 0.0
+
+    def sent_since(self, since: float) -> int:
+        """since 之后已发出 (含结果不明) 的条数"""
+        return self.store.query_one('''
+            SELECT COUNT(*) FROM tweet_outbox WHERE sent_at >= ? AND status IN (?, ?)
+        ''', (since, POSTED, SENDING))[0]
+
+    def daily_wait(self, now: float) -> float:
+        if self.sent_since(now - DAY) < self.daily_cap:
+            return 0.0
+        oldest = self.store.query_one('''
+            SELECT MIN(sent_at) FROM tweet_outbox WHERE sent_at >= ? AND status IN (?, ?)
+        ''', (now - DAY, POSTED, SENDING))[0]
+        return max(1.0, oldest + DAY - now)
+
+    def wait_time(self, now: float) -> float:
+        return max(self.paused_until - now, self.bucket.wait_time(now), self.daily_wait(now))
+
+    def take(self, now: float):
+        self.bucket.take(now)
+
+    def pause(self, until: float):
+        """服务端限流：until 之前不再发送"""
+        self.paused_until = max(self.paused_until, until)
+
+
+class Outbox:
+    def __init__(self, db_path: Path = DB_PATH, limiter: Optional[RateLimiter] = None,
+                 backoff_base: float = BACKOFF_BASE, sending_stale: float = SENDING_STALE):
+        self.store = get_storage(db_path, schema="outbox")
+        self.limiter = limiter or RateLimiter(self.store)
+        self.backoff_base = backoff_base
+        self.sending_stale = sending_stale
+
+    # === 入队 ===
+    def enqueue(self, text: str, key: Optional[str] = None, not_before: Optional[float] = None) -> str:
+        """放入发件箱，返回幂等键；同一键已存在时不重复入队 (不论其状态)"""
+        if not text.strip():
+            raise ValueError("推文内容为空")
+        if len(text) > TWEET_MAX_CHARS:
+            raise ValueError(f"推文太长 ({len(text)} 字符)，Twitter 限制 {TWEET_MAX_CHARS} 字符")
+        key = key or idempotency_key(text)
+        now = time.time()
+        self.store.execute('''
+            INSERT OR IGNORE INTO tweet_outbox (idem_key, text, status, enqueued_at, not_before)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, text, PENDING, now, not_before or now))
+        return key
+
+    def result(self, key: str) -> Optional[Dict]:
+        row = self.store.query_one('''
+            SELECT status, tweet_id, last_error, attempts FROM tweet_outbox WHERE idem_key = ?
+        ''', (key,))
+        if row is None:
+            return None
+        status, tweet_id, error, attempts = row
+        return {"status": status, "posted": status == POSTED,
+                "tweet_id": tweet_id, "error": error, "attempts": attempts}
+
+    # === 发送 ===
+    def next_due(self, now: float) -> Optional[tuple]:
+        return self.store.query_one('''
+            SELECT id, text, attempts, enqueued_at FROM tweet_outbox
+            WHERE status = ? AND not_before <= ? ORDER BY not_before, id LIMIT 1
+        ''', (PENDING, now))
+
+    def next_due_time(self) -> Optional[float]:
+        return self.store.query_one(
+            "SELECT MIN(not_before) FROM tweet_outbox WHERE status = ?", (PENDING,))[0]
+
+    def _claim(self, row_id: int, now: float) -> bool:
+        """pending → sending 并提交；返回 False 表示被其他进程抢先"""
+        return self.store.call(lambda conn: conn.execute('''
+            UPDATE tweet_outbox SET status = ?, sent_at = ?, attempts = attempts + 1
+            WHERE id = ? AND status = ?
+        ''', (SENDING, now, row_id, PENDING)).rowcount == 1)
+
+    def _finish(self, row_id: int, status: str, tweet_id: Optional[str] = None,
+                error: Optional[str] = None, not_before: Optional[float] = None):
+        self.store.execute('''
+            UPDATE tweet_outbox SET status = ?, tweet_id = COALESCE(?, tweet_id), last_error = ?,
+                not_before = COALESCE(?, not_before)
+            WHERE id = ?
+        ''', (status, tweet_id, error, not_before, row_id))
+
+    def _backoff(self, attempts: int) -> float:
+        return min(BACKOFF_MAX, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def _retry_at(response, now: float) -> Optional[float]:
+        """x-rate-limit-reset (epoch 秒) 或 Retry-After (秒)"""
+        reset = response.headers.get("x-rate-limit-reset")
+        if reset and reset.isdigit():
+            return float(reset)
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return now + float(retry_after)
+        return None
+
+    @staticmethod
+    def _error_codes(response) -> set:
+        try:
+            return {e.get("code") for e in response.json().get("errors", [])}
+        except (ValueError, AttributeError):
+            return set()
+
+    def send(self, bot, row: tuple) -> str:
+        """发送一行，返回结果: posted / duplicate / retry / rate_limited / failed / unknown / skipped / error"""
+        row_id, text, attempts, enqueued_at = row
+        try:
+            request = bot.prepare_status(text)  # 本地签名出错时行还没认领，保持 pending
+        except Exception as e:
+            print(f"❌ 推文 #{row_id} 构造请求失败 (未发送): {e}")
+            self.store.execute("UPDATE tweet_outbox SET last_error = ? WHERE id = ?", (str(e), row_id))
+            metrics.count("tweets", outcome="error")
+            return "error"
+        now = time.time()
+        if not self._claim(row_id, now):
+            return "skipped"
+        attempts += 1
+        self.limiter.take(now)
+        try:
+            with metrics.timer("post", source="twitter"):
+                response = bot.send_prepared(request)
+        except Exception as e:
+            if _never_sent(e):
+                # 连接都没建立 (超时 / DNS / 拒绝连接)，请求肯定没发出，可以安全重试
+                outcome = self._retry(row_id, attempts, now, f"连接失败: {e}")
+            else:
+                # 请求可能已到达服务端：保持 sending，等核对后再决定
+                print(f"⚠️ 推文 #{row_id} 发送结果不明，{self.sending_stale:g}s 后核对: {e}")
+                self.store.execute("UPDATE tweet_outbox SET last_error = ? WHERE id = ?", (str(e), row_id))
+                outcome = "unknown"
+        else:
+            outcome = self._handle(row_id, attempts, enqueued_at, response, time.time())
+        metrics.count("tweets", outcome=outcome)
+        return outcome
+
+    def _handle(self, row_id: int, attempts: int, enqueued_at: float, response, now: float) -> str:
+        status = response.status_code
+        if status == 200:
+            self._finish(row_id, POSTED, tweet_id=response.json().get("id_str"))
+            metrics.observe("queue_wait", now - enqueued_at, source="twitter")
+            if response.headers.get("x-rate-limit-remaining") == "0":
+                self.limiter.pause(self._retry_at(response, now) or now + WINDOW_SECONDS)
+            return "posted"
+        if status == 403 and DUPLICATE_STATUS in self._error_codes(response):
+            self._finish(row_id, POSTED, error="duplicate")
+            return "duplicate"
+        if status == 429:
+            retry_at = self._retry_at(response, now) or now + self._backoff(attempts)
+            self.limiter.pause(retry_at)
+            self._finish(row_id, PENDING, error="HTTP 429", not_before=retry_at)
+            print(f"⏳ Twitter 限流，暂停到 {datetime.fromtimestamp(retry_at):%H:%M:%S}")
+            return "rate_limited"
+        if status >= 500:
+            return self._retry(row_id, attempts, now, f"HTTP {status}: {response.text[:200]}")
+        self._finish(row_id, FAILED, error=f"HTTP {status}: {response.text[:500]}")
+        print(f"❌ 推文 #{row_id} 发送失败 (HTTP {status})，不再重试")
+        return "failed"
+
+    def _retry(self, row_id: int, attempts: int, now: float, error: str) -> str:
+        if attempts >= MAX_ATTEMPTS:
+            self._finish(row_id, FAILED, error=error)
+            print(f"❌ 推文 #{row_id} 已尝试 {attempts} 次，放弃: {error}")
+            return "failed"
+        self._finish(row_id, PENDING, error=error, not_before=now + self._backoff(attempts))
+        return "retry"
+
+    # === 崩溃恢复 ===
+    def reconcile(self, bot) -> Counter:
+        """核对停在 sending 的行：在最近推文里找到的补记 posted，找不到的回到 pending"""
+        stale = self.store.query('''
+            SELECT id, text FROM tweet_outbox WHERE status = ? AND sent_at < ?
+        ''', (SENDING, time.time() - self.sending_stale))
+        outcomes: Counter = Counter()
+        if not stale:
+            return outcomes
+        try:
+            recent = {_normalize(t.get("full_text") or t.get("text") or ""): t.get("id_str")
+                      for t in bot.recent_tweets(RECONCILE_COUNT)}
+        except Exception as e:
+            print(f"⚠️ 拉取最近推文失败，{len(stale)} 条 sending 暂不处理: {e}")
+            return outcomes
+        for row_id, text in stale:
+            tweet_id = recent.get(_normalize(text))
+            if tweet_id:
+                self._finish(row_id, POSTED, tweet_id=tweet_id, error="reconciled")
+                outcomes["reconciled"] += 1
+            else:
+                self._finish(row_id, PENDING, not_before=time.time())
+                outcomes["requeued"] += 1
+        for outcome, n in outcomes.items():
+            metrics.count("tweets", n, outcome=outcome)
+        return outcomes
+
+    def drain(self, bot, max_posts: Optional[int] = None, max_wait: float = 0.0) -> Counter:
+        """
+        发送所有已到期且限速允许的推文
+
+        max_wait: 下一条要等的时间 (限速或退避) 不超过剩余的 max_wait 秒时就地等待，否则结束本轮
+        """
+        if not bot.has_credentials():
+            print("❌ OAuth 凭证不完整，发件箱本轮不发送")
+            return Counter()
+        start = time.monotonic()
+        stats = self.reconcile(bot)
+        while max_posts is None or stats["posted"] < max_posts:
+            now = time.time()
+            row = self.next_due(now)
+            if row is None:
+                due = self.next_due_time()
+                if due is None:
+                    break
+                delay = max(due - now, 0.01)
+            else:
+                delay = self.limiter.wait_time(now)
+            if delay > 0:
+                if delay > max_wait - (time.monotonic() - start):
+                    break
+                time.sleep(delay)
+                continue
+            outcome = self.send(bot, row)
+            stats[outcome] += 1
+            if outcome == "error":  # 本地错误重试也一样，留给下一轮
+                break
+        return stats
+
+    # === 状态 ===
+    def status(self) -> Dict:
+        now = time.time()
+        counts, oldest = {}, {}
+        for status in STATUSES:
+            counts[status], oldest[status] = self.store.query_one(
+                "SELECT COUNT(*), MIN(enqueued_at) FROM tweet_outbox WHERE status = ?", (status,))
+        oldest_pending = now - oldest[PENDING] if oldest[PENDING] else None
+        return {"counts": counts, "oldest_pending_s": oldest_pending,
+                "sent_24h": self.limiter.sent_since(now - DAY), "next_wait_s": self.limiter.wait_time(now)}
+
+
+def print_status(outbox: Outbox):
+    s = outbox.status()
+    print("👑 曹皇推文发件箱")
+    print("-" * 50)
+    for status, n in s["counts"].items():
+        print(f"{status:10} {n:>6}")
+    print("-" * 50)
+    if s["oldest_pending_s"] is not None:
+        print(f"最老待发: {s['oldest_pending_s'] / 60:.1f} 分钟前入队")
+    print(f"24 小时内已发: {s['sent_24h']} / {outbox.limiter.daily_cap}")
+    print(f"限速剩余等待: {s['next_wait_s']:.0f}s")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "status"
+    if command == "drain":
+        from twitter_bot import TwitterBot
+        outbox = Outbox()
+        start = time.perf_counter()
+        stats = outbox.drain(TwitterBot(), max_wait=float(args[1]) if len(args) > 1 else 60)
+        print(f"📤 发件箱: {dict(stats) or '无到期推文'} ({time.perf_counter() - start:.1f}s)")
+        metrics.export()
+    elif command == "enqueue" and len(args) > 1:
+        from twitter_bot import tweet_text_from_file
+        key = Outbox().enqueue(tweet_text_from_file(args[1]), key=f"file:{Path(args[1]).name}")
+        print(f"✅ 已入队 (幂等键 {key})")
+    elif command == "status":
+        print_status(Outbox())
+    else:
+        print(__doc__)
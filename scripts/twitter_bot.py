@@ -9,6 +9,9 @@
 - 重复内容会被标记为垃圾信息
 - 建议开启限速模式
 
+所有发布都经过 tweet_outbox.py 的 SQLite 发件箱：限速 (窗口 + 每日上限)、
+429/5xx 退避重试、幂等键防止崩溃后重复发帖
+
 作者: 曹皇
 """
 
@@ -23,34 +26,34 @@ import string
 import urllib.parse
 from datetime import datetime
 from pathlib import Path
-import subprocess
 
-# Keychain 服务名
+import metrics
+from key_manager import get_key
+
+API_BASE = "https://api.twitter.com/1.1"  # 验证时可指向本地桩服务 (stub_twitter.py)
+TWEET_MAX_CHARS = 280
+
+# 凭证服务名 (环境变量 / .env / 加密文件 / Keychain，见 key_manager.py)
 CONSUMER_KEY_SERVICE = 'twitter-consumer-key'
 CONSUMER_SECRET_SERVICE = 'twitter-consumer-secret'
 ACCESS_TOKEN_SERVICE = 'twitter-access-token'
 ACCESS_SECRET_SERVICE = 'twitter-access-secret'
 
-def get_keychain_password(service):
-    """从 macOS Keychain 获取密码"""
-    try:
-        result = subprocess.run(
-            ['security', 'find-generic-password', '-s', service, '-w'],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
-        return None
-    except:
-        return None
-
 class TwitterBot:
-    def __init__(self):
-        self.consumer_key = get_keychain_password(CONSUMER_KEY_SERVICE)
-        self.consumer_secret = get_keychain_password(CONSUMER_SECRET_SERVICE)
-        self.access_token = get_keychain_password(ACCESS_TOKEN_SERVICE)
-        self.access_secret = get_keychain_password(ACCESS_SECRET_SERVICE)
+    def __init__(self, api_base=API_BASE, timeout=30):
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.consumer_key = get_key(CONSUMER_KEY_SERVICE)
+        self.consumer_secret = get_key(CONSUMER_SECRET_SERVICE)
+        self.access_token = get_key(ACCESS_TOKEN_SERVICE)
+        self.access_secret = get_key(ACCESS_SECRET_SERVICE)
+        # 常驻进程 (scheduler 守护进程) 里复用 TLS 连接
+        self.session = requests.Session()
         
+    def has_credentials(self):
+        """四项 OAuth 凭证是否齐全 (发件箱发送前检查，缺了不动发件箱)"""
+        return all([self.consumer_key, self.consumer_secret, self.access_token, self.access_secret])
+
     def check_credentials(self):
         """检查凭证状态"""
         return {
@@ -112,13 +115,13 @@ class TwitterBot:
         if not all([self.consumer_key, self.consumer_secret, self.access_token, self.access_secret]):
             return {'valid': False, 'error': '凭证不完整'}
         
-        url = "https://api.twitter.com/1.1/account/verify_credentials.json"
+        url = f"{self.api_base}/account/verify_credentials.json"
         headers = {
             'Authorization': self.make_oauth_header('GET', url)
         }
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -136,6 +139,38 @@ class TwitterBot:
         except Exception as e:
             return {'valid': False, 'error': str(e)}
     
+    def prepare_status(self, text):
+        """签好名的 POST statuses/update 请求 (只在本地构造，不发出；凭证有误在这里就抛出)"""
+        url = f"{self.api_base}/statuses/update.json"
+        params = {'status': text}
+        headers = {
+            'Authorization': self.make_oauth_header('POST', url, params)
+        }
+        return self.session.prepare_request(requests.Request('POST', url, data=params, headers=headers))
+
+    def send_prepared(self, request):
+        """
+        发出 prepare_status 构造的请求，返回原始 Response (网络错误照常抛出)
+
+        发件箱据状态码与 x-rate-limit-* / Retry-After 头决定重试、退避或放弃
+        """
+        return self.session.send(request, timeout=self.timeout)
+
+    def send_status(self, text):
+        """POST statuses/update，返回原始 Response (网络错误照常抛出)"""
+        return self.send_prepared(self.prepare_status(text))
+    
+    def recent_tweets(self, count=20):
+        """本账号最近的推文 (发件箱核对崩溃前是否已发出)；失败时抛异常"""
+        url = f"{self.api_base}/statuses/user_timeline.json"
+        params = {'count': str(count), 'tweet_mode': 'extended'}
+        headers = {
+            'Authorization': self.make_oauth_header('GET', url, params)
+        }
+        response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+    
     def post_tweet(self, text):
         """
         发布推文 (Twitter API v1.1)
@@ -153,24 +188,14 @@ class TwitterBot:
             }
         
         # 检查长度
-        if len(text) > 280:
+        if len(text) > TWEET_MAX_CHARS:
             return {
                 'success': False,
-                'error': f'推文太长 ({len(text)} 字符)，Twitter 限制 280 字符'
+                'error': f'推文太长 ({len(text)} 字符)，Twitter 限制 {TWEET_MAX_CHARS} 字符'
             }
         
-        url = "https://api.twitter.com/1.1/statuses/update.json"
-        
-        # 请求参数
-        params = {'status': text}
-        
-        # 生成 OAuth header
-        headers = {
-            'Authorization': self.make_oauth_header('POST', url, params)
-        }
-        
         try:
-            response = requests.post(url, data=params, headers=headers, timeout=30)
+            response = self.send_status(text)
             
             if response.status_code == 200:
                 data = response.json()
@@ -194,28 +219,31 @@ class TwitterBot:
             }
     
     def post_from_file(self, filepath):
-        """从文件读取并发布推文"""
+        """从文件读取并直接发布推文 (不经过发件箱)"""
         try:
-            with open(filepath, 'r') as f:
-                content = f.read().strip()
-            
-            # 提取第一个适合长度的段落
-            lines = content.split('\n')
-            tweet_text = []
-            current_length = 0
-            
-            for line in lines:
-                if current_length + len(line) + 1 <= 280:
-                    tweet_text.append(line)
-                    current_length += len(line) + 1
-                else:
-                    break
-            
-            final_text = '\n'.join(tweet_text)
-            return self.post_tweet(final_text)
+            return self.post_tweet(tweet_text_from_file(filepath))
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+def tweet_text_from_file(filepath):
+    """文件开头不超过 280 字符的若干整行"""
+    with open(filepath, 'r') as f:
+        content = f.read().strip()
+    
+    # 提取第一个适合长度的段落
+    lines = content.split('\n')
+    tweet_text = []
+    current_length = 0
+    
+    for line in lines:
+        if current_length + len(line) + 1 <= TWEET_MAX_CHARS:
+            tweet_text.append(line)
+            current_length += len(line) + 1
+        else:
+            break
+    
+    return '\n'.join(tweet_text)
+
 def main():
     """主函数 - 测试和验证"""
     bot = TwitterBot()
@@ -250,10 +278,33 @@ def main():
     print("\n使用方式:")
     print("  python scripts/twitter_bot.py post    # 发布最新推文")
     print("  python scripts/twitter_bot.py test    # 发布测试推文")
+    print("  python scripts/tweet_outbox.py status # 发件箱状态")
 
-def post_latest():
-    """发布最新的推文文件"""
-    bot = TwitterBot()
+def _report(result):
+    """打印入队 + 发送的结果"""
+    if result['posted'] and result['tweet_id']:
+        print(f"\n✅ 发布成功!")
+        print(f"   推文链接: https://twitter.com/i/web/status/{result['tweet_id']}")
+        print(f"   推文ID: {result['tweet_id']}")
+    elif result['posted']:
+        print(f"\n✅ 此前已发布过同样内容 (Twitter 判定为重复)，未再次发送")
+    elif result['status'] == 'pending':
+        print(f"\n⏳ 已在发件箱排队 (限速或等待重试)，由 drain 任务稍后发送")
+    else:
+        print(f"\n❌ 发布失败: {result['error']}")
+
+def post_latest(bot=None, outbox=None):
+    """
+    把最新的推文文件放进发件箱并立即尝试发送 (调度器传入常驻的 bot / outbox)
+
+    幂等键是文件名：同一天的文件重复执行也只会发一次
+    """
+    from tweet_outbox import Outbox
+    bot = bot or TwitterBot()
+    if not bot.has_credentials():
+        print("❌ OAuth 凭证不完整，未放入发件箱")
+        return
+    outbox = outbox or Outbox()
     
     # 查找最新的推文文件
     content_dir = Path.home() / ".openclaw" / "workspace" / "content"
@@ -273,18 +324,18 @@ def post_latest():
     print(content)
     print('='*40)
     
-    result = bot.post_from_file(latest)
-    
-    if result.get('success'):
-        print(f"\n✅ 发布成功!")
-        print(f"   推文链接: {result.get('url')}")
-        print(f"   推文ID: {result.get('tweet_id')}")
-    else:
-        print(f"\n❌ 发布失败: {result.get('error')}")
+    key = outbox.enqueue(tweet_text_from_file(latest), key=f"file:{latest.name}")
+    outbox.drain(bot)
+    _report(outbox.result(key))
 
 def post_test():
-    """发布测试推文"""
+    """发布测试推文 (同样经过发件箱限速)"""
+    from tweet_outbox import Outbox
     bot = TwitterBot()
+    if not bot.has_credentials():
+        print("❌ OAuth 凭证不完整，未放入发件箱")
+        return
+    outbox = Outbox()
     
     test_text = f"📊 曹皇监控系统测试推文 {datetime.now().strftime('%m/%d %H:%M')}\n\nAI API 套利情报实时更新 👑 #AI #API #省钱"
     
@@ -292,20 +343,18 @@ def post_test():
     print(test_text)
     print('='*40)
     
-    result = bot.post_tweet(test_text)
-    
-    if result.get('success'):
-        print(f"\n✅ 发布成功!")
-        print(f"   推文链接: {result.get('url')}")
-    else:
-        print(f"\n❌ 发布失败: {result.get('error')}")
+    key = outbox.enqueue(test_text)
+    outbox.drain(bot)
+    _report(outbox.result(key))
 
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == "post":
         post_latest()
+        metrics.export()
     elif len(sys.argv) > 1 and sys.argv[1] == "test":
         post_test()
+        metrics.export()
     else:
         main()